@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class AppConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'app'
+
+    def ready(self) -> None:
+        from app.src.layers.api.e2b import schema as e2b_schema
+
+        e2b_schema.check_files()
@@ -0,0 +1,66 @@
+import itertools
+import logging
+import os
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from app.src.layers.api import models as api_models
+from app.src.layers.api.e2b import parallel as e2b_parallel
+from app.src.layers.api.e2b import template as e2b_template
+from app.src.layers.api.views import ExportMultipleXmlView
+from app.src.layers.storage.models import ICSR
+from app.urls import domain_service_adapter
+
+logger = logging.getLogger(__name__)
+
+
+def get_default_worker_counts() -> list[int]:
+    cpu_count = os.cpu_count() or 1
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= cpu_count:
+        worker_counts.append(worker_counts[-1] * 2)
+    if worker_counts[-1] != cpu_count:
+        worker_counts.append(cpu_count)
+    return worker_counts
+
+
+class Command(BaseCommand):
+    help = 'Measure multi-ICSR XML export time depending on batch size and number of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 10000],
+                            help='Batch sizes, existing ICSRs are repeated if there are not enough of them')
+        parser.add_argument('--workers', nargs='+', type=int, default=None,
+                            help='Worker counts, by default powers of two up to the number of CPUs')
+
+    def handle(self, *args, **options):
+        existing_ids = list(ICSR.objects.order_by('id').values_list('id', flat=True))
+        if not existing_ids:
+            raise CommandError('There are no ICSRs to export, fill the database first')
+
+        view = ExportMultipleXmlView(domain_service=domain_service_adapter, model_class=api_models.ICSR)
+        worker_counts = options['workers'] or get_default_worker_counts()
+
+        self.stdout.write(f'{"cases":>8} {"workers":>8} {"seconds":>10} {"cases/s":>10} {"speedup":>8}')
+        for size in options['sizes']:
+            icsr_ids = list(itertools.islice(itertools.cycle(existing_ids), size))
+            base_duration = None
+            for workers in worker_counts:
+                start = time.perf_counter()
+                # Fragment cache is bypassed to measure rendering itself
+                if workers == 1:
+                    template = e2b_template.template_cache.get()
+                    for icsr in view.domain_service.read_many(view.model_class, icsr_ids):
+                        view.render_fragment(icsr, template)
+                else:
+                    for _ in e2b_parallel.ParallelExportEngine(workers=workers).render(icsr_ids):
+                        pass
+                duration = time.perf_counter() - start
+
+                if base_duration is None:
+                    base_duration = duration
+                self.stdout.write(
+                    f'{size:>8} {workers:>8} {duration:>10.2f} {size / duration:>10.1f} {base_duration / duration:>8.2f}'
+                )
+                logger.info(f'Exported {size} cases with {workers} workers in {duration:.2f} s')
@@ -0,0 +1,55 @@
+import logging
+import time
+
+from django.core.management import BaseCommand
+from lxml import etree
+
+from app.src.layers.api import models as api_models
+from app.src.layers.api.e2b import fragment_cache as e2b_fragment_cache
+from app.src.layers.api.e2b import schema as e2b_schema
+from app.src.layers.api.e2b import template as e2b_template
+from app.src.layers.api.e2b.corpus import CorpusGenerator, CorpusParams
+from app.src.layers.api.views import ExportMultipleXmlView
+from app.urls import domain_service_adapter
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Measure E2B(R3) schema validation time per case depending on case size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cases', type=int, default=200, help='Number of generated cases of every size')
+        parser.add_argument('--drugs', nargs='+', type=int, default=[1, 10, 50], help='Numbers of G.k per case')
+
+    def handle(self, *args, **options):
+        view = ExportMultipleXmlView(domain_service=domain_service_adapter, model_class=api_models.ICSR)
+        template = e2b_template.template_cache.get()
+
+        start = time.perf_counter()
+        e2b_schema.schema_cache.get()
+        self.stdout.write(f'Schema compiled in {time.perf_counter() - start:.2f} s')
+
+        self.stdout.write(f'{"drugs":>6} {"KiB/case":>9} {"parse ms":>9} {"validate ms":>12} {"invalid":>8}')
+        for drugs in options['drugs']:
+            generator = CorpusGenerator(CorpusParams(drugs=drugs, reactions=drugs, dosages=2))
+            fragments = [
+                e2b_fragment_cache.fill_placeholders(view.render_fragment(generator.make_icsr(case_number), template))
+                for case_number in range(options['cases'])
+            ]
+
+            start = time.perf_counter()
+            elements = [etree.fromstring(fragment) for fragment in fragments]
+            parse_duration = time.perf_counter() - start
+
+            start = time.perf_counter()
+            invalid_count = sum(1 for element in elements if e2b_schema.validate(element))
+            validate_duration = time.perf_counter() - start
+
+            case_count = len(fragments)
+            size = sum(len(fragment) for fragment in fragments) / case_count / 1024
+            self.stdout.write(
+                f'{drugs:>6} {size:>9.1f} {parse_duration / case_count * 1000:>9.2f} '
+                f'{validate_duration / case_count * 1000:>12.2f} {invalid_count:>8}'
+            )
+            logger.info(f'Validated {case_count} cases with {drugs} drugs in {validate_duration:.2f} s')
@@ -0,0 +1,84 @@
+import logging
+import os
+from pathlib import Path
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from app.src.exceptions import UserError
+from app.src.layers.api import models as api_models
+from app.src.layers.api.e2b import export_jobs
+from app.src.layers.api.views import ExportMultipleXmlView
+from app.urls import domain_service_adapter
+
+logger = logging.getLogger(__name__)
+
+
+def parse_filters(filters: list[str]) -> dict[str, str]:
+    lookups = {}
+    for item in filters:
+        lookup, separator, value = item.partition('=')
+        if not separator:
+            raise CommandError(f'Filter {item} must be in the form lookup=value')
+        lookups[lookup] = value
+    return lookups
+
+
+class Command(BaseCommand):
+    help = 'Export ICSRs to multi-ICSR XML files without going through the HTTP layer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', type=Path,
+                            help='Output file, with --batch-size it is a directory for the batch files')
+        selection = parser.add_mutually_exclusive_group(required=True)
+        selection.add_argument('--ids', nargs='+', type=int, help='Ids of the ICSRs')
+        selection.add_argument('--filter', nargs='*', metavar='LOOKUP=VALUE',
+                               help='Django lookups on ICSR, for example '
+                                    'c_1_identification_case_safety_report__c_1_3_type_report=1, '
+                                    'all ICSRs are exported if no lookups are given')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Split the export into files of this number of ICSRs')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Number of rendering processes, E2B_EXPORT_WORKERS by default')
+
+    def handle(self, *args, **options):
+        if options['ids'] is not None:
+            icsr_ids = options['ids']
+        else:
+            try:
+                icsr_ids = export_jobs.find_icsr_ids(parse_filters(options['filter']))
+            except UserError as e:
+                raise CommandError(str(e))
+        if not icsr_ids:
+            raise CommandError('There are no ICSRs to export')
+
+        view = ExportMultipleXmlView(
+            domain_service=domain_service_adapter, model_class=api_models.ICSR, workers=options['workers']
+        )
+        batch_size = options['batch_size']
+        output = options['output']
+        start = time.perf_counter()
+
+        if batch_size is None:
+            self.write_batch(view, icsr_ids, output)
+        else:
+            os.makedirs(output, exist_ok=True)
+            for batch_start in range(0, len(icsr_ids), batch_size):
+                batch_ids = icsr_ids[batch_start:batch_start + batch_size]
+                self.write_batch(view, batch_ids, output / f'e2b_export_{batch_start // batch_size + 1:05}.xml')
+
+        duration = time.perf_counter() - start
+        self.stdout.write(f'Exported {len(icsr_ids)} ICSRs in {duration:.2f} s')
+
+    def write_batch(self, view: ExportMultipleXmlView, icsr_ids: list[int], file_path: Path) -> None:
+        # Missing ICSRs are skipped, the file appears only when it is complete
+        temp_file_path = file_path.with_name(file_path.name + '.part')
+        try:
+            with open(temp_file_path, 'wb') as file:
+                for chunk in view.stream_multiple_to_xml(icsr_ids):
+                    file.write(chunk)
+            os.replace(temp_file_path, file_path)
+        finally:
+            if temp_file_path.exists():
+                temp_file_path.unlink()
+        logger.info(f'Exported {len(icsr_ids)} requested ICSRs to {file_path}')
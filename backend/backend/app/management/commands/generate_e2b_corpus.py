@@ -0,0 +1,63 @@
+import logging
+import os
+from pathlib import Path
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from app.src.layers.api import models as api_models
+from app.src.layers.api.e2b.corpus import CorpusGenerator, CorpusParams
+from app.src.layers.api.views import ExportMultipleXmlView
+from app.urls import domain_service_adapter
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Generate multi-ICSR XML files with synthetic cases for import and export benchmarks (see import_e2b)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', type=Path, help='Directory for the generated files')
+        parser.add_argument('--cases', type=int, default=1000, help='Total number of cases')
+        parser.add_argument('--cases-per-file', type=int, default=1000, help='Number of cases in every file')
+        parser.add_argument('--drugs', type=int, default=CorpusParams.drugs, help='Number of G.k per case')
+        parser.add_argument('--reactions', type=int, default=CorpusParams.reactions, help='Number of E.i per case')
+        parser.add_argument('--dosages', type=int, default=CorpusParams.dosages, help='Number of G.k.4.r per drug')
+        parser.add_argument('--narrative-words', type=int, default=CorpusParams.narrative_words,
+                            help='Number of words in H.1')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, the same seed gives the same cases')
+        parser.add_argument('--sender-id', default='E2B4FREE',
+                            help='Sender part of C.1.1, change it to generate cases which are not imported yet')
+
+    def handle(self, *args, **options):
+        if options['cases'] <= 0 or options['cases_per_file'] <= 0:
+            raise CommandError('Number of cases must be positive')
+        if options['reactions'] <= 0:
+            raise CommandError('Every case must have at least one reaction')
+
+        params = CorpusParams(
+            drugs=options['drugs'],
+            reactions=options['reactions'],
+            dosages=options['dosages'],
+            narrative_words=options['narrative_words'],
+        )
+        generator = CorpusGenerator(params, options['seed'], options['sender_id'])
+        view = ExportMultipleXmlView(domain_service=domain_service_adapter, model_class=api_models.ICSR)
+        directory = options['directory']
+        os.makedirs(directory, exist_ok=True)
+
+        total_size = 0
+        start = time.perf_counter()
+        for file_number, first_case in enumerate(range(0, options['cases'], options['cases_per_file']), 1):
+            case_count = min(options['cases_per_file'], options['cases'] - first_case)
+            file_path = directory / f'e2b_corpus_{file_number:05}.xml'
+            with open(file_path, 'wb') as file:
+                for chunk in generator.generate_batch(view, first_case + 1, case_count):
+                    file.write(chunk)
+            total_size += file_path.stat().st_size
+            logger.info(f'Generated {case_count} cases in {file_path}')
+
+        duration = time.perf_counter() - start
+        self.stdout.write(
+            f'Generated {options["cases"]} cases ({total_size / 2 ** 20:.1f} MiB) in {duration:.2f} s'
+        )
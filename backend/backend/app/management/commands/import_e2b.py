@@ -0,0 +1,70 @@
+import logging
+from pathlib import Path
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from app.src.layers.api import models as api_models
+from app.src.layers.api.views import ImportMultipleXmlView
+from app.urls import domain_service_adapter
+
+logger = logging.getLogger(__name__)
+
+
+def is_successful(status: dict) -> bool:
+    # Creation statuses are returned with misspelled key (see ImportMultipleXmlView.make_creation_status)
+    return status.get('success', status.get('sucsess', False))
+
+
+class Command(BaseCommand):
+    help = 'Import multi-ICSR XML files of the directory without going through the HTTP layer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', type=Path, help='Directory with batch files')
+        parser.add_argument('--pattern', default='*.xml', help='Glob pattern of the files to import')
+        parser.add_argument('--validation', action='store_true', help='Only validate the messages')
+        parser.add_argument('--follow-up', action='store_true',
+                            help='Update stored cases by messages with known C.1.8.1 and newer C.1.5')
+        parser.add_argument('--workers', type=int, default=None,
+                            help='Number of conversion processes, E2B_IMPORT_WORKERS by default')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        if not directory.is_dir():
+            raise CommandError(f'{directory} is not a directory')
+        file_paths = sorted(path for path in directory.glob(options['pattern']) if path.is_file())
+        if not file_paths:
+            raise CommandError(f'There are no files matching {options["pattern"]} in {directory}')
+
+        # Message parts are converted in a process pool and saved in batches of IMPORT_BATCH_SIZE
+        view = ImportMultipleXmlView(
+            domain_service=domain_service_adapter, model_class=api_models.ICSR, workers=options['workers']
+        )
+        results_key = 'file_validation_status' if options['validation'] else 'icsr_results'
+        total_messages = 0
+        total_successful = 0
+        start = time.perf_counter()
+
+        for file_path in file_paths:
+            with open(file_path, 'rb') as file:
+                file_result = view.import_file(
+                    view.iterparse_messages(file), file_path.name, options['validation'], options['follow_up']
+                )
+            if not file_result.get('success'):
+                self.stderr.write(f'{file_path.name}: {file_result.get("error")}')
+                continue
+
+            statuses = file_result[results_key]
+            successful = sum(1 for status in statuses if is_successful(status))
+            total_messages += len(statuses)
+            total_successful += successful
+            self.stdout.write(f'{file_path.name}: {successful} of {len(statuses)} messages succeeded')
+            for status in statuses:
+                if not is_successful(status):
+                    logger.info(f'{file_path.name}: {status}')
+
+        duration = time.perf_counter() - start
+        self.stdout.write(
+            f'Processed {len(file_paths)} files in {duration:.2f} s: '
+            f'{total_successful} of {total_messages} messages succeeded'
+        )
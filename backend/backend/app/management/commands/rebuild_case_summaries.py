@@ -0,0 +1,27 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db import transaction
+
+from app.src.layers.storage.models import ICSR
+
+
+class Command(BaseCommand):
+    help = 'Rebuild rows of the case list from the ICSR tables, for example after migrating existing data'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', nargs='+', type=int, help='Ids of the ICSRs, all ICSRs by default')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of ICSRs refreshed in one transaction')
+
+    def handle(self, *args, **options):
+        icsr_ids = options['ids']
+        if icsr_ids is None:
+            icsr_ids = list(ICSR.objects.order_by('id').values_list('id', flat=True))
+
+        batch_size = options['batch_size']
+        start = time.perf_counter()
+        for batch_start in range(0, len(icsr_ids), batch_size):
+            with transaction.atomic():
+                ICSR.refresh_summaries(icsr_ids[batch_start:batch_start + batch_size])
+        duration = time.perf_counter() - start
+        self.stdout.write(f'Rebuilt summaries of {len(icsr_ids)} ICSRs in {duration:.2f} s')
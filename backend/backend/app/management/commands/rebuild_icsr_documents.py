@@ -0,0 +1,34 @@
+import time
+
+from django.core.management import BaseCommand
+
+from app.src.layers.api import models as api_models
+from app.src.layers.api.document_cache import document_cache
+from app.src.layers.api.views import ModelInstanceView
+from app.src.layers.storage.models import ICSR
+from app.urls import domain_service_adapter
+
+
+class Command(BaseCommand):
+    help = 'Build json snapshots of ICSRs which are missing or stale, for example after enabling ICSR_DOCUMENT_SNAPSHOTS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ids', nargs='+', type=int, help='Ids of the ICSRs, all ICSRs by default')
+        parser.add_argument('--force', action='store_true',
+                            help='Build snapshots again even if they are up to date, for example after api changes')
+
+    def handle(self, *args, **options):
+        icsr_ids = options['ids']
+        if icsr_ids is None:
+            icsr_ids = list(ICSR.objects.order_by('id').values_list('id', flat=True))
+
+        view = ModelInstanceView(domain_service=domain_service_adapter, model_class=api_models.ICSR)
+
+        def build_many(icsr_ids: list[int]):
+            for icsr in domain_service_adapter.read_many(api_models.ICSR, icsr_ids):
+                yield icsr.id, view.dump_model_as_json(icsr)
+
+        start = time.perf_counter()
+        built_count = document_cache.rebuild(icsr_ids, build_many, options['force'])
+        duration = time.perf_counter() - start
+        self.stdout.write(f'Built {built_count} of {len(icsr_ids)} ICSR snapshots in {duration:.2f} s')
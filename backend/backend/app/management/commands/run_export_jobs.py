@@ -0,0 +1,39 @@
+import logging
+import time
+
+from django.core.management import BaseCommand
+
+from app.src.layers.api import models as api_models
+from app.src.layers.api.e2b import export_jobs
+from app.src.layers.api.views import ExportMultipleXmlView
+from app.urls import domain_service_adapter
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Run worker processing asynchronous multi-ICSR XML export jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when there are no pending jobs')
+        parser.add_argument('--poll-interval', type=float, default=2, help='Seconds between checks for new jobs')
+
+    def handle(self, *args, **options):
+        view = ExportMultipleXmlView(domain_service=domain_service_adapter, model_class=api_models.ICSR)
+        logger.info('Export worker started')
+
+        while True:
+            deleted_count = export_jobs.delete_expired_files()
+            if deleted_count:
+                logger.info(f'Deleted {deleted_count} expired export job files')
+
+            job = export_jobs.claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            logger.info(f'Running export job {job.id} with {job.total} ICSRs')
+            export_jobs.run_job(job, view)
+            logger.info(f'Export job {job.id} finished with status {job.status}')
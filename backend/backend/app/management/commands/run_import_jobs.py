@@ -0,0 +1,35 @@
+import logging
+import time
+
+from django.core.management import BaseCommand
+
+from app.src.layers.api import models as api_models
+from app.src.layers.api.e2b import import_jobs
+from app.src.layers.api.views import ImportMultipleXmlView
+from app.urls import domain_service_adapter
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Run worker processing asynchronous multi-ICSR XML import jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when there are no pending jobs')
+        parser.add_argument('--poll-interval', type=float, default=2, help='Seconds between checks for new jobs')
+
+    def handle(self, *args, **options):
+        view = ImportMultipleXmlView(domain_service=domain_service_adapter, model_class=api_models.ICSR)
+        logger.info('Import worker started')
+
+        while True:
+            job = import_jobs.claim_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            logger.info(f'Running import job {job.id} with {len(job.files)} files')
+            import_jobs.run_job(job, view)
+            logger.info(f'Import job {job.id} finished with status {job.status}')
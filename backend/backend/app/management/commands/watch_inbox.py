@@ -0,0 +1,77 @@
+import concurrent.futures as cf
+import logging
+from pathlib import Path
+import time
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import close_old_connections
+
+from app.src.layers.api import models as api_models
+from app.src.layers.api.e2b.inbox import Inbox
+from app.src.layers.api.views import ImportMultipleXmlView
+from app.urls import domain_service_adapter
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Watch the gateway inbox directory and import batch files dropped into it'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', type=Path, nargs='?', default=None,
+                            help='Inbox directory, E2B_INBOX_DIR by default')
+        parser.add_argument('--pattern', default='*.xml', help='Glob pattern of the files to import')
+        parser.add_argument('--follow-up', action='store_true',
+                            help='Update stored cases by messages with known C.1.8.1 and newer C.1.5')
+        parser.add_argument('--workers', type=int, default=2, help='Number of files imported concurrently')
+        parser.add_argument('--poll-interval', type=float, default=1, help='Seconds between checks for new files')
+        parser.add_argument('--once', action='store_true', help='Exit when the inbox is empty')
+
+    def handle(self, *args, **options):
+        inbox = Inbox(
+            options['directory'] or settings.E2B_INBOX_DIR, options['pattern'], settings.E2B_INBOX_MIN_FILE_AGE
+        )
+        try:
+            self.watch(inbox, options)
+        finally:
+            inbox.close()
+
+    def watch(self, inbox: Inbox, options: dict) -> None:
+        for path in inbox.recover():
+            logger.info(f'Inbox file {path.name} was left unprocessed and is imported again')
+
+        view = ImportMultipleXmlView(domain_service=domain_service_adapter, model_class=api_models.ICSR)
+        workers = options['workers']
+        logger.info(f'Watching inbox {inbox.path} with {workers} workers')
+
+        with cf.ThreadPoolExecutor(max_workers=workers) as executor:
+            pending_futures = set()
+            while True:
+                # Files are claimed only for free workers, so that other daemons can take the rest
+                paths = inbox.claim_files(limit=workers - len(pending_futures))
+                for path in paths:
+                    pending_futures.add(executor.submit(self.import_file, inbox, view, path, options['follow_up']))
+
+                if not pending_futures:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done_futures, pending_futures = cf.wait(
+                    pending_futures, timeout=options['poll_interval'], return_when=cf.FIRST_COMPLETED
+                )
+                for future in done_futures:
+                    if future.exception() is not None:
+                        logger.error('Inbox file import failed', exc_info=future.exception())
+
+    @staticmethod
+    def import_file(inbox: Inbox, view: ImportMultipleXmlView, path: Path, is_follow_up: bool) -> None:
+        # Every worker thread has its own connection, which may have been closed by the database
+        close_old_connections()
+        start = time.perf_counter()
+        is_ok = inbox.import_file(path, view, is_follow_up)
+        logger.info(
+            f'Inbox file {path.name} {"imported" if is_ok else "failed"} in {time.perf_counter() - start:.2f} s'
+        )
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.2 on 2026-10-17 06:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0020_substancecode'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ICSRXmlFragment',
+            fields=[
+                ('icsr', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='app.icsr')),
+                ('revision', models.PositiveIntegerField(default=0)),
+                ('rendered_revision', models.PositiveIntegerField(null=True)),
+                ('content', models.BinaryField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.2 on 2026-10-17 06:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0022_exportjob'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='c_1_identification_case_safety_report',
+            index=models.Index(fields=['c_1_8_1_worldwide_unique_case_identification_number'], include=('icsr', 'c_1_1_sender_safety_report_unique_id', 'c_1_5_date_most_recent_information'), name='c_1_8_1_follow_up_idx'),
+        ),
+    ]
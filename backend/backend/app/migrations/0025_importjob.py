@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-17 06:29
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0024_inboundmessage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='pending')),
+                ('is_validation', models.BooleanField(default=False)),
+                ('is_follow_up', models.BooleanField(default=False)),
+                ('files', models.JSONField(default=list)),
+                ('results', models.JSONField(default=list)),
+                ('processed_files', models.PositiveIntegerField(default=0)),
+                ('processed_messages', models.PositiveIntegerField(default=0)),
+                ('error', models.CharField(null=True)),
+                ('created_time', models.DateTimeField(auto_now_add=True)),
+                ('updated_time', models.DateTimeField(auto_now=True)),
+                ('finished_time', models.DateTimeField(null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.2 on 2026-10-17 06:42
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0026_icsrdocument'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CaseSummary',
+            fields=[
+                ('icsr', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='app.icsr')),
+                ('case_number', models.CharField(null=True)),
+                ('creation_date', models.CharField(null=True)),
+                ('received_date', models.CharField(null=True)),
+                ('serious', models.BooleanField(default=False)),
+                ('reaction_names', django.contrib.postgres.fields.ArrayField(base_field=models.PositiveIntegerField(null=True), default=list, size=None)),
+                ('drug_names', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(null=True), default=list, size=None)),
+            ],
+            options={
+                'db_table': 'case_summary',
+                'indexes': [models.Index(fields=['-creation_date', '-icsr'], name='case_summary_creation_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.2 on 2026-10-17 06:44
+
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0027_casesummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='casesummary',
+            index=models.Index(fields=['-received_date', '-icsr'], name='case_summary_received_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casesummary',
+            index=models.Index(fields=['case_number', 'icsr'], name='case_summary_case_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casesummary',
+            index=models.Index(condition=models.Q(('serious', True)), fields=['-creation_date', '-icsr'], name='case_summary_serious_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casesummary',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['reaction_names'], name='case_summary_reactions_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='casesummary',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['drug_names'], name='case_summary_drugs_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.2 on 2026-10-17 06:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0028_case_summary_list_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='c_1_identification_case_safety_report',
+            name='c_1_8_1_follow_up_idx',
+        ),
+        migrations.AlterField(
+            model_name='c_1_identification_case_safety_report',
+            name='c_1_8_1_worldwide_unique_case_identification_number',
+            field=models.CharField(null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='c_1_identification_case_safety_report',
+            constraint=models.UniqueConstraint(fields=('c_1_8_1_worldwide_unique_case_identification_number',), include=('id', 'icsr', 'c_1_1_sender_safety_report_unique_id', 'c_1_5_date_most_recent_information'), name='c_1_8_1_unique_follow_up'),
+        ),
+    ]
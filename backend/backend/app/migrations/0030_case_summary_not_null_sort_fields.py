@@ -0,0 +1,28 @@
+# Generated by Django 5.0.2 on 2026-10-17 06:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0029_c_1_8_1_unique_follow_up'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='casesummary',
+            name='case_number',
+            field=models.CharField(default=''),
+        ),
+        migrations.AlterField(
+            model_name='casesummary',
+            name='creation_date',
+            field=models.CharField(default=''),
+        ),
+        migrations.AlterField(
+            model_name='casesummary',
+            name='received_date',
+            field=models.CharField(default=''),
+        ),
+    ]
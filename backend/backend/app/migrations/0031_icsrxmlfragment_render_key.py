@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-17 06:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0030_case_summary_not_null_sort_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='icsrxmlfragment',
+            name='render_key',
+            field=models.CharField(null=True),
+        ),
+    ]
@@ -0,0 +1,25 @@
+from django.db import migrations
+
+
+BATCH_SIZE = 1000
+
+
+def backfill_case_summaries(apps, schema_editor):
+    # Summaries are built by the current model, as the historical one has no refresh_summaries,
+    # only ICSR ids are read from the historical state, so the migration is a no-op on an empty database
+    from app.src.layers.storage.models import ICSR
+
+    icsr_ids = list(apps.get_model('app', 'ICSR').objects.order_by('id').values_list('id', flat=True))
+    for batch_start in range(0, len(icsr_ids), BATCH_SIZE):
+        ICSR.refresh_summaries(icsr_ids[batch_start:batch_start + BATCH_SIZE])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0031_icsrxmlfragment_render_key'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_case_summaries, migrations.RunPython.noop),
+    ]
@@ -21,18 +21,34 @@ class BaseServiceAdapter[U, L](ServiceProtocol[U]):
         lower_model_class = self.upper_to_lower_model_converter.get_target_model_class(upper_model_class)
         return self.adapted_service.list(lower_model_class)
 
+    def list_page(self, upper_model_class: type[U], params: t.Mapping[str, str]) -> dict[str, t.Any]:
+        lower_model_class = self.upper_to_lower_model_converter.get_target_model_class(upper_model_class)
+        return self.adapted_service.list_page(lower_model_class, params)
+
     def read(self, upper_model_class: type[U], pk: int) -> U:
         lower_model_class = self.upper_to_lower_model_converter.get_target_model_class(upper_model_class)
         lower_model = self.adapted_service.read(lower_model_class, pk)
         upper_model = self.lower_to_upper_model_converter.convert(lower_model)
         return upper_model
 
+    def read_many(self, upper_model_class: type[U], pks: t.Iterable[int]) -> t.Iterator[U]:
+        lower_model_class = self.upper_to_lower_model_converter.get_target_model_class(upper_model_class)
+        for lower_model in self.adapted_service.read_many(lower_model_class, pks):
+            yield self.lower_to_upper_model_converter.convert(lower_model)
+
     def create(self, upper_model: U) -> tuple[U, bool]:
         lower_model = self.upper_to_lower_model_converter.convert(upper_model)
         lower_model, is_ok = self.adapted_service.create(lower_model)
         upper_model = self.lower_to_upper_model_converter.convert(lower_model)
         return upper_model, is_ok
 
+    def create_many(self, upper_models: t.Sequence[U]) -> t.Sequence[tuple[U, bool]]:
+        lower_models = [self.upper_to_lower_model_converter.convert(upper_model) for upper_model in upper_models]
+        return [
+            (self.lower_to_upper_model_converter.convert(lower_model), is_ok)
+            for lower_model, is_ok in self.adapted_service.create_many(lower_models)
+        ]
+
     def update(self, upper_model: U, pk: int) -> tuple[U, bool]:
         lower_model = self.upper_to_lower_model_converter.convert(upper_model)
         lower_model, is_ok = self.adapted_service.update(lower_model, pk)
@@ -154,8 +154,16 @@ class StorageToDomainModelConverter[S: StorageModel, T: DomainModel](bmc.BaseMod
             if not include_related or not field.is_relation or not isinstance(field, models.ForeignObjectRel):
                 continue
 
+            # Models which have just been created keep their related models in temp fields
+            # (see StorageService), so they are converted without reading them again
+            temp_field_name = temp_relation_field_utils.make_special_field_name(field_name)
+            is_in_memory = temp_field_name in vars(source_model)
+
             if field.one_to_many:
-                related_source_models = getattr(source_model, field_name).all()
+                if is_in_memory:
+                    related_source_models = vars(source_model)[temp_field_name]
+                else:
+                    related_source_models = getattr(source_model, field_name).all()
                 target_list_with_models = []
                 target_list_with_dicts = []
 
@@ -168,7 +176,10 @@ class StorageToDomainModelConverter[S: StorageModel, T: DomainModel](bmc.BaseMod
                 target_dict_with_dicts[field_name] = target_list_with_dicts
 
             elif field.one_to_one:
-                related_source_model = getattr(source_model, field_name, None)
+                if is_in_memory:
+                    related_source_model = vars(source_model)[temp_field_name]
+                else:
+                    related_source_model = getattr(source_model, field_name, None)
                 if related_source_model:
                     model, dict_ = cls.convert_to_model_and_dict(related_source_model, include_related)
                     target_dict_with_models[field_name] = model
@@ -0,0 +1,85 @@
+import json
+import typing as t
+
+from django.conf import settings
+from django.db import models as m
+from django.db.models.functions import Cast
+
+from app.src.layers.storage.models import ICSRDocument
+
+
+class DocumentCache:
+    """
+    Stores ICSRs serialized as the api returns them, so that a case is read without its related tables.
+    Document is reused while ICSR revision doesn't change, stale and missing ones are built again.
+    """
+
+    CHUNK_SIZE = 500
+
+    @staticmethod
+    def is_enabled() -> bool:
+        return settings.ICSR_DOCUMENT_SNAPSHOTS
+
+    def get(self, icsr_id: int, build: t.Callable[[int], str]) -> str:
+        """Returns json of the ICSR, build should serialize it from the related tables."""
+        row = ICSRDocument.objects \
+            .filter(icsr_id=icsr_id) \
+            .annotate(text=Cast('content', m.TextField())) \
+            .values_list('revision', 'built_revision', 'text') \
+            .first()
+        if row is not None:
+            revision, built_revision, text = row
+            if revision == built_revision and text is not None:
+                return text
+
+        document = build(icsr_id)
+        self._store({icsr_id: (row[0] if row is not None else 0, document)})
+        return document
+
+    def rebuild(
+        self,
+        icsr_ids: list[int],
+        build_many: t.Callable[[list[int]], t.Iterator[tuple[int, str]]],
+        is_forced: bool = False
+    ) -> int:
+        """
+        Builds documents which are stale or missing, or all of them if is_forced, returns their number.
+        build_many should yield ids and json of the ICSRs skipping missing ones.
+        """
+        built_count = 0
+        for chunk in self._split(icsr_ids):
+            revisions = dict.fromkeys(chunk, 0)
+            fresh_ids = set()
+            rows = ICSRDocument.objects.filter(icsr_id__in=chunk) \
+                .values_list('icsr_id', 'revision', 'built_revision')
+            for icsr_id, revision, built_revision in rows:
+                revisions[icsr_id] = revision
+                if revision == built_revision:
+                    fresh_ids.add(icsr_id)
+
+            stale_ids = chunk if is_forced else [icsr_id for icsr_id in chunk if icsr_id not in fresh_ids]
+            documents = {icsr_id: (revisions[icsr_id], document) for icsr_id, document in build_many(stale_ids)}
+            self._store(documents)
+            built_count += len(documents)
+        return built_count
+
+    @staticmethod
+    def _store(documents: dict[int, tuple[int, str]]) -> None:
+        # Revision is not updated, so a document of ICSR changed while it was built stays stale
+        ICSRDocument.objects.bulk_create(
+            [
+                ICSRDocument(icsr_id=icsr_id, revision=revision, built_revision=revision, content=json.loads(document))
+                for icsr_id, (revision, document) in documents.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['icsr'],
+            update_fields=['built_revision', 'content']
+        )
+
+    @classmethod
+    def _split(cls, icsr_ids: list[int]) -> t.Iterator[list[int]]:
+        for start in range(0, len(icsr_ids), cls.CHUNK_SIZE):
+            yield icsr_ids[start:start + cls.CHUNK_SIZE]
+
+
+document_cache = DocumentCache()
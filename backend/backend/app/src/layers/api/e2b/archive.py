@@ -0,0 +1,62 @@
+import copy
+import hashlib
+import typing as t
+import zlib
+
+from lxml import etree
+
+from app.src.layers.api.models.archive import InboundMessage
+
+
+def canonicalize(porr_elem: etree._Element) -> bytes:
+    """
+    Returns C14N 2.0 form of the message part, so that resent messages differing
+    only in formatting, attribute order or namespace declarations have the same digest.
+    """
+    # Copy is serialized as a separate document, as c14n requires namespaces to be declared in it
+    return etree.tostring(copy.deepcopy(porr_elem), method='c14n2', strip_text=True, with_tail=False)
+
+
+def get_digest(canonical_message: bytes) -> str:
+    return hashlib.sha256(canonical_message).hexdigest()
+
+
+def serialize(porr_elem: etree._Element) -> bytes:
+    """Returns the message part as it was received, only its namespace declarations are added if needed."""
+    return etree.tostring(porr_elem, with_tail=False)
+
+
+def find_archived(digests: t.Iterable[str]) -> dict[str, int | None]:
+    """
+    Returns archived messages with the given digests and ids of existing ICSRs imported from them,
+    id is None if the message hasn't been imported.
+    """
+    return dict(
+        InboundMessage.objects
+            .filter(digest__in=set(digests))
+            .values_list('digest', 'icsr_id')
+    )
+
+
+def store(digest_to_message_dict: dict[str, bytes]) -> None:
+    """Archives compressed original messages, already stored ones are kept as they are."""
+    InboundMessage.objects.bulk_create(
+        [
+            InboundMessage(digest=digest, content=zlib.compress(message))
+            for digest, message in digest_to_message_dict.items()
+        ],
+        ignore_conflicts=True
+    )
+
+
+def link(digest_to_icsr_id_dict: dict[str, int]) -> None:
+    """Saves ICSRs created or updated from the archived messages, so that resent messages are skipped."""
+    InboundMessage.objects.bulk_update(
+        [InboundMessage(digest=digest, icsr_id=icsr_id) for digest, icsr_id in digest_to_icsr_id_dict.items()],
+        ['icsr']
+    )
+
+
+def read(digest: str) -> bytes:
+    """Returns original XML of the archived message."""
+    return zlib.decompress(InboundMessage.objects.get(digest=digest).content)
@@ -0,0 +1,197 @@
+import dataclasses as dc
+from datetime import datetime, timedelta
+import random
+import typing as t
+
+from app.src import enums
+from app.src.layers.api.e2b import fragment_cache as e2b_fragment_cache
+from app.src.layers.api.e2b import template as e2b_template
+from app.src.layers.api.models import icsr as api_models
+
+MEDDRA_VERSION = '26.1'
+
+# MedDRA lowest level terms commonly met in reports
+REACTION_TERMS = [
+    (10019211, 'Headache'),
+    (10028813, 'Nausea'),
+    (10013573, 'Dizziness'),
+    (10037087, 'Pruritus'),
+    (10012735, 'Diarrhoea'),
+    (10047700, 'Vomiting'),
+    (10016256, 'Fatigue'),
+    (10040785, 'Skin rash'),
+    (10002198, 'Anaphylactic reaction'),
+    (10022437, 'Insomnia'),
+]
+
+INDICATION_TERMS = [
+    (10020772, 'Hypertension'),
+    (10012601, 'Diabetes mellitus'),
+    (10003246, 'Arthralgia'),
+    (10033371, 'Pain'),
+    (10061218, 'Infection'),
+]
+
+DRUGS = [
+    ('Paracetamol', 500, 'mg'),
+    ('Ibuprofen', 400, 'mg'),
+    ('Amoxicillin', 875, 'mg'),
+    ('Metformin', 1000, 'mg'),
+    ('Lisinopril', 10, 'mg'),
+    ('Atorvastatin', 20, 'mg'),
+    ('Omeprazole', 20, 'mg'),
+    ('Insulin glargine', 20, '[iU]'),
+]
+
+COUNTRIES = ['DE', 'FR', 'GB', 'IT', 'RU', 'US']
+
+WORDS = (
+    'patient reported symptoms after taking the medication which resolved within several days '
+    'of treatment discontinuation no relevant medical history was reported laboratory tests were '
+    'within normal limits the reporter considered the event related to the suspect drug'
+).split()
+
+
+@dc.dataclass
+class CorpusParams:
+    """Size of generated cases, every count is the number of items per case."""
+    drugs: int = 2
+    reactions: int = 2
+    dosages: int = 1
+    # Number of words in H.1
+    narrative_words: int = 100
+
+
+class CorpusGenerator:
+    """
+    Generates random, but well-formed ICSRs and renders them into multi-ICSR batches
+    with ExportMultipleXmlView.render_fragment, so the files contain exactly the fields
+    supported by the export and are accepted by the import.
+    Generation is deterministic for the given seed.
+    """
+
+    def __init__(self, params: CorpusParams, seed: int = 0, sender_id: str = 'E2B4FREE') -> None:
+        self.params = params
+        self.random = random.Random(seed)
+        self.sender_id = sender_id
+        self.start_date = datetime(2020, 1, 1)
+
+    def make_icsr(self, case_number: int) -> api_models.ICSR:
+        country = self.random.choice(COUNTRIES)
+        case_id = f'{country}-{self.sender_id}-{case_number:08}'
+        report_date = self.start_date + timedelta(days=self.random.randrange(365 * 4))
+        reaction_terms = [self.random.choice(REACTION_TERMS) for _ in range(self.params.reactions)]
+
+        return api_models.ICSR.model_validate({
+            'c_1_identification_case_safety_report': {
+                'c_1_1_sender_safety_report_unique_id': {'value': case_id},
+                'c_1_2_date_creation': {'value': report_date.strftime('%Y%m%d%H%M%S')},
+                'c_1_3_type_report': {'value': enums.C_1_3_type_report.SPONTANEOUS_REPORT},
+                'c_1_4_date_report_first_received_source': {'value': self.format_date(report_date, -10)},
+                'c_1_5_date_most_recent_information': {'value': self.format_date(report_date, -1)},
+                'c_1_6_1_additional_documents_available': {'value': False},
+                'c_1_7_fulfil_local_criteria_expedited_report': {'value': True},
+                'c_1_8_1_worldwide_unique_case_identification_number': {'value': case_id},
+                'c_1_8_2_first_sender': {'value': enums.C_1_8_2_first_sender.OTHER},
+            },
+            'c_2_r_primary_source_information': [{
+                'c_2_r_1_2_reporter_given_name': {'value': 'John'},
+                'c_2_r_1_4_reporter_family_name': {'value': f'Reporter{case_number}'},
+                'c_2_r_3_reporter_country_code': {'value': country},
+                'c_2_r_4_qualification': {'value': enums.C_2_r_4_qualification.PHYSICIAN},
+                'c_2_r_5_primary_source_regulatory_purposes': {
+                    'value': enums.C_2_r_5_primary_source_regulatory_purposes.PRIMARY
+                },
+            }],
+            'c_3_information_sender_case_safety_report': {
+                'c_3_1_sender_type': {'value': enums.C_3_1_sender_type.PHARMACEUTICAL_COMPANY},
+                'c_3_2_sender_organisation': {'value': self.sender_id},
+                'c_3_4_5_sender_country_code': {'value': country},
+            },
+            'd_patient_characteristics': {
+                'd_1_patient': {'value': f'P{case_number}'},
+                'd_2_2a_age_onset_reaction_num': {'value': self.random.randint(18, 90)},
+                'd_2_2b_age_onset_reaction_unit': {'value': 'a'},
+                'd_3_body_weight': {'value': self.random.randint(45, 120)},
+                'd_4_height': {'value': self.random.randint(150, 200)},
+                'd_5_sex': {'value': self.random.choice(list(enums.D_5_sex))},
+            },
+            'e_i_reaction_event': [
+                self.make_reaction(code, term, report_date, country) for code, term in reaction_terms
+            ],
+            'g_k_drug_information': [
+                self.make_drug(drug_index, report_date) for drug_index in range(self.params.drugs)
+            ],
+            'h_narrative_case_summary': {
+                'h_1_case_narrative': {'value': self.make_text(self.params.narrative_words)},
+                'h_3_r_sender_diagnosis_meddra_code': [{
+                    'h_3_r_1a_meddra_version_sender_diagnosis': {'value': MEDDRA_VERSION},
+                    'h_3_r_1b_sender_diagnosis_meddra_code': {'value': reaction_terms[0][0]},
+                }] if reaction_terms else [],
+            },
+        })
+
+    def make_reaction(self, code: int, term: str, report_date: datetime, country: str) -> dict[str, t.Any]:
+        return {
+            'e_i_1_1a_reaction_primary_source_native_language': {'value': term},
+            'e_i_1_1b_reaction_primary_source_language': {'value': 'eng'},
+            'e_i_2_1a_meddra_version_reaction': {'value': MEDDRA_VERSION},
+            'e_i_2_1b_reaction_meddra_code': {'value': code},
+            'e_i_4_date_start_reaction': {'value': self.format_date(report_date, -self.random.randint(11, 30))},
+            'e_i_7_outcome_reaction_last_observation': {
+                'value': self.random.choice(list(enums.E_i_7_outcome_reaction_last_observation))
+            },
+            'e_i_8_medical_confirmation_healthcare_professional': {'value': True},
+            'e_i_9_identification_country_reaction': {'value': country},
+        }
+
+    def make_drug(self, drug_index: int, report_date: datetime) -> dict[str, t.Any]:
+        name, dose, unit = self.random.choice(DRUGS)
+        indication_code, indication_term = self.random.choice(INDICATION_TERMS)
+        return {
+            'g_k_1_characterisation_drug_role': {
+                'value': enums.G_k_1_characterisation_drug_role.SUSPECT if drug_index == 0
+                else enums.G_k_1_characterisation_drug_role.CONCOMITANT
+            },
+            'g_k_2_2_medicinal_product_name_primary_source': {'value': name},
+            'g_k_4_r_dosage_information': [
+                {
+                    'g_k_4_r_1a_dose_num': {'value': dose},
+                    'g_k_4_r_1b_dose_unit': {'value': unit},
+                    'g_k_4_r_2_number_units_interval': {'value': 1},
+                    'g_k_4_r_3_definition_interval_unit': {'value': 'd'},
+                    'g_k_4_r_4_date_time_drug': {'value': self.format_date(report_date, -60 + dosage_index * 10)},
+                    'g_k_4_r_7_batch_lot_number': {'value': f'LOT{self.random.randrange(10 ** 6):06}'},
+                    'g_k_4_r_8_dosage_text': {'value': f'{dose} {unit} once daily'},
+                }
+                for dosage_index in range(self.params.dosages)
+            ],
+            'g_k_7_r_indication_use_case': [{
+                'g_k_7_r_1_indication_primary_source': {'value': indication_term},
+                'g_k_7_r_2a_meddra_version_indication': {'value': MEDDRA_VERSION},
+                'g_k_7_r_2b_indication_meddra_code': {'value': indication_code},
+            }],
+            'g_k_8_action_taken_drug': {'value': self.random.choice(list(enums.G_k_8_action_taken_drug))},
+        }
+
+    def make_text(self, word_count: int) -> str:
+        return ' '.join(self.random.choice(WORDS) for _ in range(word_count)).capitalize() + '.'
+
+    @staticmethod
+    def format_date(date: datetime, day_offset: int) -> str:
+        return (date + timedelta(days=day_offset)).strftime('%Y%m%d')
+
+    def generate_batch(self, view, first_case_number: int, case_count: int) -> t.Iterator[bytes]:
+        """Yields serialized batch of generated cases, view is ExportMultipleXmlView used for rendering."""
+        template = e2b_template.template_cache.get()
+        root = template.clone_batch()
+
+        # N.1.(2,3,4,5)
+        view.set_id_sender_receiver_creation_time(root)
+
+        head, tail = e2b_template.serialize_batch(root)
+        yield head
+        for case_number in range(first_case_number, first_case_number + case_count):
+            fragment = view.render_fragment(self.make_icsr(case_number), template)
+            yield e2b_fragment_cache.fill_placeholders(fragment)
+        yield tail
@@ -0,0 +1,114 @@
+import dataclasses as dc
+import typing as t
+
+from django.db import models as m
+from lxml import etree
+
+from app.src.layers.api.e2b import mapping as e2b_mapping
+from app.src.layers.storage.models import C_1_identification_case_safety_report
+
+
+# Returned by DuplicateChecker for cases that should update the stored ones
+FOLLOW_UP = 'follow-up'
+
+
+@dc.dataclass(frozen=True)
+class CaseIds:
+    # C.1.1
+    sender_id: str | None
+    # C.1.8.1
+    worldwide_id: str | None
+    # C.1.5
+    most_recent_date: str | None = None
+
+
+def read_case_ids(porr_elem: etree._Element) -> CaseIds:
+    """Reads case identifiers of the message part without converting it."""
+    return CaseIds(
+        sender_id=e2b_mapping.code_to_compiled_mapping['C.1.1'].read_value(porr_elem),
+        worldwide_id=e2b_mapping.code_to_compiled_mapping['C.1.8.1'].read_value(porr_elem),
+        most_recent_date=e2b_mapping.code_to_compiled_mapping['C.1.5'].read_value(porr_elem),
+    )
+
+
+def is_newer(date: str | None, other_date: str | None) -> bool:
+    """Compares E2B dates of different precision, missing date is never newer."""
+    if not date:
+        return False
+    if not other_date:
+        return True
+    # Timezone offset is ignored, only digits of the date and time are compared
+    return date[:14].ljust(14, '0') > other_date[:14].ljust(14, '0')
+
+
+def find_stored_cases(worldwide_ids: t.Iterable[str]) -> dict[str, tuple[int, int, str | None]]:
+    """Returns ICSR id, C.1 id and C.1.1 of the stored cases by C.1.8.1."""
+    rows = C_1_identification_case_safety_report.objects \
+        .filter(c_1_8_1_worldwide_unique_case_identification_number__in=set(worldwide_ids)) \
+        .values_list('c_1_8_1_worldwide_unique_case_identification_number', 'icsr_id', 'id', 'c_1_1_sender_safety_report_unique_id')
+    return {worldwide_id: (icsr_id, c_1_id, sender_id) for worldwide_id, icsr_id, c_1_id, sender_id in rows}
+
+
+class DuplicateChecker:
+    """
+    Finds message parts whose C.1.1 or C.1.8.1 is already stored or has been met earlier in the same file.
+    Identifiers of every batch are resolved with one query on unique indexed columns.
+    If follow-ups are accepted, a case with known C.1.8.1 and newer C.1.5 is not a duplicate but a follow-up.
+    """
+
+    def __init__(self, is_follow_up: bool = False) -> None:
+        self.is_follow_up = is_follow_up
+        # C.1.1 to C.1.8.1 of known cases
+        self.sender_to_worldwide_ids = {}
+        # C.1.8.1 to C.1.5 of the latest known version of cases
+        self.worldwide_id_to_dates = {}
+
+    def check_batch(self, case_ids_batch: t.Sequence[CaseIds]) -> list[str | None]:
+        """
+        Returns the code of the duplicated identifier for every case,
+        FOLLOW_UP for follow-ups or None if the case is new.
+        """
+        sender_ids = {case_ids.sender_id for case_ids in case_ids_batch if case_ids.sender_id}
+        worldwide_ids = {case_ids.worldwide_id for case_ids in case_ids_batch if case_ids.worldwide_id}
+        stored_ids = C_1_identification_case_safety_report.objects \
+            .filter(
+                m.Q(c_1_1_sender_safety_report_unique_id__in=sender_ids)
+                | m.Q(c_1_8_1_worldwide_unique_case_identification_number__in=worldwide_ids)
+            ) \
+            .values_list(
+                'c_1_1_sender_safety_report_unique_id',
+                'c_1_8_1_worldwide_unique_case_identification_number',
+                'c_1_5_date_most_recent_information'
+            )
+        for stored_case_ids in stored_ids:
+            self._remember(CaseIds(*stored_case_ids))
+
+        return [self._check(case_ids) for case_ids in case_ids_batch]
+
+    def _check(self, case_ids: CaseIds) -> str | None:
+        sender_id, worldwide_id = case_ids.sender_id, case_ids.worldwide_id
+        is_known_sender_id = bool(sender_id) and sender_id in self.sender_to_worldwide_ids
+        is_known_worldwide_id = bool(worldwide_id) and worldwide_id in self.worldwide_id_to_dates
+
+        if (
+            self.is_follow_up
+            and is_known_worldwide_id
+            # C.1.1 may stay the same or be new, but it can't belong to another case,
+            # new C.1.1 is not stored as C.1.1 of a stored case can't be changed (see update_follow_ups)
+            and (not is_known_sender_id or self.sender_to_worldwide_ids[sender_id] == worldwide_id)
+            and is_newer(case_ids.most_recent_date, self.worldwide_id_to_dates[worldwide_id])
+        ):
+            self._remember(case_ids)
+            return FOLLOW_UP
+        if is_known_sender_id:
+            return 'C.1.1'
+        if is_known_worldwide_id:
+            return 'C.1.8.1'
+        self._remember(case_ids)
+        return None
+
+    def _remember(self, case_ids: CaseIds) -> None:
+        if case_ids.sender_id:
+            self.sender_to_worldwide_ids[case_ids.sender_id] = case_ids.worldwide_id
+        if case_ids.worldwide_id:
+            self.worldwide_id_to_dates[case_ids.worldwide_id] = case_ids.most_recent_date
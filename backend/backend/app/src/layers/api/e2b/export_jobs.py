@@ -0,0 +1,120 @@
+from datetime import timedelta
+import logging
+import os
+import time
+import typing as t
+
+from django.conf import settings
+from django.core.exceptions import FieldError
+from django.db import models as m
+from django.db import transaction
+from django.utils import timezone as djtz
+
+from app.src.exceptions import UserError
+from app.src.layers.api.e2b import fragment_cache as e2b_fragment_cache
+from app.src.layers.api.e2b import template as e2b_template
+from app.src.layers.api.models.jobs import ExportJob
+from app.src.layers.storage.models import ICSR
+
+logger = logging.getLogger(__name__)
+
+# Progress is saved at most once per this number of seconds, so that it is kept fresh
+# regardless of how fast cases are rendered and how many of them are missing
+PROGRESS_INTERVAL = 5
+
+
+def find_icsr_ids(lookups: dict[str, t.Any]) -> list[int]:
+    """Returns ids of ICSRs matching Django lookups on ICSR in ascending order, all ids if there are no lookups."""
+    try:
+        return list(ICSR.objects.filter(**lookups).order_by('id').values_list('id', flat=True))
+    except (FieldError, ValueError, TypeError) as e:
+        raise UserError(f'Invalid filter: {e}')
+
+
+def claim_next_job() -> ExportJob | None:
+    """
+    Marks the oldest pending job as running and returns it.
+    Running jobs which haven't been updated for E2B_EXPORT_JOB_STALE_SECONDS are considered abandoned
+    by a dead worker and are claimed again. Locked rows are skipped, so several workers can poll concurrently.
+    """
+    stale_time = djtz.now() - timedelta(seconds=settings.E2B_EXPORT_JOB_STALE_SECONDS)
+    with transaction.atomic():
+        job = ExportJob.objects \
+            .select_for_update(skip_locked=True) \
+            .filter(m.Q(status=ExportJob.Status.PENDING) | m.Q(status=ExportJob.Status.RUNNING, updated_time__lt=stale_time)) \
+            .order_by('id') \
+            .first()
+        if job is None:
+            return None
+        job.status = ExportJob.Status.RUNNING
+        job.processed = 0
+        job.exported = 0
+        job.save()
+    return job
+
+
+def get_job_file_path(job: ExportJob) -> str:
+    return os.path.join(settings.E2B_EXPORT_JOBS_DIR, f'e2b_export_job_{job.id}.xml')
+
+
+def run_job(job: ExportJob, view) -> None:
+    """Writes the batch of the job ICSRs to the file, view is ExportMultipleXmlView used for rendering."""
+    file_path = get_job_file_path(job)
+    temp_file_path = file_path + '.part'
+    os.makedirs(settings.E2B_EXPORT_JOBS_DIR, exist_ok=True)
+
+    try:
+        template = e2b_template.template_cache.get()
+        root = template.clone_batch()
+
+        # N.1.(2,3,4,5)
+        view.set_id_sender_receiver_creation_time(root)
+
+        head, tail = e2b_template.serialize_batch(root)
+        icsr_ids = job.icsr_ids
+        with open(temp_file_path, 'wb') as file:
+            file.write(head)
+            fragments = e2b_fragment_cache.fragment_cache.get_fragments(icsr_ids, view.render_many)
+            progress_saved_time = time.monotonic()
+            for icsr_id, fragment in fragments:
+                file.write(fragment)
+                job.exported += 1
+                # Ids are yielded in order, so all previous ones have been processed
+                job.processed = icsr_ids.index(icsr_id, job.processed) + 1
+                if time.monotonic() - progress_saved_time >= PROGRESS_INTERVAL:
+                    job.save(update_fields=['processed', 'exported', 'updated_time'])
+                    progress_saved_time = time.monotonic()
+            file.write(tail)
+        os.replace(temp_file_path, file_path)
+
+        job.status = ExportJob.Status.DONE
+        job.processed = job.total
+        job.file_path = file_path
+    except Exception as e:
+        logger.exception(f'Export job {job.id} failed')
+        job.status = ExportJob.Status.FAILED
+        job.error = str(e)
+        if os.path.exists(temp_file_path):
+            os.remove(temp_file_path)
+
+    job.finished_time = djtz.now()
+    job.save()
+
+
+def delete_expired_files() -> int:
+    """
+    Deletes files of jobs finished more than E2B_EXPORT_JOB_RETENTION_SECONDS ago, returns their number.
+    Jobs themselves are kept, their file is reported as gone.
+    """
+    expiry_time = djtz.now() - timedelta(seconds=settings.E2B_EXPORT_JOB_RETENTION_SECONDS)
+    jobs = ExportJob.objects.filter(file_path__isnull=False, finished_time__lt=expiry_time)
+    deleted_count = 0
+    for job in jobs:
+        try:
+            os.remove(job.file_path)
+        except FileNotFoundError:
+            pass
+        job.file_path = None
+        job.save(update_fields=['file_path'])
+        deleted_count += 1
+    return deleted_count
@@ -0,0 +1,136 @@
+from datetime import datetime
+import functools
+import hashlib
+import inspect
+import typing as t
+import uuid
+
+from app.src.layers.api.e2b import mapping as e2b_mapping
+from app.src.layers.api.e2b import template as e2b_template
+from app.src.layers.storage.models import ICSRXmlFragment
+
+
+# Changes of the mapping table and of the walker of views are detected by get_renderer_digest,
+# the version should be increased only if rendering changes elsewhere (e.g. in API models)
+RENDERER_VERSION = 1
+
+# Values generated for every sent message are kept in cached fragments as placeholders
+MESSAGE_ID_PLACEHOLDER = 'e2b-placeholder-n-2-r-1'
+SENDER_DEVICE_ID_PLACEHOLDER = 'e2b-placeholder-n-2-r-2'
+RECEIVER_DEVICE_ID_PLACEHOLDER = 'e2b-placeholder-n-2-r-3'
+CREATION_TIME_PLACEHOLDER = 'e2b-placeholder-n-2-r-4'
+
+
+def fill_placeholders(fragment: bytes) -> bytes:
+    for placeholder in [MESSAGE_ID_PLACEHOLDER, SENDER_DEVICE_ID_PLACEHOLDER, RECEIVER_DEVICE_ID_PLACEHOLDER]:
+        fragment = fragment.replace(placeholder.encode(), str(uuid.uuid4()).encode(), 1)
+    creation_time = datetime.now().strftime('%Y%m%d%H%M%S')
+    return fragment.replace(CREATION_TIME_PLACEHOLDER.encode(), creation_time.encode(), 1)
+
+
+@functools.cache
+def get_renderer_digest() -> str:
+    """Hash of the code rendering message parts: the mapping table with its export and the walker of views."""
+    # Imported here, because views use this module
+    from app.src.layers.api.views import ExportMultipleXmlView
+
+    sources = [
+        inspect.getsource(e2b_mapping),
+        inspect.getsource(ExportMultipleXmlView.render_fragment),
+        inspect.getsource(ExportMultipleXmlView.convert_single_to_xml),
+    ]
+    return hashlib.sha256(''.join(sources).encode()).hexdigest()
+
+
+def get_render_key() -> str:
+    """Identifies the renderer and the template the fragments are rendered with."""
+    return f'{RENDERER_VERSION}:{get_renderer_digest()}:{e2b_template.template_cache.get().digest}'
+
+
+class FragmentCache:
+    """
+    Stores rendered message parts of ICSRs with placeholders instead of per-message values.
+    Fragment is reused while neither ICSR revision nor render key changes, stale ones are rendered again.
+    """
+
+    CHUNK_SIZE = 500
+
+    def __init__(self, get_render_key: t.Callable[[], str]) -> None:
+        self.get_render_key = get_render_key
+
+    def get_fragments(
+        self,
+        icsr_ids: list[int],
+        render_many: t.Callable[[list[int]], t.Iterator[tuple[int, bytes]]]
+    ) -> t.Iterator[tuple[int, bytes]]:
+        """
+        Yields filled fragments in the order of ids, missing ICSRs are skipped.
+        render_many should yield fragments with placeholders in the order of given ids skipping missing ones.
+        """
+        render_key = self.get_render_key()
+        revisions = {}
+        fresh_ids = set()
+        for chunk in self._split(icsr_ids):
+            rows = ICSRXmlFragment.objects.filter(icsr_id__in=chunk) \
+                .values_list('icsr_id', 'revision', 'rendered_revision', 'render_key')
+            for icsr_id, revision, rendered_revision, rendered_key in rows:
+                revisions[icsr_id] = revision
+                if revision == rendered_revision and rendered_key == render_key:
+                    fresh_ids.add(icsr_id)
+
+        stale_ids = [icsr_id for icsr_id in icsr_ids if icsr_id not in fresh_ids]
+        rendered = render_many(stale_ids)
+        next_rendered = next(rendered, None)
+
+        for chunk in self._split(icsr_ids):
+            cached = dict(
+                ICSRXmlFragment.objects
+                    .filter(icsr_id__in=[icsr_id for icsr_id in chunk if icsr_id in fresh_ids])
+                    .values_list('icsr_id', 'content')
+            )
+            new_fragments = {}
+
+            for icsr_id in chunk:
+                if icsr_id in fresh_ids:
+                    fragment = cached.get(icsr_id)
+                    if fragment is None:
+                        # ICSR has been updated after revisions were read
+                        fragment = next((fragment for _, fragment in render_many([icsr_id])), None)
+                        if fragment is None:
+                            continue
+                    yield icsr_id, fill_placeholders(bytes(fragment))
+                    continue
+
+                # Rendered ids follow the order of stale ids, ICSRs that don't exist are absent
+                if next_rendered is None or next_rendered[0] != icsr_id:
+                    continue
+                fragment = next_rendered[1]
+                next_rendered = next(rendered, None)
+                new_fragments[icsr_id] = ICSRXmlFragment(
+                    icsr_id=icsr_id,
+                    revision=revisions.get(icsr_id, 0),
+                    rendered_revision=revisions.get(icsr_id, 0),
+                    render_key=render_key,
+                    content=fragment
+                )
+                yield icsr_id, fill_placeholders(fragment)
+
+            self._store(list(new_fragments.values()))
+
+    @staticmethod
+    def _store(fragments: list[ICSRXmlFragment]) -> None:
+        # Revision is not updated, so a fragment of ICSR changed during rendering stays stale
+        ICSRXmlFragment.objects.bulk_create(
+            fragments,
+            update_conflicts=True,
+            unique_fields=['icsr'],
+            update_fields=['rendered_revision', 'render_key', 'content']
+        )
+
+    @classmethod
+    def _split(cls, icsr_ids: list[int]) -> t.Iterator[list[int]]:
+        for start in range(0, len(icsr_ids), cls.CHUNK_SIZE):
+            yield icsr_ids[start:start + cls.CHUNK_SIZE]
+
+
+fragment_cache = FragmentCache(get_render_key)
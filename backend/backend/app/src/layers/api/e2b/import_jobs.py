@@ -0,0 +1,124 @@
+from datetime import timedelta
+import itertools
+import logging
+import os
+import shutil
+import typing as t
+
+from django import http
+from django.conf import settings
+from django.db import models as m
+from django.db import transaction
+from django.utils import timezone as djtz
+
+from app.src.layers.api.models.jobs import ImportJob
+
+logger = logging.getLogger(__name__)
+
+# Uploads are written to the job directory in chunks of this size
+WRITE_CHUNK_SIZE = 1024 * 1024
+
+
+def get_job_dir(job: ImportJob) -> str:
+    return os.path.join(settings.E2B_IMPORT_JOBS_DIR, f'e2b_import_job_{job.id}')
+
+
+@transaction.atomic
+def create_job(
+    request: http.HttpRequest,
+    sources: list[tuple[str, t.Iterable[bytes]]],
+    is_validation: bool,
+    is_follow_up: bool
+) -> ImportJob:
+    """
+    Stores uploaded files, sources are names and chunks of the files.
+    Job becomes visible to workers only after all files are written.
+    """
+    job = ImportJob.objects.create(user=request.user, is_validation=is_validation, is_follow_up=is_follow_up)
+    job_dir = get_job_dir(job)
+    os.makedirs(job_dir, exist_ok=True)
+
+    files = []
+    for index, (name, chunks) in enumerate(sources):
+        path = os.path.join(job_dir, f'{index}.xml')
+        with open(path, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+        files.append({'name': name, 'path': path})
+
+    job.files = files
+    job.save(update_fields=['files'])
+    return job
+
+
+def claim_next_job() -> ImportJob | None:
+    """
+    Marks the oldest pending job as running and returns it.
+    Running jobs which haven't been updated for E2B_IMPORT_JOB_STALE_SECONDS are considered abandoned
+    by a dead worker and are claimed again, their progress is kept, so that they are resumed.
+    """
+    stale_time = djtz.now() - timedelta(seconds=settings.E2B_IMPORT_JOB_STALE_SECONDS)
+    with transaction.atomic():
+        job = ImportJob.objects \
+            .select_for_update(skip_locked=True) \
+            .filter(m.Q(status=ImportJob.Status.PENDING) | m.Q(status=ImportJob.Status.RUNNING, updated_time__lt=stale_time)) \
+            .order_by('id') \
+            .first()
+        if job is None:
+            return None
+        job.status = ImportJob.Status.RUNNING
+        job.save()
+    return job
+
+
+def run_job(job: ImportJob, view) -> None:
+    """
+    Imports the job files starting from the first message without saved result,
+    view is ImportMultipleXmlView used for the import.
+    """
+    try:
+        for file_index in range(job.processed_files, len(job.files)):
+            run_file(job, view, file_index)
+        job.status = ImportJob.Status.DONE
+        shutil.rmtree(get_job_dir(job), ignore_errors=True)
+    except Exception as e:
+        logger.exception(f'Import job {job.id} failed')
+        job.status = ImportJob.Status.FAILED
+        job.error = str(e)
+
+    job.finished_time = djtz.now()
+    job.save()
+
+
+def run_file(job: ImportJob, view, file_index: int) -> None:
+    file_data = job.files[file_index]
+    results_key = 'file_validation_status' if job.is_validation else 'icsr_results'
+    skipped_messages = job.processed_messages
+    saved_results = job.results[file_index][results_key] if file_index < len(job.results) else []
+
+    def save_results(file_result: dict[str, t.Any], processed_messages: int, processed_files: int) -> None:
+        del job.results[file_index:]
+        job.results.append(file_result)
+        job.processed_messages = processed_messages
+        job.processed_files = processed_files
+        job.save(update_fields=['results', 'processed_messages', 'processed_files', 'updated_time'])
+
+    def on_progress(results: list[dict[str, t.Any]]) -> None:
+        save_results(
+            {'success': True, 'filename': file_data['name'], results_key: saved_results + results},
+            skipped_messages + len(results),
+            file_index
+        )
+
+    with open(file_data['path'], 'rb') as file:
+        porr_elements = itertools.islice(view.iterparse_messages(file), skipped_messages, None)
+        file_result = view.import_file(
+            porr_elements, file_data['name'], job.is_validation, job.is_follow_up, on_progress
+        )
+
+    if file_result.get('success'):
+        file_result[results_key] = saved_results + file_result[results_key]
+    elif saved_results:
+        # All messages had been processed before the job was resumed
+        file_result = {'success': True, 'filename': file_data['name'], results_key: saved_results}
+    save_results(file_result, 0, file_index + 1)
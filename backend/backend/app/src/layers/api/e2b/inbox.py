@@ -0,0 +1,118 @@
+import fcntl
+import json
+import logging
+import os
+from pathlib import Path
+import shutil
+import time
+import typing as t
+import uuid
+
+from django.utils import timezone as djtz
+
+logger = logging.getLogger(__name__)
+
+PROCESSING_DIR = 'processing'
+DONE_DIR = 'done'
+FAILED_DIR = 'failed'
+# Result of the import is written next to the moved file with this suffix
+RESULT_SUFFIX = '.result.json'
+# Every daemon holds a lock of its processing directory while it is alive
+LOCK_FILE_NAME = '.lock'
+
+
+class Inbox:
+    """
+    Directory where the gateway drops inbound batch files.
+    A file is claimed by renaming it to the own processing directory of the daemon, which is atomic,
+    so several daemons can watch the same inbox. Processed files are moved to done or failed subdirectories.
+    Processing directory is locked while the inbox is open, so that files of a live daemon are never recovered.
+    """
+
+    def __init__(self, path: Path, pattern: str = '*.xml', min_file_age: float = 0) -> None:
+        self.path = Path(path)
+        self.pattern = pattern
+        # Files modified more recently may be still being written by the gateway
+        self.min_file_age = min_file_age
+        for name in [PROCESSING_DIR, DONE_DIR, FAILED_DIR]:
+            os.makedirs(self.path / name, exist_ok=True)
+
+        self.processing_path = self.path / PROCESSING_DIR / uuid.uuid4().hex
+        os.makedirs(self.processing_path)
+        self._lock_file = open(self.processing_path / LOCK_FILE_NAME, 'w')
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+
+    def close(self) -> None:
+        """Releases the processing directory, files left in it are recovered by the next daemon."""
+        fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+        self._lock_file.close()
+
+    def recover(self) -> list[Path]:
+        """Returns files left in processing directories of stopped daemons back to the inbox."""
+        recovered_paths = []
+        for processing_path in sorted((self.path / PROCESSING_DIR).iterdir()):
+            if processing_path == self.processing_path or not processing_path.is_dir():
+                continue
+            with open(processing_path / LOCK_FILE_NAME, 'a') as lock_file:
+                try:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    # Daemon is alive
+                    continue
+                for path in sorted(processing_path.glob(self.pattern)):
+                    inbox_path = self.path / path.name
+                    os.replace(path, inbox_path)
+                    recovered_paths.append(inbox_path)
+            shutil.rmtree(processing_path, ignore_errors=True)
+        return recovered_paths
+
+    def claim_files(self, limit: int | None = None) -> list[Path]:
+        """Moves ready files to the processing subdirectory in the order of their modification time."""
+        now = time.time()
+        ready_paths = []
+        for path in self.path.glob(self.pattern):
+            try:
+                modified_time = path.stat().st_mtime
+            except FileNotFoundError:
+                continue
+            if path.is_file() and now - modified_time >= self.min_file_age:
+                ready_paths.append((modified_time, path))
+        ready_paths.sort()
+
+        claimed_paths = []
+        for _, path in ready_paths:
+            if limit is not None and len(claimed_paths) >= limit:
+                break
+            # Time prefix keeps names unique when the gateway sends a file with the same name again
+            claimed_path = self.processing_path / f'{djtz.now().strftime("%Y%m%d%H%M%S%f")}_{path.name}'
+            try:
+                os.rename(path, claimed_path)
+            except FileNotFoundError:
+                # Claimed by another daemon
+                continue
+            claimed_paths.append(claimed_path)
+        return claimed_paths
+
+    def import_file(self, path: Path, view, is_follow_up: bool = False) -> bool:
+        """
+        Imports the claimed file with ImportMultipleXmlView and moves it to done or failed subdirectory.
+        The file is failed if it can't be parsed or has no message parts,
+        statuses of the message parts are written to the result file in both cases.
+        """
+        try:
+            with open(path, 'rb') as file:
+                file_result = view.import_file(view.iterparse_messages(file), path.name, False, is_follow_up)
+            is_ok = file_result.get('success', False)
+        except Exception as e:
+            logger.exception(f'Import of inbox file {path.name} failed')
+            file_result = {'success': False, 'filename': path.name, 'error': str(e)}
+            is_ok = False
+
+        self.finish(path, DONE_DIR if is_ok else FAILED_DIR, file_result)
+        return is_ok
+
+    def finish(self, path: Path, dir_name: str, file_result: dict[str, t.Any]) -> None:
+        target_path = self.path / dir_name / path.name
+        with open(target_path.with_name(target_path.name + RESULT_SUFFIX), 'w') as file:
+            json.dump(file_result, file, ensure_ascii=False, indent=2, default=str)
+        os.replace(path, target_path)
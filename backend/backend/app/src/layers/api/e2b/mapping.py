@@ -0,0 +1,444 @@
+import dataclasses as dc
+import decimal
+import enum
+import typing as t
+
+from lxml import etree
+
+from app.src.enums import NullFlavor as NF
+from app.src.layers.api.e2b.template import NAMESPACES
+from app.src.layers.api.models import icsr as icsr_models
+
+
+_INVESTIGATION_EVENT_PATH = 'hl7:controlActProcess/hl7:subject/hl7:investigationEvent'
+_C_3_PATH = _INVESTIGATION_EVENT_PATH + '/hl7:subjectOf1/hl7:controlActEvent/hl7:author/hl7:assignedEntity'
+_PLAYER_1_PATH = _INVESTIGATION_EVENT_PATH + \
+    '/hl7:component/hl7:adverseEventAssessment/hl7:subject1/hl7:primaryRole/hl7:player1'
+_PARENT_PATH = _PLAYER_1_PATH + '/hl7:role'
+_COMMENTS_PATH = _INVESTIGATION_EVENT_PATH + \
+    '/hl7:component/hl7:adverseEventAssessment/hl7:component1' + \
+    '/hl7:observationEvent[hl7:code/@code="10"][hl7:author/hl7:assignedEntity/hl7:code/@code="{}"]/hl7:value'
+
+
+def _investigation_characteristic_path(code: str) -> str:
+    return _INVESTIGATION_EVENT_PATH + f'/hl7:subjectOf2/hl7:investigationCharacteristic[hl7:code/@code="{code}"]/hl7:value'
+
+
+def _observation_event_path(code: str) -> str:
+    return _INVESTIGATION_EVENT_PATH + f'/hl7:component/hl7:observationEvent[hl7:code/@code="{code}"]/hl7:value'
+
+
+def _medical_record_number_path(code: str) -> str:
+    return _PLAYER_1_PATH + f'/hl7:asIdentifiedEntity[hl7:code/@code="{code}"]/hl7:id'
+
+
+def _parent_observation_path(code: str) -> str:
+    return _PARENT_PATH + f'/hl7:subjectOf2/hl7:observation[hl7:code/@code="{code}"]/hl7:value'
+
+
+# ICSR attributes holding single (not repeated) sections
+SECTIONS = {
+    'c_1_identification_case_safety_report': icsr_models.C_1_identification_case_safety_report,
+    'c_3_information_sender_case_safety_report': icsr_models.C_3_information_sender_case_safety_report,
+    'd_patient_characteristics': icsr_models.D_patient_characteristics,
+    'h_narrative_case_summary': icsr_models.H_narrative_case_summary,
+}
+
+
+@dc.dataclass(frozen=True)
+class FieldMapping:
+    """
+    Single E2B data element.
+    Path is relative to the message part (PORR_IN049016UV) and should match one element,
+    value is kept in the given attribute of this element or in its text if attribute is None.
+    """
+
+    code: str
+    section: str
+    field: str
+    path: str
+    attribute: str | None = None
+    is_nullable: bool = False
+    prefix: str | None = None
+
+
+# Table covers data elements with fixed position in the message part of C.1, C.3, D and H sections.
+# Every element is handled either here or by the hand-written walkers of views
+# (convert_single_to_xml, import_single_xml), never by both.
+# TODO: declare repeated sections (C.1.6.1.r, C.1.9.1.r, C.1.10.r, C.2.r, C.4.r, C.5.1.r, D.7.1.r, D.8.r,
+#  D.10.7.1.r, D.10.8.r, E.i, F.r, G.k, H.3.r, H.5.r), they need mappings relative to a repeated element,
+#  which is cloned from the template fragment on export, until then they are walked only by views.
+FIELD_MAPPINGS = [
+    FieldMapping(
+        'C.1.1', 'c_1_identification_case_safety_report', 'c_1_1_sender_safety_report_unique_id',
+        _INVESTIGATION_EVENT_PATH + '/hl7:id[@root="2.16.840.1.113883.3.989.2.1.3.1"]', 'extension'
+    ),
+    FieldMapping(
+        'C.1.2', 'c_1_identification_case_safety_report', 'c_1_2_date_creation',
+        'hl7:controlActProcess/hl7:effectiveTime', 'value'
+    ),
+    FieldMapping(
+        'C.1.3', 'c_1_identification_case_safety_report', 'c_1_3_type_report',
+        _investigation_characteristic_path('1'), 'code'
+    ),
+    FieldMapping(
+        'C.1.4', 'c_1_identification_case_safety_report', 'c_1_4_date_report_first_received_source',
+        _INVESTIGATION_EVENT_PATH + '/hl7:effectiveTime/hl7:low', 'value'
+    ),
+    FieldMapping(
+        'C.1.5', 'c_1_identification_case_safety_report', 'c_1_5_date_most_recent_information',
+        _INVESTIGATION_EVENT_PATH + '/hl7:availabilityTime', 'value'
+    ),
+    FieldMapping(
+        'C.1.6.1', 'c_1_identification_case_safety_report', 'c_1_6_1_additional_documents_available',
+        _observation_event_path('1'), 'value'
+    ),
+    FieldMapping(
+        'C.1.7', 'c_1_identification_case_safety_report', 'c_1_7_fulfil_local_criteria_expedited_report',
+        _observation_event_path('23'), 'value', is_nullable=True
+    ),
+    FieldMapping(
+        'C.1.8.1', 'c_1_identification_case_safety_report', 'c_1_8_1_worldwide_unique_case_identification_number',
+        _INVESTIGATION_EVENT_PATH + '/hl7:id[@root="2.16.840.1.113883.3.989.2.1.3.2"]', 'extension'
+    ),
+    FieldMapping(
+        'C.1.9.1', 'c_1_identification_case_safety_report', 'c_1_9_1_other_case_ids_previous_transmissions',
+        _investigation_characteristic_path('2'), 'value', is_nullable=True
+    ),
+    FieldMapping(
+        'C.1.11.1', 'c_1_identification_case_safety_report', 'c_1_11_1_report_nullification_amendment',
+        _investigation_characteristic_path('3'), 'code'
+    ),
+    FieldMapping(
+        'C.1.11.2', 'c_1_identification_case_safety_report', 'c_1_11_2_reason_nullification_amendment',
+        _investigation_characteristic_path('4') + '/hl7:originalText', is_nullable=True
+    ),
+
+    FieldMapping(
+        'C.3.1', 'c_3_information_sender_case_safety_report', 'c_3_1_sender_type',
+        _C_3_PATH + '/hl7:code', 'code'
+    ),
+    FieldMapping(
+        'C.3.2', 'c_3_information_sender_case_safety_report', 'c_3_2_sender_organisation',
+        _C_3_PATH + '/hl7:representedOrganization/hl7:assignedEntity/hl7:representedOrganization/hl7:name'
+    ),
+    FieldMapping(
+        'C.3.3.1', 'c_3_information_sender_case_safety_report', 'c_3_3_1_sender_department',
+        _C_3_PATH + '/hl7:representedOrganization/hl7:name'
+    ),
+    FieldMapping(
+        'C.3.3.2', 'c_3_information_sender_case_safety_report', 'c_3_3_2_sender_title',
+        _C_3_PATH + '/hl7:assignedPerson/hl7:name/hl7:prefix'
+    ),
+    FieldMapping(
+        'C.3.3.3', 'c_3_information_sender_case_safety_report', 'c_3_3_3_sender_given_name',
+        _C_3_PATH + '/hl7:assignedPerson/hl7:name/hl7:given[1]'
+    ),
+    FieldMapping(
+        'C.3.3.4', 'c_3_information_sender_case_safety_report', 'c_3_3_4_sender_middle_name',
+        _C_3_PATH + '/hl7:assignedPerson/hl7:name/hl7:given[2]'
+    ),
+    FieldMapping(
+        'C.3.3.5', 'c_3_information_sender_case_safety_report', 'c_3_3_5_sender_family_name',
+        _C_3_PATH + '/hl7:assignedPerson/hl7:name/hl7:family'
+    ),
+    FieldMapping(
+        'C.3.4.1', 'c_3_information_sender_case_safety_report', 'c_3_4_1_sender_street_address',
+        _C_3_PATH + '/hl7:addr/hl7:streetAddressLine'
+    ),
+    FieldMapping(
+        'C.3.4.2', 'c_3_information_sender_case_safety_report', 'c_3_4_2_sender_city',
+        _C_3_PATH + '/hl7:addr/hl7:city'
+    ),
+    FieldMapping(
+        'C.3.4.3', 'c_3_information_sender_case_safety_report', 'c_3_4_3_sender_state_province',
+        _C_3_PATH + '/hl7:addr/hl7:state'
+    ),
+    FieldMapping(
+        'C.3.4.4', 'c_3_information_sender_case_safety_report', 'c_3_4_4_sender_postcode',
+        _C_3_PATH + '/hl7:addr/hl7:postalCode'
+    ),
+    FieldMapping(
+        'C.3.4.5', 'c_3_information_sender_case_safety_report', 'c_3_4_5_sender_country_code',
+        _C_3_PATH + '/hl7:assignedPerson/hl7:asLocatedEntity/hl7:location/hl7:code', 'code'
+    ),
+    FieldMapping(
+        'C.3.4.6', 'c_3_information_sender_case_safety_report', 'c_3_4_6_sender_telephone',
+        _C_3_PATH + '/hl7:telecom[1]', 'value', prefix='tel'
+    ),
+    FieldMapping(
+        'C.3.4.7', 'c_3_information_sender_case_safety_report', 'c_3_4_7_sender_fax',
+        _C_3_PATH + '/hl7:telecom[2]', 'value', prefix='fax'
+    ),
+    FieldMapping(
+        'C.3.4.8', 'c_3_information_sender_case_safety_report', 'c_3_4_8_sender_email',
+        _C_3_PATH + '/hl7:telecom[3]', 'value', prefix='mailto'
+    ),
+
+    FieldMapping(
+        'D.1', 'd_patient_characteristics', 'd_1_patient',
+        _PLAYER_1_PATH + '/hl7:name', is_nullable=True
+    ),
+    FieldMapping(
+        'D.1.1.1', 'd_patient_characteristics', 'd_1_1_1_medical_record_number_source_gp',
+        _medical_record_number_path('1'), 'extension', is_nullable=True
+    ),
+    FieldMapping(
+        'D.1.1.2', 'd_patient_characteristics', 'd_1_1_2_medical_record_number_source_specialist',
+        _medical_record_number_path('2'), 'extension', is_nullable=True
+    ),
+    FieldMapping(
+        'D.1.1.3', 'd_patient_characteristics', 'd_1_1_3_medical_record_number_source_hospital',
+        _medical_record_number_path('3'), 'extension', is_nullable=True
+    ),
+    FieldMapping(
+        'D.1.1.4', 'd_patient_characteristics', 'd_1_1_4_medical_record_number_source_investigation',
+        _medical_record_number_path('4'), 'extension', is_nullable=True
+    ),
+    FieldMapping(
+        'D.2.1', 'd_patient_characteristics', 'd_2_1_date_birth',
+        _PLAYER_1_PATH + '/hl7:birthTime', 'value', is_nullable=True
+    ),
+    FieldMapping(
+        'D.5', 'd_patient_characteristics', 'd_5_sex',
+        _PLAYER_1_PATH + '/hl7:administrativeGenderCode', 'code', is_nullable=True
+    ),
+    FieldMapping(
+        'D.9.1', 'd_patient_characteristics', 'd_9_1_date_death',
+        _PLAYER_1_PATH + '/hl7:deceasedTime', 'value', is_nullable=True
+    ),
+    FieldMapping(
+        'D.10.1', 'd_patient_characteristics', 'd_10_1_parent_identification',
+        _PARENT_PATH + '/hl7:associatedPerson/hl7:name', is_nullable=True
+    ),
+    FieldMapping(
+        'D.10.2.1', 'd_patient_characteristics', 'd_10_2_1_date_birth_parent',
+        _PARENT_PATH + '/hl7:associatedPerson/hl7:birthTime', 'value', is_nullable=True
+    ),
+    FieldMapping(
+        'D.10.2.2a', 'd_patient_characteristics', 'd_10_2_2a_age_parent_num',
+        _parent_observation_path('3'), 'value'
+    ),
+    FieldMapping(
+        'D.10.2.2b', 'd_patient_characteristics', 'd_10_2_2b_age_parent_unit',
+        _parent_observation_path('3'), 'unit'
+    ),
+    FieldMapping(
+        'D.10.3', 'd_patient_characteristics', 'd_10_3_last_menstrual_period_date_parent',
+        _parent_observation_path('22'), 'value', is_nullable=True
+    ),
+    FieldMapping(
+        'D.10.4', 'd_patient_characteristics', 'd_10_4_body_weight_parent',
+        _parent_observation_path('7'), 'value'
+    ),
+    FieldMapping(
+        'D.10.5', 'd_patient_characteristics', 'd_10_5_height_parent',
+        _parent_observation_path('17'), 'value'
+    ),
+    FieldMapping(
+        'D.10.6', 'd_patient_characteristics', 'd_10_6_sex_parent',
+        _PARENT_PATH + '/hl7:associatedPerson/hl7:administrativeGenderCode', 'code', is_nullable=True
+    ),
+
+    FieldMapping(
+        'H.1', 'h_narrative_case_summary', 'h_1_case_narrative',
+        _INVESTIGATION_EVENT_PATH + '/hl7:text'
+    ),
+    FieldMapping(
+        'H.2', 'h_narrative_case_summary', 'h_2_reporter_comments',
+        _COMMENTS_PATH.format('3')
+    ),
+    FieldMapping(
+        'H.4', 'h_narrative_case_summary', 'h_4_sender_comments',
+        _COMMENTS_PATH.format('1')
+    ),
+]
+
+
+type Converter = t.Callable[[str, str | None], t.Any]
+
+
+def get_value_type(annotation: t.Any) -> t.Any:
+    """Returns T of Value[T] / NullableValue[T, N] annotation or None for other annotations."""
+    metadata = getattr(annotation, '__pydantic_generic_metadata__', None)
+    if not metadata or metadata['origin'] not in (icsr_models.Value, icsr_models.NullableValue):
+        return None
+    return metadata['args'][0]
+
+
+def make_converter(value_type: t.Any) -> Converter:
+    """Returns function converting raw xml string to the given value type."""
+    if t.get_origin(value_type) is t.Literal:
+        if t.get_args(value_type) == (True,):
+            return lambda value, field=None: True
+        return lambda value, field=None: value
+
+    if value_type in (int, str, decimal.Decimal):
+        return lambda value, field=None: value_type(value)
+
+    if value_type is bool:
+        def convert_bool(value: str, field: str | None = None) -> bool:
+            if value.lower() == 'true':
+                return True
+            elif value.lower() == 'false':
+                return False
+            raise TypeError(f'{field} must have bool type, {value} given')
+        return convert_bool
+
+    if isinstance(value_type, type) and issubclass(value_type, enum.IntEnum):
+        return lambda value, field=None: value_type(int(value))
+    if isinstance(value_type, type) and issubclass(value_type, enum.StrEnum):
+        return lambda value, field=None: value_type(value)
+    return lambda value, field=None: value
+
+
+class ConverterTable:
+    """
+    Converters of all Value / NullableValue fields of API models built once at startup,
+    so that the import only looks them up by model class and field name.
+    """
+
+    def __init__(self, model_classes: t.Iterable[type[icsr_models.ApiModel]]) -> None:
+        self._converters: dict[type, dict[str, Converter]] = {}
+        for model_class in model_classes:
+            class_converters = {}
+            for field_name, field_info in model_class.model_fields.items():
+                value_type = get_value_type(field_info.annotation)
+                if value_type is not None:
+                    class_converters[field_name] = make_converter(value_type)
+            self._converters[model_class] = class_converters
+
+    def get(self, model_class: type, field_name: str) -> Converter:
+        try:
+            return self._converters[model_class][field_name]
+        except KeyError:
+            raise ValueError(f'{model_class.__name__}.{field_name} is not a value field')
+
+
+def get_api_model_classes() -> list[type[icsr_models.ApiModel]]:
+    return [
+        value for value in vars(icsr_models).values()
+        if isinstance(value, type) and issubclass(value, icsr_models.ApiModel) and value is not icsr_models.ApiModel
+    ]
+
+
+converter_table = ConverterTable(get_api_model_classes())
+
+
+class CompiledFieldMapping:
+    """FieldMapping with precompiled XPath and getter / setter specialised for the field type."""
+
+    def __init__(self, mapping: FieldMapping) -> None:
+        self.mapping = mapping
+        self._xpath = etree.XPath(mapping.path, namespaces=NAMESPACES, smart_strings=False)
+
+        section_class = SECTIONS[mapping.section]
+        self._convert = converter_table.get(section_class, mapping.field)
+
+        self._from_raw = lambda value: value
+        self._to_raw = lambda value: str(value)
+        if mapping.prefix is not None:
+            prefix_length = len(mapping.prefix) + 1
+            self._from_raw = lambda value: value[prefix_length:]
+            self._to_raw = lambda value: f'{mapping.prefix}:{value}'
+
+    def find(self, root: etree._Element) -> etree._Element | None:
+        elements = self._xpath(root)
+        return elements[0] if elements else None
+
+    def export_value(self, root: etree._Element, section: t.Any) -> None:
+        field_value = getattr(section, self.mapping.field, None)
+        if field_value is None:
+            return
+
+        key = self.mapping.attribute
+        raw_value = str(field_value.value)
+        if self.mapping.is_nullable and getattr(field_value, 'null_flavor', None) is not None:
+            key = 'nullFlavor'
+            raw_value = str(field_value.null_flavor.value)
+        elif raw_value != 'None':
+            raw_value = self._to_raw(raw_value)
+        if raw_value == 'None':
+            return
+
+        element = self.find(root)
+        if element is None:
+            return
+        if key is None:
+            element.text = raw_value
+        else:
+            element.set(key, raw_value)
+
+    def import_value(self, root: etree._Element, section: t.Any) -> None:
+        element = self.find(root)
+        if element is None:
+            return
+
+        if self.mapping.is_nullable:
+            null_flavor = element.get('nullFlavor')
+            if null_flavor is not None:
+                setattr(section, self.mapping.field, getattr(NF, null_flavor))
+                return
+
+        value = self.read_raw_value(element)
+        if value is not None:
+            setattr(section, self.mapping.field, self._convert(self._from_raw(value), self.mapping.field))
+
+    def read_raw_value(self, element: etree._Element) -> str | None:
+        key = self.mapping.attribute
+        if key is not None and element.get(key) is not None:
+            return element.get(key)
+        if element.text is not None:
+            return element.text.strip()
+        return None
+
+    def read_value(self, root: etree._Element) -> t.Any:
+        """Returns converted value of the field without setting it, null flavors are not read."""
+        element = self.find(root)
+        if element is None:
+            return None
+        value = self.read_raw_value(element)
+        if value is None:
+            return None
+        return self._convert(self._from_raw(value), self.mapping.field)
+
+
+def compile_mappings(mappings: list[FieldMapping]) -> dict[str, list[CompiledFieldMapping]]:
+    """Groups compiled mappings by ICSR section attribute."""
+    compiled = {section: [] for section in SECTIONS}
+    declared_fields = set()
+    for mapping in mappings:
+        if (mapping.section, mapping.field) in declared_fields:
+            raise ValueError(f'{mapping.section}.{mapping.field} is declared more than once')
+        declared_fields.add((mapping.section, mapping.field))
+        compiled[mapping.section].append(CompiledFieldMapping(mapping))
+    return compiled
+
+
+compiled_mappings = compile_mappings(FIELD_MAPPINGS)
+code_to_compiled_mapping = {
+    compiled_mapping.mapping.code: compiled_mapping
+    for section_mappings in compiled_mappings.values()
+    for compiled_mapping in section_mappings
+}
+
+
+def export_fields(root: etree._Element, icsr: icsr_models.ICSR) -> None:
+    """Writes fields declared in FIELD_MAPPINGS to the message part, other fields are written by views."""
+    for section_name, section_mappings in compiled_mappings.items():
+        section = getattr(icsr, section_name)
+        if section is None:
+            continue
+        for compiled_mapping in section_mappings:
+            compiled_mapping.export_value(root, section)
+
+
+def import_fields(root: etree._Element, icsr: icsr_models.ICSR) -> None:
+    """
+    Reads fields declared in FIELD_MAPPINGS from the message part to the ICSR, other fields are read by views.
+    Single sections should already exist.
+    """
+    for section_name, section_mappings in compiled_mappings.items():
+        section = getattr(icsr, section_name)
+        for compiled_mapping in section_mappings:
+            compiled_mapping.import_value(root, section)
@@ -0,0 +1,193 @@
+import collections
+import concurrent.futures as cf
+import dataclasses as dc
+import itertools
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import typing as t
+
+import django
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+
+@dc.dataclass(frozen=True)
+class CaseError:
+    """Error of one case, is returned by workers instead of its result, so that other cases of the chunk are kept."""
+
+    message: str
+
+    @classmethod
+    def from_exception(cls, e: Exception) -> t.Self:
+        return cls(f'{e.__class__.__name__}: {e}')
+
+
+# Pools are shared by requests, so that workers are spawned and set up once per process
+_executors: dict[int, cf.ProcessPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(workers: int) -> cf.ProcessPoolExecutor:
+    """Returns the shared pool with the given number of workers, a broken pool is replaced by a new one."""
+    with _executors_lock:
+        executor = _executors.get(workers)
+        if executor is None:
+            # Spawned workers don't share the parent connections and locks of the request threads
+            executor = cf.ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(os.environ['DJANGO_SETTINGS_MODULE'],)
+            )
+            _executors[workers] = executor
+        return executor
+
+
+def discard_executor(workers: int, executor: cf.ProcessPoolExecutor) -> None:
+    with _executors_lock:
+        if _executors.get(workers) is executor:
+            del _executors[workers]
+    executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _init_worker(settings_module: str) -> None:
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    django.setup()
+
+
+def _render_shard(icsr_ids: list[int]) -> list[tuple[int, bytes | CaseError]]:
+    """Renders message parts of the existing ICSRs, returns their ids and serialized fragments or errors."""
+    # Imported here, because models and urls can be loaded only after django.setup() in the worker
+    from app.src.layers.api import models as api_models
+    from app.src.layers.api.e2b import template as e2b_template
+    from app.src.layers.api.views import ExportMultipleXmlView
+    from app.urls import domain_service_adapter
+
+    view = ExportMultipleXmlView(domain_service=domain_service_adapter, model_class=api_models.ICSR)
+    template = e2b_template.template_cache.get()
+
+    results = []
+    try:
+        for icsr in view.read_many(icsr_ids):
+            try:
+                results.append((icsr.id, view.render_fragment(icsr, template)))
+            except Exception as e:
+                results.append((icsr.id, CaseError.from_exception(e)))
+        return results
+    finally:
+        # Connections shouldn't stay open in idle workers
+        connections.close_all()
+
+
+def _parse_chunk(messages: list[bytes]) -> list[t.Any]:
+    """Converts serialized message parts to API ICSR models, messages which can't be converted get CaseError."""
+    from lxml import etree
+
+    from app.src.layers.api import models as api_models
+    from app.src.layers.api.views import ImportMultipleXmlView
+    from app.urls import domain_service_adapter
+
+    view = ImportMultipleXmlView(domain_service=domain_service_adapter, model_class=api_models.ICSR)
+    results = []
+    for message in messages:
+        try:
+            results.append(view.import_single_xml(etree.fromstring(message), api_models.ICSR()))
+        except Exception as e:
+            results.append(CaseError.from_exception(e))
+    return results
+
+
+class ParallelExportEngine:
+    """
+    Renders message parts (PORR_IN049016UV) of many ICSRs in a process pool.
+    Ids are split into shards, every shard is read and rendered by one worker,
+    results are returned in the order of ids. Cases which fail to render are logged and skipped as missing ones.
+    Number of shards in flight is limited, so rendered fragments wait for the consumer writing them.
+    """
+
+    MIN_SHARDS_PER_WORKER = 4
+    MAX_PENDING_SHARDS_PER_WORKER = 2
+
+    def __init__(self, workers: int | None = None, max_shard_size: int | None = None) -> None:
+        self.workers = workers or settings.E2B_EXPORT_WORKERS
+        self.max_shard_size = max_shard_size or settings.E2B_EXPORT_MAX_SHARD_SIZE
+
+    def split(self, icsr_ids: list[int]) -> list[list[int]]:
+        # Several shards per worker even out the difference in case sizes
+        shard_count = self.workers * self.MIN_SHARDS_PER_WORKER
+        shard_size = min(self.max_shard_size, max(1, math.ceil(len(icsr_ids) / shard_count)))
+        return [icsr_ids[start:start + shard_size] for start in range(0, len(icsr_ids), shard_size)]
+
+    def render(self, icsr_ids: list[int]) -> t.Iterator[list[tuple[int, bytes]]]:
+        shards = self.split(list(icsr_ids))
+        if not shards:
+            return
+
+        max_pending_shards = self.workers * self.MAX_PENDING_SHARDS_PER_WORKER
+        pending_shards = collections.deque()
+
+        executor = get_executor(self.workers)
+        try:
+            for shard in shards:
+                pending_shards.append(executor.submit(_render_shard, shard))
+                if len(pending_shards) >= max_pending_shards:
+                    yield self._get_fragments(pending_shards.popleft().result())
+            while pending_shards:
+                yield self._get_fragments(pending_shards.popleft().result())
+        except cf.BrokenExecutor:
+            discard_executor(self.workers, executor)
+            raise
+        finally:
+            # Shards of an abandoned export shouldn't occupy the shared workers
+            for future in pending_shards:
+                future.cancel()
+
+    @staticmethod
+    def _get_fragments(shard_results: list[tuple[int, bytes | CaseError]]) -> list[tuple[int, bytes]]:
+        shard_fragments = []
+        for icsr_id, result in shard_results:
+            if isinstance(result, CaseError):
+                logger.error(f'Error rendering ICSR {icsr_id}: {result.message}')
+                continue
+            shard_fragments.append((icsr_id, result))
+        return shard_fragments
+
+
+class ParallelImportEngine:
+    """
+    Converts message parts (PORR_IN049016UV) to API ICSR models in a process pool.
+    Messages are sent to workers in chunks and models are yielded in the order of messages,
+    CaseError is yielded instead of the model if the message can't be converted.
+    Number of chunks in flight is limited, so reading of the source waits for the consumer writing to the database.
+    """
+
+    MAX_PENDING_CHUNKS_PER_WORKER = 2
+
+    def __init__(self, workers: int | None = None, chunk_size: int | None = None) -> None:
+        self.workers = workers or settings.E2B_IMPORT_WORKERS
+        self.chunk_size = chunk_size or settings.E2B_IMPORT_CHUNK_SIZE
+
+    def parse(self, messages: t.Iterable[bytes]) -> t.Iterator[t.Any]:
+        max_pending_chunks = self.workers * self.MAX_PENDING_CHUNKS_PER_WORKER
+        pending_chunks = collections.deque()
+
+        executor = get_executor(self.workers)
+        try:
+            for chunk in itertools.batched(messages, self.chunk_size):
+                pending_chunks.append(executor.submit(_parse_chunk, list(chunk)))
+                if len(pending_chunks) >= max_pending_chunks:
+                    yield from pending_chunks.popleft().result()
+            while pending_chunks:
+                yield from pending_chunks.popleft().result()
+        except cf.BrokenExecutor:
+            discard_executor(self.workers, executor)
+            raise
+        finally:
+            # Chunks of an abandoned import shouldn't occupy the shared workers
+            for future in pending_chunks:
+                future.cancel()
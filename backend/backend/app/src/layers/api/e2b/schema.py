@@ -0,0 +1,67 @@
+import os
+import threading
+import typing as t
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from lxml import etree
+
+
+def is_enabled() -> bool:
+    return settings.E2B_SCHEMA_VALIDATION
+
+
+def check_files() -> None:
+    """Is called at startup, so that missing schema files are reported before any message is validated."""
+    if is_enabled() and not os.path.isfile(settings.E2B_SCHEMA_PATH):
+        raise ImproperlyConfigured(_get_missing_file_message(settings.E2B_SCHEMA_PATH))
+
+
+def _get_missing_file_message(path: os.PathLike) -> str:
+    return (
+        f'E2B schema file {path} is not found. Put the schemas of ICH E2B(R3) implementation package there, '
+        'set E2B_SCHEMA_PATH to their location or disable E2B_SCHEMA_VALIDATION'
+    )
+
+
+class E2BSchemaCache:
+    """
+    Compiles the message part schema (PORR_IN049016UV.xsd) and the schemas it includes once per thread,
+    as validation of the same XMLSchema in several threads isn't safe.
+    Schema is compiled again only if the file modification time changes.
+    Included files are resolved relative to the schema file and are never loaded from the network.
+    """
+
+    def __init__(self, path: os.PathLike) -> None:
+        self._path = path
+        self._local = threading.local()
+
+    def get(self) -> etree.XMLSchema:
+        try:
+            mtime = os.stat(self._path).st_mtime_ns
+        except FileNotFoundError:
+            raise ImproperlyConfigured(_get_missing_file_message(self._path))
+        if getattr(self._local, 'mtime', None) != mtime:
+            parser = etree.XMLParser(no_network=True)
+            self._local.schema = etree.XMLSchema(etree.parse(self._path, parser))
+            self._local.mtime = mtime
+        return self._local.schema
+
+
+def validate(message_part: etree._Element) -> list[dict[str, t.Any]]:
+    """
+    Returns schema errors of the message part (PORR_IN049016UV).
+    Line numbers are the ones of the parsed document, which the message part belongs to.
+    """
+    schema = schema_cache.get()
+    if schema.validate(message_part):
+        return []
+    return [{'line': error.line, 'message': error.message} for error in schema.error_log]
+
+
+def validate_fragment(fragment: bytes) -> list[dict[str, t.Any]]:
+    """Same as validate, but for the serialized message part, line numbers are counted from its start."""
+    return validate(etree.fromstring(fragment))
+
+
+schema_cache = E2BSchemaCache(settings.E2B_SCHEMA_PATH)
@@ -0,0 +1,131 @@
+import copy
+import dataclasses as dc
+import hashlib
+import os
+import threading
+import typing as t
+
+from django.conf import settings
+from lxml import etree
+
+
+NAMESPACES = {
+    'hl7': 'urn:hl7-org:v3',
+}
+
+TEMPLATE_PATH = settings.BASE_DIR / 'app' / 'templates' / 'E2B.xml'
+
+_INVESTIGATION_EVENT_PATH = 'hl7:controlActProcess/hl7:subject/hl7:investigationEvent'
+
+# Paths are relative to the message part (PORR_IN049016UV)
+ANCHOR_PATHS = {
+    # N.2.r
+    'id': 'hl7:id',
+    'creation_time': 'hl7:creationTime',
+    'sender_device_id': 'hl7:sender/hl7:device/hl7:id',
+    'receiver_device_id': 'hl7:receiver/hl7:device/hl7:id',
+
+    'investigation_event': _INVESTIGATION_EVENT_PATH,
+}
+
+# Same as ANCHOR_PATHS, but every path matches a list of elements
+ANCHOR_LIST_PATHS = {
+    'references': _INVESTIGATION_EVENT_PATH + '/hl7:reference',
+    'components': _INVESTIGATION_EVENT_PATH + '/hl7:component',
+    'outbound_relationships': _INVESTIGATION_EVENT_PATH + '/hl7:outboundRelationship',
+    'subject_of_1s': _INVESTIGATION_EVENT_PATH + '/hl7:subjectOf1',
+}
+
+
+@dc.dataclass
+class MessagePart:
+    element: etree._Element
+    anchors: dict[str, t.Any]
+
+
+class E2BTemplate:
+    """
+    Parsed E2B.xml split into the batch header and the message part (PORR_IN049016UV).
+    Positions of the anchor elements are saved as child index paths,
+    so that they are resolved in a clone without any search.
+    """
+
+    def __init__(self, tree: etree._ElementTree, digest: str = '') -> None:
+        # Hash of the template file, rendered message parts are valid only for the same template
+        self.digest = digest
+        root = tree.getroot()
+        found_message_part = root.find('hl7:PORR_IN049016UV', NAMESPACES)
+        # Copy is made before removal to keep the default namespace of the template
+        self._message_part = copy.deepcopy(found_message_part)
+        root.remove(found_message_part)
+        self._batch = root
+
+        self._anchor_index_paths = {}
+        for name, path in ANCHOR_PATHS.items():
+            element = self._message_part.find(path, NAMESPACES)
+            self._anchor_index_paths[name] = None if element is None else self._get_index_path(element)
+
+        self._anchor_list_index_paths = {}
+        for name, path in ANCHOR_LIST_PATHS.items():
+            elements = self._message_part.findall(path, NAMESPACES)
+            self._anchor_list_index_paths[name] = [self._get_index_path(element) for element in elements]
+
+    def clone_batch(self) -> etree._Element:
+        """Returns batch header without any message part."""
+        return copy.deepcopy(self._batch)
+
+    def clone_message_part(self) -> MessagePart:
+        element = copy.deepcopy(self._message_part)
+        anchors = {}
+        for name, index_path in self._anchor_index_paths.items():
+            anchors[name] = None if index_path is None else self._resolve_index_path(element, index_path)
+        for name, index_paths in self._anchor_list_index_paths.items():
+            anchors[name] = [self._resolve_index_path(element, index_path) for index_path in index_paths]
+        return MessagePart(element=element, anchors=anchors)
+
+    def _get_index_path(self, element: etree._Element) -> tuple[int, ...]:
+        index_path = []
+        while element is not self._message_part:
+            parent = element.getparent()
+            index_path.append(parent.index(element))
+            element = parent
+        return tuple(reversed(index_path))
+
+    @staticmethod
+    def _resolve_index_path(element: etree._Element, index_path: tuple[int, ...]) -> etree._Element:
+        for index in index_path:
+            element = element[index]
+        return element
+
+
+class E2BTemplateCache:
+    """Parses the template once per process and reparses it only if the file modification time changes."""
+
+    def __init__(self, path: os.PathLike) -> None:
+        self._path = path
+        self._lock = threading.Lock()
+        self._template = None
+        self._mtime = None
+
+    def get(self) -> E2BTemplate:
+        mtime = os.stat(self._path).st_mtime_ns
+        with self._lock:
+            if self._template is None or self._mtime != mtime:
+                with open(self._path, 'rb') as file:
+                    content = file.read()
+                parser = etree.XMLParser(remove_blank_text=False)
+                self._template = E2BTemplate(
+                    etree.ElementTree(etree.fromstring(content, parser)), hashlib.sha256(content).hexdigest()
+                )
+                self._mtime = mtime
+            return self._template
+
+
+def serialize_batch(batch: etree._Element) -> tuple[bytes, bytes]:
+    """Splits serialized batch header at its closing tag, so that message parts can be inserted in between."""
+    batch_bytes = etree.tostring(batch, xml_declaration=True, encoding='utf-8', pretty_print=True)
+    closing_tag_start = batch_bytes.rindex(b'</')
+    return batch_bytes[:closing_tag_start], batch_bytes[closing_tag_start:]
+
+
+template_cache = E2BTemplateCache(TEMPLATE_PATH)
@@ -0,0 +1,13 @@
+from django.db import models as m
+
+
+class InboundMessage(m.Model):
+    """Original message part (PORR_IN049016UV) of an import addressed by the hash of its canonical form."""
+
+    # Hex SHA-256 of the canonical XML
+    digest = m.CharField(primary_key=True, max_length=64)
+    # Original XML compressed with zlib
+    content = m.BinaryField()
+    received_time = m.DateTimeField(auto_now_add=True)
+    # ICSR created or updated by the message, backward relation is hidden, so that it is not treated as ICSR data
+    icsr = m.ForeignKey(to='ICSR', null=True, on_delete=m.SET_NULL, related_name='+')
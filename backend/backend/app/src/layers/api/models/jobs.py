@@ -0,0 +1,83 @@
+import typing as t
+
+from django.contrib.auth.models import User
+from django.db import models as m
+
+
+class ExportJob(m.Model):
+    class Status(m.TextChoices):
+        PENDING = 'pending'
+        RUNNING = 'running'
+        DONE = 'done'
+        FAILED = 'failed'
+
+    user = m.ForeignKey(to=User, on_delete=m.PROTECT)
+    status = m.CharField(choices=Status.choices, default=Status.PENDING)
+    icsr_ids = m.JSONField()
+    total = m.PositiveIntegerField()
+    processed = m.PositiveIntegerField(default=0)
+    exported = m.PositiveIntegerField(default=0)
+    file_path = m.CharField(null=True)
+    error = m.CharField(null=True)
+    created_time = m.DateTimeField(auto_now_add=True)
+    # Is also updated with progress, so that jobs of dead workers can be found
+    updated_time = m.DateTimeField(auto_now=True)
+    finished_time = m.DateTimeField(null=True)
+
+    @property
+    def progress(self) -> int:
+        """Percentage of processed ids."""
+        if not self.total:
+            return 100
+        return self.processed * 100 // self.total
+
+    def to_dict(self) -> dict[str, t.Any]:
+        return {
+            'id': self.id,
+            'status': self.status,
+            'total': self.total,
+            'processed': self.processed,
+            'exported': self.exported,
+            'progress': self.progress,
+            'error': self.error,
+            'created_time': self.created_time.isoformat(),
+            'finished_time': self.finished_time.isoformat() if self.finished_time else None,
+        }
+
+
+class ImportJob(m.Model):
+    Status = ExportJob.Status
+
+    user = m.ForeignKey(to=User, on_delete=m.PROTECT)
+    status = m.CharField(choices=Status.choices, default=Status.PENDING)
+    is_validation = m.BooleanField(default=False)
+    is_follow_up = m.BooleanField(default=False)
+    # Names and paths of the stored uploaded files
+    files = m.JSONField(default=list)
+    # Results of processed files in the format of ImportMultipleXmlView response, the last one may be partial
+    results = m.JSONField(default=list)
+    processed_files = m.PositiveIntegerField(default=0)
+    # Messages of the current file whose results are saved, processing is resumed after them
+    processed_messages = m.PositiveIntegerField(default=0)
+    error = m.CharField(null=True)
+    created_time = m.DateTimeField(auto_now_add=True)
+    # Is also updated with progress, so that jobs of dead workers can be found
+    updated_time = m.DateTimeField(auto_now=True)
+    finished_time = m.DateTimeField(null=True)
+
+    def to_dict(self, is_with_results: bool = False) -> dict[str, t.Any]:
+        job_dict = {
+            'id': self.id,
+            'status': self.status,
+            'validation': self.is_validation,
+            'follow_up': self.is_follow_up,
+            'total_files': len(self.files),
+            'processed_files': self.processed_files,
+            'processed_messages': self.processed_messages,
+            'error': self.error,
+            'created_time': self.created_time.isoformat(),
+            'finished_time': self.finished_time.isoformat() if self.finished_time else None,
+        }
+        if is_with_results:
+            job_dict['results'] = self.results
+        return job_dict
@@ -15,10 +15,17 @@ class Log(m.Model):
     status = m.IntegerField(null=True)
 
     @classmethod
-    def create_from_request(cls, request: http.HttpRequest) -> t.Self:
+    def create_from_request(cls, request: http.HttpRequest, is_body_logged: bool = True) -> t.Self:
         return cls.objects.create(
             user=request.user,
             path=request.path,
             method=request.method,
-            body=request.body.decode()
-        )
\ No newline at end of file
+            body=cls.get_body(request, is_body_logged)
+        )
+
+    @staticmethod
+    def get_body(request: http.HttpRequest, is_body_logged: bool = True) -> str:
+        # Uploaded files are not read here, so that views can process them as a stream
+        if not is_body_logged or request.content_type in ['application/xml', 'text/xml', 'multipart/form-data']:
+            return f'<{request.content_type}, {request.META.get("CONTENT_LENGTH")} bytes>'
+        return request.body.decode()
\ No newline at end of file
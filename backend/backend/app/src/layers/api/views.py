@@ -1,16 +1,14 @@
 import base64
-import builtins
+import collections
 import copy
 from datetime import datetime
+import itertools
 from extensions import utils
 import json
 from http import HTTPStatus
-import os
-import decimal
 import typing as t
 import traceback
 import uuid
-import enum
 from uuid import UUID
 
 
@@ -22,12 +20,23 @@ from django.utils import timezone as djtz
 from django.views import View
 from django.conf import settings
 from lxml import etree
-import xmltodict
 
 from app.src.connectors.api_domain.model_converters import DomainToApiModelConverter
 from app.src.connectors.domain_storage.model_converters import StorageToDomainModelConverter
 from app.src.exceptions import UserError
+from app.src.layers.api.document_cache import DocumentCache
+from app.src.layers.api.e2b import archive as e2b_archive
+from app.src.layers.api.e2b import duplicates as e2b_duplicates
+from app.src.layers.api.e2b import export_jobs as e2b_export_jobs
+from app.src.layers.api.e2b import fragment_cache as e2b_fragment_cache
+from app.src.layers.api.e2b import import_jobs as e2b_import_jobs
+from app.src.layers.api.e2b import mapping as e2b_mapping
+from app.src.layers.api.e2b import parallel as e2b_parallel
+from app.src.layers.api.e2b import schema as e2b_schema
+from app.src.layers.api.e2b import template as e2b_template
+from app.src.layers.api import xml_codec
 from app.src.layers.api.models import ApiModel, meddra, code_set
+from app.src.layers.api.models.jobs import ExportJob, ImportJob
 from app.src.layers.api.models.logging import Log
 from app.src.layers.base.services import (
     BusinessServiceProtocol, 
@@ -36,7 +45,6 @@ from app.src.layers.base.services import (
     MedDRAServiceProtocol
 )
 from app.src.enums import NullFlavor as NF
-import app.src.enums as enums
 from app.src.layers.api.models.icsr import (
     ICSR, C_1_identification_case_safety_report, C_1_6_1_r_documents_held_sender,
     C_1_9_1_r_source_case_id, C_1_10_r_identification_number_report_linked,
@@ -58,7 +66,7 @@ def log(method: t.Callable[[http.HttpRequest], http.HttpResponse]) \
 -> t.Callable[[http.HttpRequest], http.HttpResponse]:
     
     def wrapper(self: View, request: http.HttpRequest, *args, **kwargs) -> http.HttpResponse:
-        log = Log.create_from_request(request)
+        log = Log.create_from_request(request, is_body_logged=getattr(self, 'IS_BODY_LOGGED', True))
 
         exc = None
         try:
@@ -153,9 +161,11 @@ class BaseView(AuthView):
         return HTTPStatus.OK if is_ok else HTTPStatus.BAD_REQUEST
 
     def respond_with_model_as_json(self, model: ApiModel, status: HTTPStatus) -> http.HttpResponse:
+        return self.respond_with_json(self.dump_model_as_json(model), status)
+
+    def dump_model_as_json(self, model: ApiModel) -> str:
         # Dump data and ignore warnings about wrong data format and etc.
-        data = utils.exec_without_warnings(lambda: model.model_dump_json(by_alias=True))
-        return self.respond_with_json(data, status)
+        return utils.exec_without_warnings(lambda: model.model_dump_json(by_alias=True))
 
     def respond_with_object_as_json(self, obj: t.Any, status: HTTPStatus) -> http.HttpResponse:
         return self.respond_with_json(json.dumps(obj), status)
@@ -165,7 +175,16 @@ class BaseView(AuthView):
 
 
 class ModelClassView(BaseView):
+    # Query parameters of the list page, whole list is returned if none of them is given
+    PAGE_PARAMS = [
+        'limit', 'cursor', 'sort', 'serious', 'creation_date_from', 'creation_date_to',
+        'received_date_from', 'received_date_to', 'drug', 'reaction'
+    ]
+
     def get(self, request: http.HttpRequest) -> http.HttpResponse:
+        if any(param in request.GET for param in self.PAGE_PARAMS):
+            page = self.domain_service.list_page(self.model_class, request.GET.dict())
+            return self.respond_with_object_as_json(page, HTTPStatus.OK)
         result_list = self.domain_service.list(self.model_class)
         return self.respond_with_object_as_json(result_list, HTTPStatus.OK)
 
@@ -182,10 +201,18 @@ class ModelClassView(BaseView):
 
 
 class ModelInstanceView(BaseView):
+    # Snapshots of the models, they are read instead of the related tables if ICSR_DOCUMENT_SNAPSHOTS is set
+    document_cache: DocumentCache | None = None
+
     def get(self, request: http.HttpRequest, pk: int) -> http.HttpResponse:
+        if self.document_cache is not None and self.document_cache.is_enabled():
+            return self.respond_with_json(self.document_cache.get(pk, self.read_as_json), HTTPStatus.OK)
         model = self.domain_service.read(self.model_class, pk)
         return self.respond_with_model_as_json(model, HTTPStatus.OK)
 
+    def read_as_json(self, pk: int) -> str:
+        return self.dump_model_as_json(self.domain_service.read(self.model_class, pk))
+
     @log
     def put(self, request: http.HttpRequest, pk: int) -> http.HttpResponse:
         # TODO: check pk = model.id
@@ -218,40 +245,20 @@ class ModelBusinessValidationView(BaseView):
 class ModelToXmlView(BaseView):
     def post(self, request: http.HttpRequest) -> http.HttpResponse:
         model = self.get_model_from_request(request)
-        model_dict = model.model_dump()
-        self.extend_lists(model_dict)
-        model_dict = {self.model_class.__name__: model_dict}
-        result = xmltodict.unparse(model_dict)
+        result = xml_codec.encode(model)
         return http.HttpResponse(result, content_type='application/xml')
 
-    # Is needed to fix issue with single item list in xmltodict lib
-    @classmethod
-    def extend_lists(cls, model_dict: dict[str, t.Any]) -> None:
-        for value in model_dict.values():
-            if isinstance(value, dict):
-                cls.extend_lists(value)
-            if isinstance(value, list) and len(value) == 1:
-                value.append(dict())
-
 
 class ModelFromXmlView(BaseView):
     def post(self, request: http.HttpRequest) -> http.HttpResponse:
         xml = json.loads(request.body)['value']
-        model_dict = xmltodict.parse(xml)
-        model_dict = model_dict[self.model_class.__name__]
-        self.reduce_lists(model_dict)
+        try:
+            model_dict = xml_codec.decode(self.model_class, xml)
+        except (etree.XMLSyntaxError, ValueError) as e:
+            raise UserError(f'Invalid xml: {e}')
         model = self.model_class(**model_dict)
         return self.respond_with_model_as_json(model, HTTPStatus.OK)
 
-    # Is needed to fix issue with single item list in xmltodict lib
-    @classmethod
-    def reduce_lists(cls, model_dict: dict[str, t.Any]) -> None:
-        for value in model_dict.values():
-            if isinstance(value, dict):
-                cls.reduce_lists(value)
-            if isinstance(value, list) and len(value) == 2 and value[1] is None:
-                value.pop(1)
-
 
 class ModelCIOMSView(View):
     cioms_service: CIOMSServiceProtocol = ...
@@ -325,72 +332,91 @@ class CodeSetView(View):
 
 
 class ExportMultipleXmlView(BaseView):
+    # Number of rendering processes, E2B_EXPORT_WORKERS if not set
+    workers: int | None = None
+
     def post(self, request: http.HttpRequest) -> http.HttpResponse:
         try:
             data = json.loads(request.body)
             icsr_ids = data.get('ids', [])
             is_validation = data.get('validation', False)
+            is_stream = data.get('stream', False)
             
             if not icsr_ids:
                 return http.HttpResponse('No ICSR IDs provided', status=HTTPStatus.BAD_REQUEST)
+
+            if is_stream and not is_validation:
+                filename = f"e2b_export_{icsr_ids[0]}_{len(icsr_ids)}_records_{djtz.now().strftime('%Y%m%d%H%M%S')}.xml"
+
+                response = http.StreamingHttpResponse(
+                    self.stream_multiple_to_xml(icsr_ids),
+                    content_type='application/xml'
+                )
+                response['Content-Disposition'] = f'attachment; filename="{filename}"'
+                return response
             
+            if not is_validation:
+                rendered_ids, combined_xml = self.convert_multiple_to_xml(icsr_ids)
+                if not rendered_ids:
+                    return http.HttpResponse('None of the requested ICSRs could be retrieved', 
+                                            status=HTTPStatus.INTERNAL_SERVER_ERROR)
+
+                filename = f"e2b_export_{rendered_ids[0]}_{len(rendered_ids)}_records_{djtz.now().strftime('%Y%m%d%H%M%S')}.xml"
+
+                response = http.HttpResponse(combined_xml, content_type='application/xml')
+                response['Content-Disposition'] = f'attachment; filename="{filename}"'
+                return response
+
             icsr_list = []
             result_file = []
             results = []
-            for icsr_id in icsr_ids:
+            # Missing and unreadable ids are skipped by read_many
+            for icsr in self.read_many(icsr_ids):
                 try:
-                    icsr = self.domain_service.read(self.model_class, icsr_id)
-                    if is_validation:
-                        icsr, _ = self.domain_service.business_validate(icsr)
-                        def make_pretty_errors(errors):
-                            res = {}
-                            for k in errors:
-                                if not isinstance(errors[k], dict):
-                                    res[k] = errors[k]
-                                    continue
-                                pretty_res = make_pretty_errors(errors[k])
-                                if k not in ["_self", "buisness"]:
-                                    pretty_res_new = {}
-                                    for key, val in pretty_res.items():
-                                        pretty_res_new[f'{k}__{key}'] = val
-                                    pretty_res = pretty_res_new
-                                res.update(pretty_res)
-                            return res
-                        results.append({
-                            "success": True,
-                            "file_validation_status": [{
-                                "success": True,
-                                "C.1.1": icsr.c_1_identification_case_safety_report.c_1_1_sender_safety_report_unique_id["value"],
-                                "validation_status": make_pretty_errors(icsr.errors)
-                            }]
-                        })
+                    # Message part is rendered of the ICSR as it is read, before its values are replaced by validation
+                    schema_errors = self.validate_schema(icsr) if e2b_schema.is_enabled() else None
+                    icsr, _ = self.domain_service.business_validate(icsr)
+                    def make_pretty_errors(errors):
+                        res = {}
+                        for k in errors:
+                            if not isinstance(errors[k], dict):
+                                res[k] = errors[k]
+                                continue
+                            pretty_res = make_pretty_errors(errors[k])
+                            if k not in ["_self", "buisness"]:
+                                pretty_res_new = {}
+                                for key, val in pretty_res.items():
+                                    pretty_res_new[f'{k}__{key}'] = val
+                                pretty_res = pretty_res_new
+                            res.update(pretty_res)
+                        return res
+                    validation_status = {
+                        "success": True,
+                        "C.1.1": icsr.c_1_identification_case_safety_report.c_1_1_sender_safety_report_unique_id["value"],
+                        "validation_status": make_pretty_errors(icsr.errors)
+                    }
+                    if schema_errors is not None:
+                        validation_status["schema_errors"] = schema_errors
+                    results.append({
+                        "success": True,
+                        "file_validation_status": [validation_status]
+                    })
                     icsr_list.append(icsr)
                 except Exception as e:
-                    print(f"Error retrieving ICSR {icsr_id}: {str(e)}")
+                    print(f"Error retrieving ICSR {icsr.id}: {str(e)}")
                     continue
             
             if not icsr_list:
                 return http.HttpResponse('None of the requested ICSRs could be retrieved', 
                                         status=HTTPStatus.INTERNAL_SERVER_ERROR)
             
-            if not is_validation:
-                combined_xml = self.convert_multiple_to_xml(icsr_list)
-                
-                filename = f"e2b_export_{icsr_list[0].id}_{len(icsr_list)}_records_{djtz.now().strftime('%Y%m%d%H%M%S')}.xml"
-                
-                response = http.HttpResponse(combined_xml, content_type='application/xml')
-                response['Content-Disposition'] = f'attachment; filename="{filename}"'
-                return response
-
-            
-            else:
-                response_data = {
-                    "results": results,
-                    "total": len(icsr_ids),
-                    "successful": sum(1 for r in results if r.get("success", False)),
-                    "failed": sum(1 for r in results if not r.get("success", False))
-                }
-                return self.respond_with_object_as_json(response_data, HTTPStatus.OK)
+            response_data = {
+                "results": results,
+                "total": len(icsr_ids),
+                "successful": sum(1 for r in results if r.get("success", False)),
+                "failed": sum(1 for r in results if not r.get("success", False))
+            }
+            return self.respond_with_object_as_json(response_data, HTTPStatus.OK)
             
             
         except Exception as e:
@@ -423,38 +449,96 @@ class ExportMultipleXmlView(BaseView):
         ExportMultipleXmlView.find(root, 'creationTime').set("value", datetime.now().strftime('%Y%m%d%H%M%S'))
 
     
-    def convert_multiple_to_xml(self, icsr_list: list) -> str: 
-        parser = etree.XMLParser(remove_blank_text=False)
-        module_dir = os.path.dirname(os.path.abspath(__file__))
-        root_dir, _ = module_dir.split('/', 1)
-        E2B_tamplate = os.path.join(*[
-            root_dir,
-            'app',
-            'templates',
-            'E2B.xml'
-        ])
-        tree = etree.parse(E2B_tamplate, parser)
-        root = tree.getroot()
+    def convert_multiple_to_xml(self, icsr_ids: list) -> tuple[list[int], bytes]:
+        """Returns ids of the exported ICSRs, as missing ones are skipped, and the batch."""
+        template = e2b_template.template_cache.get()
+        root = template.clone_batch()
 
         # N.1.(2,3,4,5)
         self.set_id_sender_receiver_creation_time(root)
 
-        template_message_part = self.find(root, 'PORR_IN049016UV')
-        root.remove(template_message_part)
+        rendered_ids = []
+        fragments = []
+        for icsr_id, fragment in e2b_fragment_cache.fragment_cache.get_fragments(icsr_ids, self.render_many):
+            rendered_ids.append(icsr_id)
+            fragments.append(fragment)
 
-        for icsr in icsr_list:
-            template_copy = copy.deepcopy(template_message_part)
-            new_element = self.convert_single_to_xml(icsr, template_copy)
-            root.append(new_element)
+        head, tail = e2b_template.serialize_batch(root)
+        return rendered_ids, b''.join([head, *fragments, tail])
 
-        return etree.tostring(
-            tree,
-            xml_declaration=True,
-            encoding='utf-8',
-            pretty_print=True
-        )
+    def stream_multiple_to_xml(self, icsr_ids: list) -> t.Iterator[bytes]:
+        """
+        Same as convert_multiple_to_xml, but the batch is written incrementally:
+        ICSRs are read in chunks and every one is rendered and flushed separately,
+        so memory usage doesn't depend on the number of requested ids.
+        """
+        template = e2b_template.template_cache.get()
+        root = template.clone_batch()
 
-    def convert_single_to_xml(self, icsr, root):
+        # N.1.(2,3,4,5)
+        self.set_id_sender_receiver_creation_time(root)
+
+        head, tail = e2b_template.serialize_batch(root)
+        yield head
+        for _, fragment in e2b_fragment_cache.fragment_cache.get_fragments(icsr_ids, self.render_many):
+            yield fragment
+        yield tail
+
+    def render_many(self, icsr_ids: list) -> t.Iterator[tuple[int, bytes]]:
+        """
+        Yields ids and rendered message parts with placeholders (see fragment_cache) in the order of ids,
+        missing ICSRs are skipped. Large batches are rendered by E2B_EXPORT_WORKERS processes.
+        """
+        workers = self.workers or settings.E2B_EXPORT_WORKERS
+        if workers > 1 and len(icsr_ids) >= settings.E2B_EXPORT_PARALLEL_MIN_CASES:
+            for shard_fragments in e2b_parallel.ParallelExportEngine(workers=workers).render(icsr_ids):
+                yield from shard_fragments
+            return
+
+        template = e2b_template.template_cache.get()
+        for icsr in self.read_many(icsr_ids):
+            try:
+                fragment = self.render_fragment(icsr, template)
+            except Exception as e:
+                print(f"Error rendering ICSR {icsr.id}: {str(e)}")
+                continue
+            yield icsr.id, fragment
+
+    def read_many(self, icsr_ids: list) -> t.Iterator[ICSR]:
+        """
+        Yields ICSRs in the order of ids, missing ones and the ones which can't be read are skipped,
+        so that one broken case doesn't abort the whole export.
+        """
+        remaining_ids = list(icsr_ids)
+        while remaining_ids:
+            position = 0
+            try:
+                for icsr in self.domain_service.read_many(self.model_class, remaining_ids):
+                    position = remaining_ids.index(icsr.id, position) + 1
+                    yield icsr
+                return
+            except Exception:
+                pass
+
+            # Batch stopped at some case after the last yielded one, the next id is read separately,
+            # and the batch is resumed after it
+            icsr_id = remaining_ids[position]
+            remaining_ids = remaining_ids[position + 1:]
+            try:
+                yield self.domain_service.read(self.model_class, icsr_id)
+            except Exception as e:
+                print(f"Error retrieving ICSR {icsr_id}: {str(e)}")
+
+    def render_fragment(self, icsr, template: e2b_template.E2BTemplate) -> bytes:
+        element = self.convert_single_to_xml(icsr, template.clone_message_part())
+        return etree.tostring(element, encoding='utf-8', pretty_print=True)
+
+    def validate_schema(self, icsr) -> list[dict[str, t.Any]]:
+        """Returns schema errors of the message part as it is exported, line numbers are counted from its start."""
+        fragment = self.render_fragment(icsr, e2b_template.template_cache.get())
+        return e2b_schema.validate_fragment(e2b_fragment_cache.fill_placeholders(fragment))
+
+    def convert_single_to_xml(self, icsr, message_part: e2b_template.MessagePart):
         def set_icsr_field(root, key, obj, field, get_value=lambda x: str(x.value)):
             if obj is not None and hasattr(obj, field) and getattr(obj, field) is not None and get_value(getattr(obj, field)) != "None":
                 if key is not None:
@@ -476,8 +560,14 @@ class ExportMultipleXmlView(BaseView):
 
             return set_icsr_field(root, obj=obj, **params)
         
-        # N.2.r.(1,2,3,4)
-        self.set_id_sender_receiver_creation_time(root)
+        root = message_part.element
+        anchors = message_part.anchors
+
+        # N.2.r.(1,2,3,4) are generated for every sent message, see fragment_cache
+        anchors['id'].set('extension', e2b_fragment_cache.MESSAGE_ID_PLACEHOLDER)
+        anchors['sender_device_id'].set('extension', e2b_fragment_cache.SENDER_DEVICE_ID_PLACEHOLDER)
+        anchors['receiver_device_id'].set('extension', e2b_fragment_cache.RECEIVER_DEVICE_ID_PLACEHOLDER)
+        anchors['creation_time'].set("value", e2b_fragment_cache.CREATION_TIME_PLACEHOLDER)
 
         c1 = icsr.c_1_identification_case_safety_report
         c2 = icsr.c_2_r_primary_source_information
@@ -491,40 +581,14 @@ class ExportMultipleXmlView(BaseView):
         h = icsr.h_narrative_case_summary
 
         # N.2.r.1
-        set_icsr_field(self.find(root, 'id'), "extension", c1, "c_1_1_sender_safety_report_unique_id")
-
-        control_act_process = self.find(root, "controlActProcess")
-        # C.1.2
-        set_icsr_field(self.find(control_act_process, "effectiveTime"), 'value', c1, "c_1_2_date_creation")
-
-        investigationEvent = self.find(self.find(control_act_process, "subject"), "investigationEvent")
-        # C.1.1
-        set_icsr_field(self.find(investigationEvent, 'id[@root="2.16.840.1.113883.3.989.2.1.3.1"]'), "extension", c1, "c_1_1_sender_safety_report_unique_id")
-
-        # C.1.8.1
-        set_icsr_field(self.find(investigationEvent, 'id[@root="2.16.840.1.113883.3.989.2.1.3.2"]'), "extension", c1, "c_1_8_1_worldwide_unique_case_identification_number")
+        set_icsr_field(anchors['id'], "extension", c1, "c_1_1_sender_safety_report_unique_id")
 
-        # H.1
-        set_icsr_field(self.find(investigationEvent, 'text'), None, h, "h_1_case_narrative")
+        # Fixed position fields of C.1, C.3, D and H, the rest is walked below
+        e2b_mapping.export_fields(root, icsr)
 
-        # C.1.4
-        set_icsr_field(
-            self.find(self.find(investigationEvent, "effectiveTime"), "low"),
-            "value",
-            c1,
-            "c_1_4_date_report_first_received_source"
-        )
+        investigationEvent = anchors['investigation_event']
 
-        # C.1.5 
-        set_icsr_field(
-            self.find(investigationEvent, "availabilityTime"),
-            "value",
-            c1,
-            "c_1_5_date_most_recent_information"
-        )
-
-        references = self.find(investigationEvent, "reference")
-        for reference in references:
+        for reference in anchors['references']:
             document = self.find(reference, "document")
             codeDocument = self.find(document, "code").get("code")
             if codeDocument == 1:
@@ -545,92 +609,19 @@ class ExportMultipleXmlView(BaseView):
                     set_text_icsr_field_with_null(bibliographicDesignationText, None, c4, "c_4_r_1_literature_reference")
                     investigationEvent.append(reference_copy) 
             
-        components_big = self.find(investigationEvent, 'component')
-        for component_big in components_big:
+        for component_big in anchors['components']:
             adverseEventAssessment = self.find(component_big, "adverseEventAssessment")
             observationEvent = self.find(component_big, "observationEvent")
             if adverseEventAssessment is not None:
                 primaryRole = self.find(self.find(adverseEventAssessment, "subject1"), "primaryRole")
                 player1 = self.find(primaryRole, "player1")
                 
-                # D.1
-                set_text_icsr_field_with_null(self.find(player1, "name"), None, d, "d_1_patient")
-                
-                # D.5 
-                set_text_icsr_field_with_null(self.find(player1, "administrativeGenderCode"), "code", d, "d_5_sex")
-
-                # D.2.1
-                set_text_icsr_field_with_null(self.find(player1, "birthTime"), "value", d, "d_2_1_date_birth")
-
-                # D.9.1
-                set_text_icsr_field_with_null(self.find(player1, "deceasedTime"), "value", d, "d_9_1_date_death")
-
-                asIdentifiedEntitys = self.find(player1, "asIdentifiedEntity")
-                for asIdentifiedEntity in asIdentifiedEntitys:
-                    codeTmp = self.find(asIdentifiedEntity, "code").get("code")
-                    if codeTmp == "1":
-                        # D.1.1.1
-                        set_text_icsr_field_with_null(
-                            self.find(asIdentifiedEntity, "id"), 
-                            "extension",
-                            d, 
-                            "d_1_1_1_medical_record_number_source_gp"
-                        )
-                    elif codeTmp == "2":
-                        # D.1.1.2
-                        set_text_icsr_field_with_null(
-                            self.find(asIdentifiedEntity, "id"), 
-                            "extension",
-                            d, 
-                            "d_1_1_2_medical_record_number_source_specialist"
-                        )
-                    elif codeTmp == "3":
-                        # D.1.1.3
-                        set_text_icsr_field_with_null(
-                            self.find(asIdentifiedEntity, "id"), 
-                            "extension",
-                            d, 
-                            "d_1_1_3_medical_record_number_source_hospital"
-                        )
-                    elif codeTmp == "4":
-                        # D.1.1.4
-                        set_text_icsr_field_with_null(
-                            self.find(asIdentifiedEntity, "id"), 
-                            "extension",
-                            d, 
-                            "d_1_1_4_medical_record_number_source_investigation"
-                        )
-
                 role = self.find(player1, "role")
-                associatedPersonRole = self.find(role, "associatedPerson")
-                # D.10.1
-                set_text_icsr_field_with_null(self.find(associatedPersonRole, "name"), None, d, "d_10_1_parent_identification")
-                # D.10.6
-                set_text_icsr_field_with_null(self.find(associatedPersonRole, "administrativeGenderCode"), "code", d, "d_10_6_sex_parent")
-                # D.10.2.1
-                set_text_icsr_field_with_null(self.find(associatedPersonRole, "birthTime"), "value", d, "d_10_2_1_date_birth_parent")
-            
+                # D.10.1 - D.10.6 are declared in e2b_mapping
                 subjectOf2Roles = self.find(role, "subjectOf2")
                 for subjectOf2Role in subjectOf2Roles:
-                    observationSubjectOf2 = self.find(subjectOf2Role, "observation")
                     organizerSubjectOf2 = self.find(subjectOf2Role, "organizer")
-                    if observationSubjectOf2 is not None:
-                        codeObservationSubjectOf2 = self.find(observationSubjectOf2, "code").get("code")
-                        if codeObservationSubjectOf2 == "3":
-                            # D.10.2.2a
-                            set_icsr_field(self.find(observationSubjectOf2, "value"), "value", d, "d_10_2_2a_age_parent_num")
-                            # D.10.2.2b
-                            set_icsr_field(self.find(observationSubjectOf2, "value"), "unit", d, "d_10_2_2b_age_parent_unit")
-                        elif codeObservationSubjectOf2 == "22":
-                            # D.10.3
-                            set_text_icsr_field_with_null(self.find(observationSubjectOf2, "value"), "value", d, "d_10_3_last_menstrual_period_date_parent")
-                        elif codeObservationSubjectOf2 == "7":
-                            # D.10.4
-                            set_text_icsr_field_with_null(self.find(observationSubjectOf2, "value"), "value", d, "d_10_4_body_weight_parent")
-                        elif codeObservationSubjectOf2 == "17":
-                            # D.10.5
-                            set_text_icsr_field_with_null(self.find(observationSubjectOf2, "value"), "value", d, "d_10_5_height_parent")
-                    elif organizerSubjectOf2 is not None:
+                    if organizerSubjectOf2 is not None:
                         codeOrganizerSubjectOf2 = self.find(organizerSubjectOf2, "code").get("code")
                         if codeOrganizerSubjectOf2 == "1":
                             componentsSmall = self.find(organizerSubjectOf2, "component")
@@ -1280,25 +1271,7 @@ class ExportMultipleXmlView(BaseView):
                 components1 = self.find(adverseEventAssessment, "component1")
                 for component1 in components1:
                     codeTmp = self.find(self.find(component1, "observationEvent"), "code").get("code")
-                    if codeTmp == "10":
-                        codeLocal = self.find(self.find(self.find(self.find(component1, "observationEvent"), "author"), "assignedEntity"), "code").get("code")
-                        if codeLocal == "3":
-                            # H.2
-                            set_icsr_field(
-                                self.find(self.find(component1, "observationEvent"), "value"),
-                                None,
-                                h,
-                                "h_2_reporter_comments"
-                            )
-                        elif codeLocal == "1":
-                            # H.4
-                            set_icsr_field(
-                                self.find(self.find(component1, "observationEvent"), "value"),
-                                None,
-                                h,
-                                "h_4_sender_comments"
-                            )
-                    elif codeTmp == "15":
+                    if codeTmp == "15":
                         adverseEventAssessment.remove(component1)
                         for diagnosis_meddra_code in h.h_3_r_sender_diagnosis_meddra_code:
                             component1Copy = copy.deepcopy(component1)
@@ -1312,12 +1285,6 @@ class ExportMultipleXmlView(BaseView):
 
             elif observationEvent is not None:
                 codeObservationEvent = self.find(observationEvent, "code").get("code")
-                if codeObservationEvent == "1":
-                    # C.1.6.1
-                    set_icsr_field(self.find(observationEvent, "value"), "value", c1, "c_1_6_1_additional_documents_available")
-                if codeObservationEvent == "23":
-                    # C.1.7
-                    set_text_icsr_field_with_null(self.find(observationEvent, "value"), "value", c1, "c_1_7_fulfil_local_criteria_expedited_report")
                 if codeObservationEvent == "36":
                     investigationEvent.remove(component_big)
                     if h is not None:
@@ -1331,8 +1298,7 @@ class ExportMultipleXmlView(BaseView):
                             set_icsr_field(val, "language", case_summary, "h_5_r_1b_case_summary_reporter_comments_language")                            
                             investigationEvent.append(component_new)
                     
-        outboundRelationships = self.find(investigationEvent, 'outboundRelationship')
-        for outboundRelationship in outboundRelationships:
+        for outboundRelationship in anchors['outbound_relationships']:
             relatedInvestigation = self.find(outboundRelationship, "relatedInvestigation")
             codeRelatedInvestigation = self.find(relatedInvestigation, "code")
             if codeRelatedInvestigation.get("code") == "1":
@@ -1408,11 +1374,9 @@ class ExportMultipleXmlView(BaseView):
                     )
                     investigationEvent.append(outboundRelationshipCopy)                          
         
-        subjectOf1s = self.find(investigationEvent, 'subjectOf1')
-        for subjectOf1 in subjectOf1s:
+        for subjectOf1 in anchors['subject_of_1s']:
             controlActEventLocall = self.find(subjectOf1, "controlActEvent")
             idControlActEventLocall = self.find(controlActEventLocall, "id")
-            author = self.find(controlActEventLocall, "author")
             if idControlActEventLocall is not None:
                 investigationEvent.remove(subjectOf1)
                 if c1 is not None:
@@ -1424,163 +1388,138 @@ class ExportMultipleXmlView(BaseView):
                         # C.1.9.1.r.2
                         set_icsr_field(idControlActEventLocallCopy, "extension", documents_held_sender, "c_1_9_1_r_2_case_id")
                         investigationEvent.append(subjectOf1Copy)
-            elif author is not None:
-                assignedEntitySmall = self.find(author, "assignedEntity")
-                # C.3.1
-                set_icsr_field(self.find(assignedEntitySmall, "code"), "code", c3, "c_3_1_sender_type")
-                addr = self.find(assignedEntitySmall, "addr")
-                # C.3.4.1
-                set_icsr_field(self.find(addr, "streetAddressLine"), None, c3, "c_3_4_1_sender_street_address")
-                # C.3.4.2
-                set_icsr_field(self.find(addr, "city"), None, c3, "c_3_4_2_sender_city")
-                # C.3.4.3
-                set_icsr_field(self.find(addr, "state"), None, c3, "c_3_4_3_sender_state_province")
-                # C.3.4.4
-                set_icsr_field(self.find(addr, "postalCode"), None, c3, "c_3_4_4_sender_postcode")
-                telecoms = self.find(assignedEntitySmall, "telecom")
-                for telecom, pair in zip(telecoms, [
-                    ("c_3_4_6_sender_telephone", "tel"),
-                    ("c_3_4_7_sender_fax", "fax"),
-                    ("c_3_4_8_sender_email", "mailto")
-                ]):
-                    field, prefix = pair
-                    # C.3.4.6 / C.3.4.7 / C.3.4.8
-                    set_icsr_field(telecom, "value", c3, field, get_value=lambda x: f'{prefix}:{str(x.value)}' )
-                assignedPerson = self.find(assignedEntitySmall, "assignedPerson")
-                name = self.find(assignedPerson, "name")
-                # C.3.3.2
-                set_icsr_field(self.find(name, "prefix"), None, c3, "c_3_3_2_sender_title")
-                givens = self.find(name, "given")
-                for given, field in zip(givens, ["c_3_3_3_sender_given_name", "c_3_3_4_sender_middle_name"]):
-                    # C.3.3.3 / C.3.3.4
-                    set_icsr_field(given, None, c3, field)
-                # C.3.3.5
-                set_icsr_field(self.find(name, "family"), None, c3, "c_3_3_5_sender_family_name")
-                # 3.4.5
-                set_icsr_field(
-                    self.find(self.find(self.find(assignedPerson, "asLocatedEntity"), "location"), "code"),
-                    "code",
-                    c3,
-                    "c_3_4_5_sender_country_code"
-                )
-                representedOrganization = self.find(assignedEntitySmall, "representedOrganization")
-                # C.3.3.1
-                set_icsr_field(self.find(representedOrganization, "name"), None, c3, "c_3_3_1_sender_department")
-                # C.3.2
-                set_icsr_field(
-                    self.find(self.find(self.find(representedOrganization, "assignedEntity"), "representedOrganization"), "name"),
-                    None, 
-                    c3,
-                    "c_3_2_sender_organisation"
-                )
-
-        vars = self.find(investigationEvent, 'subjectOf2')
-        for var in vars:
-            var = self.find(var, 'investigationCharacteristic')
-            code = self.find(var, "code").get("code")
-            tmp_var = self.find(var,'value')
-            if code == "1":
-                # C.1.3
-                set_icsr_field(tmp_var, "code", c1, "c_1_3_type_report")
-            elif code == "2":
-                # C.1.9.1
-                set_text_icsr_field_with_null(tmp_var, "value", c1, "c_1_9_1_other_case_ids_previous_transmissions")
-            elif code == "3":
-                # C.1.11.1
-                set_icsr_field(tmp_var, "code", c1, "c_1_11_1_report_nullification_amendment")
-            elif code == "4":
-                # C.1.11.2
-                set_text_icsr_field_with_null(self.find(tmp_var, "originalText"), None, c1, "c_1_11_2_reason_nullification_amendment")
         return root                       
 
-    
-    @classmethod
-    def extend_lists(cls, model_dict: dict[str, t.Any]) -> None:
-        for key, value in model_dict.items():
-            if isinstance(value, dict):
-                cls.extend_lists(value)
-            if isinstance(value, list) and len(value) == 1:
-                value.append(dict())
+
+class ExportJobListView(BaseView):
+    def get(self, request: http.HttpRequest) -> http.HttpResponse:
+        jobs = ExportJob.objects.filter(user=request.user).order_by('-id')
+        return self.respond_with_object_as_json([job.to_dict() for job in jobs], HTTPStatus.OK)
+
+    @log
+    def post(self, request: http.HttpRequest) -> http.HttpResponse:
+        data = json.loads(request.body)
+        # Filter is resolved to ids when the job is submitted, so that the job exports a fixed set of ICSRs
+        if 'filter' in data:
+            if not isinstance(data['filter'], dict):
+                return http.HttpResponse('Filter should be an object of ICSR lookups', status=HTTPStatus.BAD_REQUEST)
+            icsr_ids = e2b_export_jobs.find_icsr_ids(data['filter'])
+            if not icsr_ids:
+                return http.HttpResponse('There are no ICSRs matching the filter', status=HTTPStatus.BAD_REQUEST)
+        else:
+            icsr_ids = data.get('ids', [])
+            if not icsr_ids or not all(isinstance(icsr_id, int) for icsr_id in icsr_ids):
+                return http.HttpResponse('List of ICSR IDs or a filter should be provided', status=HTTPStatus.BAD_REQUEST)
+
+        # Rendering is done by run_export_jobs worker
+        job = ExportJob.objects.create(user=request.user, icsr_ids=icsr_ids, total=len(icsr_ids))
+        return self.respond_with_object_as_json(job.to_dict(), HTTPStatus.ACCEPTED)
+
+
+class ExportJobView(BaseView):
+    def get(self, request: http.HttpRequest, pk: int) -> http.HttpResponse:
+        job = self.get_job(request, pk)
+        return self.respond_with_object_as_json(job.to_dict(), HTTPStatus.OK)
+
+    @staticmethod
+    def get_job(request: http.HttpRequest, pk: int) -> ExportJob:
+        try:
+            return ExportJob.objects.get(pk=pk, user=request.user)
+        except ExportJob.DoesNotExist:
+            raise UserError(f"Export job with id {pk} doesn't exist")
+
+
+class ExportJobFileView(BaseView):
+    def get(self, request: http.HttpRequest, pk: int) -> http.HttpResponse:
+        job = ExportJobView.get_job(request, pk)
+        if job.status != ExportJob.Status.DONE:
+            return http.HttpResponse(f'Export job is {job.status}', status=HTTPStatus.CONFLICT)
+
+        # File is deleted after the retention time or could have been removed from disk
+        try:
+            file = open(job.file_path, 'rb') if job.file_path is not None else None
+        except FileNotFoundError:
+            file = None
+        if file is None:
+            return http.HttpResponse('Export job file is no longer available', status=HTTPStatus.GONE)
+
+        filename = f"e2b_export_job_{job.id}_{job.exported}_records_{job.finished_time.strftime('%Y%m%d%H%M%S')}.xml"
+        return http.FileResponse(
+            file,
+            as_attachment=True,
+            filename=filename,
+            content_type='application/xml'
+        )
+
+
+class ImportJobListView(BaseView):
+    # Uploaded files are stored by the job
+    IS_BODY_LOGGED = False
+
+    def get(self, request: http.HttpRequest) -> http.HttpResponse:
+        jobs = ImportJob.objects.filter(user=request.user).order_by('-id')
+        return self.respond_with_object_as_json([job.to_dict() for job in jobs], HTTPStatus.OK)
+
+    @log
+    def post(self, request: http.HttpRequest) -> http.HttpResponse:
+        """Accepts files in the same formats as ImportMultipleXmlView."""
+        if request.content_type in ImportMultipleXmlView.RAW_CONTENT_TYPES:
+            is_validation = request.GET.get('validation', 'false').lower() == 'true'
+            is_follow_up = request.GET.get('follow_up', 'false').lower() == 'true'
+            if request.content_type == 'multipart/form-data':
+                sources = [(file.name, file.chunks()) for file in request.FILES.values()]
+            else:
+                sources = [("file_0", iter(lambda: request.read(e2b_import_jobs.WRITE_CHUNK_SIZE), b''))]
+        else:
+            data = json.loads(request.body)
+            is_validation = data.get('validation', False)
+            is_follow_up = data.get('follow_up', False)
+            sources = [(f"file_{idx}", [content.encode('utf-8')]) for idx, content in enumerate(data.get('files', []))]
+
+        if not sources:
+            return http.HttpResponse('At least one file should be provided', status=HTTPStatus.BAD_REQUEST)
+
+        # Import is done by run_import_jobs worker
+        job = e2b_import_jobs.create_job(request, sources, is_validation, is_follow_up)
+        return self.respond_with_object_as_json(job.to_dict(), HTTPStatus.ACCEPTED)
+
+
+class ImportJobView(BaseView):
+    def get(self, request: http.HttpRequest, pk: int) -> http.HttpResponse:
+        try:
+            job = ImportJob.objects.get(pk=pk, user=request.user)
+        except ImportJob.DoesNotExist:
+            raise UserError(f"Import job with id {pk} doesn't exist")
+        return self.respond_with_object_as_json(job.to_dict(is_with_results=True), HTTPStatus.OK)
 
 
 class ImportMultipleXmlView(BaseView):
+    # Bodies of these types are parsed as a stream, see post_raw
+    RAW_CONTENT_TYPES = ['application/xml', 'text/xml', 'multipart/form-data']
+    MESSAGE_TAG = '{urn:hl7-org:v3}PORR_IN049016UV'
+    # ICSRs are created with bulk queries in batches of this size
+    IMPORT_BATCH_SIZE = 100
+    # Original messages are kept in the archive (see e2b.archive)
+    IS_BODY_LOGGED = False
+    # Number of conversion processes, E2B_IMPORT_WORKERS if not set
+    workers: int | None = None
+
     @log
     def post(self, request: http.HttpRequest) -> http.HttpResponse:
         try:
+            if request.content_type in self.RAW_CONTENT_TYPES:
+                return self.post_raw(request)
+
             files_data = json.loads(request.body)
             xml_contents = files_data.get('files', [])
             is_validation = files_data.get('validation', False)
+            is_follow_up = files_data.get('follow_up', False)
             results = []
             for idx, xml_content in enumerate(xml_contents):
                 root = etree.fromstring(xml_content.encode('utf-8'))
-                
-                porr_elements = self.find(root, "PORR_IN049016UV")
-                
-                if porr_elements is None:
-                    results.append({
-                        "success": False,
-                        "filename": f"file_{idx}",
-                        "error": "PORR_IN049016UV element not found"
-                    })
-                    continue
-                icsr_statuses = []
-                result_file = []
-                for i, porr_elem in enumerate((porr_elements if isinstance(porr_elements, list) else [porr_elements]), start=1):
-                    icsr = ICSR()
-                    icsr = self.import_single_xml(porr_elem, icsr)
-                    if is_validation:
-                        icsr, _ = self.domain_service.business_validate(icsr)
-                        def make_pretty_errors(errors):
-                            res = {}
-                            for k in errors:
-                                if not isinstance(errors[k], dict):
-                                    res[k] = errors[k]
-                                    continue
-                                pretty_res = make_pretty_errors(errors[k])
-                                if k not in ["_self", "buisness"]:
-                                    pretty_res_new = {}
-                                    for key, val in pretty_res.items():
-                                        pretty_res_new[f'{k}__{key}'] = val
-                                    pretty_res = pretty_res_new
-                                res.update(pretty_res)
-                            return res
-
-                        result_file.append({
-                            "success": True,
-                            "C.1.1": icsr.c_1_identification_case_safety_report.c_1_1_sender_safety_report_unique_id["value"],
-                            "validation_status": make_pretty_errors(icsr.errors)
-                        })
-                        continue
-                    c_1_1 = icsr.c_1_identification_case_safety_report.c_1_1_sender_safety_report_unique_id
-                    try:
-                        icsr, _ = self.domain_service.create(icsr)
-                        icsr_statuses.append({
-                            "sucsess": True,
-                            "info": f'An ICSR object with C.1.1 = {c_1_1} successfully created'
-                        })
-                    except IntegrityError as ex:
-                        icsr_statuses.append({
-                            "success": False,
-                            "info": f'C.1.1 = {c_1_1} already exists. This object was not created'
-                        })
-                if is_validation:
-                    results.append({
-                        "success": True,
-                        "file_validation_status": result_file,
-                    })
-                else:
-                    results.append({
-                        "success": True,
-                        "filename": f"file_{idx}",
-                        "icsr_results": icsr_statuses
-                    })
-            response_data = {
-                "results": results,
-                "total": len(xml_contents),
-                "successful": sum(1 for r in results if r.get("success", False)),
-                "failed": sum(1 for r in results if not r.get("success", False))
-            }
-            return self.respond_with_object_as_json(response_data, HTTPStatus.OK)
+                porr_elements = root.iterfind('hl7:PORR_IN049016UV', {'hl7': "urn:hl7-org:v3"})
+                results.append(self.import_file(porr_elements, f"file_{idx}", is_validation, is_follow_up))
+            return self.respond_with_results(results, len(xml_contents))
         except Exception as e:
 
             traceback.print_exc()
@@ -1588,6 +1527,345 @@ class ImportMultipleXmlView(BaseView):
             return http.HttpResponse(f'Error processing request: {str(e)}', 
                                     status=HTTPStatus.INTERNAL_SERVER_ERROR)
 
+    def post_raw(self, request: http.HttpRequest) -> http.HttpResponse:
+        """
+        Imports batch files sent as multipart upload or as a raw xml body,
+        validation and follow-up modes are set with query parameters.
+        Files are parsed incrementally, so memory usage doesn't depend on their size.
+        """
+        is_validation = request.GET.get('validation', 'false').lower() == 'true'
+        is_follow_up = request.GET.get('follow_up', 'false').lower() == 'true'
+
+        if request.content_type == 'multipart/form-data':
+            # Large uploaded files are kept by django in temporary files
+            sources = [(file.name, file) for file in request.FILES.values()]
+        else:
+            sources = [("file_0", request)]
+
+        results = []
+        for filename, source in sources:
+            results.append(self.import_file(self.iterparse_messages(source), filename, is_validation, is_follow_up))
+        return self.respond_with_results(results, len(sources))
+
+    @classmethod
+    def iterparse_messages(cls, source: t.Any) -> t.Iterator[etree._Element]:
+        """
+        Yields message parts as soon as they are parsed, processed ones are removed from the tree.
+        The last IMPORT_BATCH_SIZE message parts are kept, so that they can be processed as a batch.
+        """
+        kept_elements = collections.deque()
+        for _, element in etree.iterparse(source, events=('end',), tag=cls.MESSAGE_TAG, huge_tree=True):
+            yield element
+            kept_elements.append(element)
+            if len(kept_elements) > cls.IMPORT_BATCH_SIZE:
+                old_element = kept_elements.popleft()
+                old_element.clear(keep_tail=True)
+                while old_element.getprevious() is not None:
+                    del old_element.getparent()[0]
+
+    def respond_with_results(self, results: list[dict[str, t.Any]], total: int) -> http.HttpResponse:
+        response_data = {
+            "results": results,
+            "total": total,
+            "successful": sum(1 for r in results if r.get("success", False)),
+            "failed": sum(1 for r in results if not r.get("success", False))
+        }
+        return self.respond_with_object_as_json(response_data, HTTPStatus.OK)
+
+    def import_file(
+        self,
+        porr_elements: t.Iterable[etree._Element],
+        filename: str,
+        is_validation: bool,
+        is_follow_up: bool = False,
+        on_progress: t.Callable[[list[dict[str, t.Any]]], None] | None = None
+    ) -> dict[str, t.Any]:
+        """
+        Creates ICSRs of the message parts, in follow-up mode a case with stored C.1.8.1
+        and newer C.1.5 updates the stored one instead.
+        on_progress is called with results of the leading messages whenever they are saved.
+        """
+        icsr_statuses = []
+        # Statuses of converted ICSRs are set after they are saved
+        pending_cases = collections.deque()
+        icsrs_to_create = []
+        icsrs_to_update = []
+        result_file = []
+
+        def save_icsrs():
+            # Progress is reported only for new results, validation results are reported by the loop
+            if not icsrs_to_create and not icsrs_to_update:
+                return
+            # Follow-ups may update cases created earlier in the same file
+            saved_icsrs = zip(
+                icsrs_to_create + icsrs_to_update,
+                self.create_many([icsr for _, _, _, icsr in icsrs_to_create])
+                + self.update_follow_ups([(case_ids, icsr) for _, _, case_ids, icsr in icsrs_to_update])
+            )
+            digest_to_icsr_id_dict = {}
+            for (status_index, digest, _, _), (icsr_status, icsr_id) in saved_icsrs:
+                icsr_statuses[status_index] = icsr_status
+                if icsr_id is not None:
+                    digest_to_icsr_id_dict[digest] = icsr_id
+            e2b_archive.link(digest_to_icsr_id_dict)
+            icsrs_to_create.clear()
+            icsrs_to_update.clear()
+            if on_progress is not None:
+                on_progress(list(itertools.takewhile(lambda icsr_status: icsr_status is not None, icsr_statuses)))
+
+        def add_validation_result(result):
+            result_file.append(result)
+            if schema_errors_queue:
+                result["schema_errors"] = schema_errors_queue.popleft()
+            if on_progress is not None and len(result_file) % self.IMPORT_BATCH_SIZE == 0:
+                on_progress(list(result_file))
+
+        # Schema errors of the message parts in validation mode, they are checked before conversion
+        schema_errors_queue = collections.deque()
+        if not is_validation:
+            porr_elements = self.skip_duplicates(porr_elements, icsr_statuses, pending_cases, is_follow_up)
+        elif e2b_schema.is_enabled():
+            porr_elements = self.validate_schema(porr_elements, schema_errors_queue)
+
+        for icsr in self.convert_messages(porr_elements):
+            if isinstance(icsr, e2b_parallel.CaseError):
+                error_status = {"success": False, "info": f'Message could not be converted: {icsr.message}'}
+                if is_validation:
+                    add_validation_result(error_status)
+                else:
+                    status_index, _, _ = pending_cases.popleft()
+                    icsr_statuses[status_index] = error_status
+                continue
+            if is_validation:
+                icsr, _ = self.domain_service.business_validate(icsr)
+                def make_pretty_errors(errors):
+                    res = {}
+                    for k in errors:
+                        if not isinstance(errors[k], dict):
+                            res[k] = errors[k]
+                            continue
+                        pretty_res = make_pretty_errors(errors[k])
+                        if k not in ["_self", "buisness"]:
+                            pretty_res_new = {}
+                            for key, val in pretty_res.items():
+                                pretty_res_new[f'{k}__{key}'] = val
+                            pretty_res = pretty_res_new
+                        res.update(pretty_res)
+                    return res
+
+                add_validation_result({
+                    "success": True,
+                    "C.1.1": icsr.c_1_identification_case_safety_report.c_1_1_sender_safety_report_unique_id["value"],
+                    "validation_status": make_pretty_errors(icsr.errors)
+                })
+                continue
+            status_index, digest, follow_up_case_ids = pending_cases.popleft()
+            if follow_up_case_ids is None:
+                icsrs_to_create.append((status_index, digest, None, icsr))
+            else:
+                icsrs_to_update.append((status_index, digest, follow_up_case_ids, icsr))
+            if len(icsrs_to_create) + len(icsrs_to_update) >= self.IMPORT_BATCH_SIZE:
+                save_icsrs()
+        save_icsrs()
+
+        if not (result_file if is_validation else icsr_statuses):
+            return {
+                "success": False,
+                "filename": filename,
+                "error": "PORR_IN049016UV element not found"
+            }
+        if is_validation:
+            return {
+                "success": True,
+                "file_validation_status": result_file,
+            }
+        return {
+            "success": True,
+            "filename": filename,
+            "icsr_results": icsr_statuses
+        }
+
+    @staticmethod
+    def validate_schema(
+        porr_elements: t.Iterable[etree._Element],
+        schema_errors_queue: collections.deque[list[dict[str, t.Any]]]
+    ) -> t.Iterator[etree._Element]:
+        """Yields all message parts, their schema errors are added to the queue in the same order."""
+        for porr_elem in porr_elements:
+            schema_errors_queue.append(e2b_schema.validate(porr_elem))
+            yield porr_elem
+
+    def skip_duplicates(
+        self,
+        porr_elements: t.Iterable[etree._Element],
+        icsr_statuses: list[dict[str, t.Any] | None],
+        pending_cases: collections.deque[tuple[int, str, e2b_duplicates.CaseIds | None]],
+        is_follow_up: bool = False
+    ) -> t.Iterator[etree._Element]:
+        """
+        Yields message parts of new cases and follow-ups, statuses of already existing ones are added without conversion.
+        Messages are archived, the ones identical to already imported messages are skipped without reading them.
+        If schema validation is enabled, messages which don't conform to the schema are skipped as well.
+        Every message gets its slot in icsr_statuses in the order of messages, for yielded message parts
+        the slot stays None and its index is added to pending_cases together with the message digest
+        and identifiers of the follow-up case or None for new cases.
+        """
+        duplicate_checker = e2b_duplicates.DuplicateChecker(is_follow_up)
+        for porr_batch in itertools.batched(porr_elements, self.IMPORT_BATCH_SIZE):
+            digests = [e2b_archive.get_digest(e2b_archive.canonicalize(porr_elem)) for porr_elem in porr_batch]
+            digest_to_icsr_id_dict = e2b_archive.find_archived(digests)
+            # Only unknown messages are archived, so resent ones are not compressed and sent again
+            e2b_archive.store({
+                digest: e2b_archive.serialize(porr_elem)
+                for porr_elem, digest in zip(porr_batch, digests)
+                if digest not in digest_to_icsr_id_dict
+            })
+
+            new_porr_batch = []
+            for porr_elem, digest in zip(porr_batch, digests):
+                status_index = len(icsr_statuses)
+                icsr_statuses.append(None)
+                if digest_to_icsr_id_dict.get(digest) is not None:
+                    icsr_statuses[status_index] = {
+                        "success": False,
+                        "info": f'The message has already been imported as ICSR {digest_to_icsr_id_dict[digest]}. '
+                                'This object was not created'
+                    }
+                elif e2b_schema.is_enabled() and (schema_errors := e2b_schema.validate(porr_elem)):
+                    icsr_statuses[status_index] = {
+                        "success": False,
+                        "info": 'The message does not conform to E2B(R3) schema. This object was not created',
+                        "schema_errors": schema_errors
+                    }
+                else:
+                    new_porr_batch.append((status_index, porr_elem, digest))
+
+            case_ids_batch = [e2b_duplicates.read_case_ids(porr_elem) for _, porr_elem, _ in new_porr_batch]
+            duplicated_codes = duplicate_checker.check_batch(case_ids_batch)
+            for (status_index, porr_elem, digest), case_ids, duplicated_code in zip(
+                new_porr_batch, case_ids_batch, duplicated_codes
+            ):
+                if duplicated_code is None or duplicated_code == e2b_duplicates.FOLLOW_UP:
+                    pending_cases.append((status_index, digest, case_ids if duplicated_code else None))
+                    yield porr_elem
+                    continue
+                duplicated_id = case_ids.sender_id if duplicated_code == 'C.1.1' else case_ids.worldwide_id
+                icsr_statuses[status_index] = {
+                    "success": False,
+                    "info": f'{duplicated_code} = {duplicated_id} already exists. This object was not created'
+                }
+
+    def convert_messages(
+        self,
+        porr_elements: t.Iterable[etree._Element]
+    ) -> t.Iterator[ICSR | e2b_parallel.CaseError]:
+        """
+        Yields ICSRs of the message parts in their order, or CaseError for messages which can't be converted.
+        Large files are converted by E2B_IMPORT_WORKERS processes, while this process only writes to the database.
+        """
+        workers = self.workers or settings.E2B_IMPORT_WORKERS
+        if workers <= 1:
+            for porr_elem in porr_elements:
+                yield self.convert_message(porr_elem)
+            return
+
+        # Elements are serialized at once, as they may be cleared by the streaming parser
+        messages = (etree.tostring(porr_elem) for porr_elem in porr_elements)
+        first_messages = list(itertools.islice(messages, settings.E2B_IMPORT_PARALLEL_MIN_CASES))
+        if len(first_messages) < settings.E2B_IMPORT_PARALLEL_MIN_CASES:
+            for message in first_messages:
+                yield self.convert_message(etree.fromstring(message))
+            return
+
+        yield from e2b_parallel.ParallelImportEngine(workers=workers).parse(itertools.chain(first_messages, messages))
+
+    def convert_message(self, porr_elem: etree._Element) -> ICSR | e2b_parallel.CaseError:
+        try:
+            return self.import_single_xml(porr_elem, ICSR())
+        except Exception as e:
+            return e2b_parallel.CaseError.from_exception(e)
+
+    def create_many(self, icsrs: list[ICSR]) -> list[tuple[dict[str, t.Any], int | None]]:
+        """
+        Creates the batch with bulk queries, if some ICSR already exists they are created one by one.
+        Returns statuses and ids of the created ICSRs.
+        """
+        if not icsrs:
+            return []
+        try:
+            created_icsrs = self.domain_service.create_many(icsrs)
+            return [
+                (self.make_creation_status(icsr, True), created_icsr.id)
+                for icsr, (created_icsr, _) in zip(icsrs, created_icsrs)
+            ]
+        except IntegrityError:
+            pass
+
+        icsr_statuses = []
+        for icsr in icsrs:
+            try:
+                created_icsr, _ = self.domain_service.create(icsr)
+                icsr_statuses.append((self.make_creation_status(icsr, True), created_icsr.id))
+            except IntegrityError as ex:
+                icsr_statuses.append((self.make_creation_status(icsr, False), None))
+        return icsr_statuses
+
+    def update_follow_ups(
+        self,
+        follow_ups: list[tuple[e2b_duplicates.CaseIds, ICSR]]
+    ) -> list[tuple[dict[str, t.Any], int | None]]:
+        """
+        Updates cases found by C.1.8.1 of the follow-ups, all of them are looked up with one query.
+        Returns statuses and ids of the updated ICSRs.
+        """
+        if not follow_ups:
+            return []
+        stored_cases = e2b_duplicates.find_stored_cases(case_ids.worldwide_id for case_ids, _ in follow_ups)
+
+        icsr_statuses = []
+        for case_ids, icsr in follow_ups:
+            worldwide_id = case_ids.worldwide_id
+            if worldwide_id not in stored_cases:
+                icsr_statuses.append(({
+                    "success": False,
+                    "info": f'C.1.8.1 = {worldwide_id} was not found. This object was not updated'
+                }, None))
+                continue
+
+            # Related models are recreated, but C.1 and ICSR keep their ids
+            c_1 = icsr.c_1_identification_case_safety_report
+            icsr.id, c_1.id, stored_sender_id = stored_cases[worldwide_id]
+            # Follow-up may come from another sender with its own C.1.1, while the stored one can't be changed
+            if stored_sender_id:
+                c_1.c_1_1_sender_safety_report_unique_id = \
+                    c_1.c_1_1_sender_safety_report_unique_id.model_copy(update={'value': stored_sender_id})
+            try:
+                _, is_ok = self.domain_service.update(icsr, icsr.id)
+            except (UserError, IntegrityError) as ex:
+                icsr_statuses.append(({
+                    "success": False,
+                    "info": f'C.1.8.1 = {worldwide_id} cannot be updated: {ex}'
+                }, None))
+                continue
+            icsr_statuses.append(({
+                "success": is_ok,
+                "info": f'An ICSR object with C.1.8.1 = {worldwide_id} successfully updated' if is_ok else
+                    f'C.1.8.1 = {worldwide_id} is invalid. This object was not updated'
+            }, icsr.id if is_ok else None))
+        return icsr_statuses
+
+    @staticmethod
+    def make_creation_status(icsr: ICSR, is_created: bool) -> dict[str, t.Any]:
+        c_1_1 = icsr.c_1_identification_case_safety_report.c_1_1_sender_safety_report_unique_id
+        if is_created:
+            return {
+                "sucsess": True,
+                "info": f'An ICSR object with C.1.1 = {c_1_1} successfully created'
+            }
+        return {
+            "success": False,
+            "info": f'C.1.1 = {c_1_1} already exists. This object was not created'
+        }
 
     @staticmethod
     def find(root, field, pretty=True):
@@ -1622,9 +1900,8 @@ class ImportMultipleXmlView(BaseView):
             elif root.text is not None:
                 value = root.text.strip()
             if value is not None:
-                field_type = get_type_annotation(obj.__class__, field)
-                converted_value = convert_to_type(get_value(value), field_type, field)
-                setattr(obj, field, converted_value)
+                convert = e2b_mapping.converter_table.get(obj.__class__, field)
+                setattr(obj, field, convert(get_value(value), field))
 
         def set_text_icsr_field_with_null(root, key, obj, field, get_value=lambda x: x):
             if root is not None and root.get("nullFlavor") is not None:
@@ -1634,50 +1911,6 @@ class ImportMultipleXmlView(BaseView):
             else:
                 set_icsr_field(root, key, obj, field, get_value)
 
-        def get_type_annotation(cls, field_name):
-            if not hasattr(cls, 'model_fields'):
-                return None
-            
-            field_info = cls.model_fields.get(field_name)
-            if field_info is None:
-                return None
-            
-            return field_info.annotation
-            
-        def convert_to_type(value, target_type, field=None):
-            if value is None:
-                return value
-            easy = ["int", "str"]
-            name = target_type.__name__
-            if name.startswith("NullableValue"):
-                # No need to process NF
-                name, _ = name[len("NullableValue["):].split(',', 1)
-            elif name.startswith("Value"):
-                name = name[len("Value["):-1]
-            if name.startswith("Literal"):
-                name = name[len("Literal["):-1]
-                if name == "True":
-                    return True
-
-            if name in easy:
-                return getattr(builtins, name)(value)
-            elif name.lower() == "decimal":
-                return decimal.Decimal(value)
-            elif name.lower() == "bool":
-                if value.lower() == "true":
-                    return True
-                elif value.lower() == "false":
-                    return False
-                else:
-                    raise TypeError(f"{field} must have bool type, {value} given")
-            else:
-                emun_class = getattr(enums, name)
-                if issubclass(emun_class, enum.IntEnum):
-                    return emun_class(int(value))
-                if issubclass(emun_class, enum.StrEnum):
-                    return emun_class(value)
-            return value
-
         c1 = icsr.c_1_identification_case_safety_report
         c2 = icsr.c_2_r_primary_source_information
         c3 = icsr.c_3_information_sender_case_safety_report
@@ -1700,35 +1933,11 @@ class ImportMultipleXmlView(BaseView):
         if icsr.h_narrative_case_summary is None:
             icsr.h_narrative_case_summary = h = H_narrative_case_summary(icsr=icsr)
 
-        control_act_process = self.find(root, "controlActProcess")
-        # C.1.2
-        set_icsr_field(self.find(control_act_process, "effectiveTime"), 'value', c1, "c_1_2_date_creation")
+        # Fixed position fields of C.1, C.3, D and H, the rest is walked below
+        e2b_mapping.import_fields(root, icsr)
 
+        control_act_process = self.find(root, "controlActProcess")
         investigationEvent = self.find(self.find(control_act_process, "subject"), "investigationEvent")
-        # C.1.1
-        set_icsr_field(self.find(investigationEvent, 'id[@root="2.16.840.1.113883.3.989.2.1.3.1"]'), "extension", c1, "c_1_1_sender_safety_report_unique_id")
-
-        # C.1.8.1
-        set_icsr_field(self.find(investigationEvent, 'id[@root="2.16.840.1.113883.3.989.2.1.3.2"]'), "extension", c1, "c_1_8_1_worldwide_unique_case_identification_number")
-
-        # H.1
-        set_icsr_field(self.find(investigationEvent, 'text'), None, h, "h_1_case_narrative")
-
-        # C.1.4
-        set_icsr_field(
-            self.find(self.find(investigationEvent, "effectiveTime"), "low"),
-            "value",
-            c1,
-            "c_1_4_date_report_first_received_source"
-        )
-
-        # C.1.5 
-        set_icsr_field(
-            self.find(investigationEvent, "availabilityTime"),
-            "value",
-            c1,
-            "c_1_5_date_most_recent_information"
-        )
 
         references = self.find(investigationEvent, "reference")
         for reference in references:
@@ -1756,85 +1965,12 @@ class ImportMultipleXmlView(BaseView):
                 primaryRole = self.find(self.find(adverseEventAssessment, "subject1"), "primaryRole")
                 player1 = self.find(primaryRole, "player1")
                 
-                # D.1
-                set_text_icsr_field_with_null(self.find(player1, "name"), None, d, "d_1_patient")
-                
-                # D.5 
-                set_text_icsr_field_with_null(self.find(player1, "administrativeGenderCode"), "code", d, "d_5_sex")
-
-                # D.2.1
-                set_text_icsr_field_with_null(self.find(player1, "birthTime"), "value", d, "d_2_1_date_birth")
-
-                # D.9.1
-                set_text_icsr_field_with_null(self.find(player1, "deceasedTime"), "value", d, "d_9_1_date_death")
-
-                asIdentifiedEntitys = self.find(player1, "asIdentifiedEntity")
-                for asIdentifiedEntity in asIdentifiedEntitys:
-                    codeTmp = self.find(asIdentifiedEntity, "code").get("code")
-                    if codeTmp == "1":
-                        # D.1.1.1
-                        set_text_icsr_field_with_null(
-                            self.find(asIdentifiedEntity, "id"), 
-                            "extension",
-                            d, 
-                            "d_1_1_1_medical_record_number_source_gp"
-                        )
-                    elif codeTmp == "2":
-                        # D.1.1.2
-                        set_text_icsr_field_with_null(
-                            self.find(asIdentifiedEntity, "id"), 
-                            "extension",
-                            d, 
-                            "d_1_1_2_medical_record_number_source_specialist"
-                        )
-                    elif codeTmp == "3":
-                        # D.1.1.3
-                        set_text_icsr_field_with_null(
-                            self.find(asIdentifiedEntity, "id"), 
-                            "extension",
-                            d, 
-                            "d_1_1_3_medical_record_number_source_hospital"
-                        )
-                    elif codeTmp == "4":
-                        # D.1.1.4
-                        set_text_icsr_field_with_null(
-                            self.find(asIdentifiedEntity, "id"), 
-                            "extension",
-                            d, 
-                            "d_1_1_4_medical_record_number_source_investigation"
-                        )
-
-
                 role = self.find(player1, "role")
-                associatedPersonRole = self.find(role, "associatedPerson")
-                # D.10.1
-                set_text_icsr_field_with_null(self.find(associatedPersonRole, "name"), None, d, "d_10_1_parent_identification")
-                # D.10.6
-                set_text_icsr_field_with_null(self.find(associatedPersonRole, "administrativeGenderCode"), "code", d, "d_10_6_sex_parent")
-                # D.10.2.1
-                set_text_icsr_field_with_null(self.find(associatedPersonRole, "birthTime"), "value", d, "d_10_2_1_date_birth_parent")
-            
+                # D.10.1 - D.10.6 are declared in e2b_mapping
                 subjectOf2Roles = self.find(role, "subjectOf2")
                 for subjectOf2Role in subjectOf2Roles:
-                    observationSubjectOf2 = self.find(subjectOf2Role, "observation")
                     organizerSubjectOf2 = self.find(subjectOf2Role, "organizer")
-                    if observationSubjectOf2 is not None:
-                        codeObservationSubjectOf2 = self.find(observationSubjectOf2, "code").get("code")
-                        if codeObservationSubjectOf2 == "3":
-                            # D.10.2.2a
-                            set_icsr_field(self.find(observationSubjectOf2, "value"), "value", d, "d_10_2_2a_age_parent_num")
-                            # D.10.2.2b
-                            set_icsr_field(self.find(observationSubjectOf2, "value"), "unit", d, "d_10_2_2b_age_parent_unit")
-                        elif codeObservationSubjectOf2 == "22":
-                            # D.10.3
-                            set_text_icsr_field_with_null(self.find(observationSubjectOf2, "value"), "value", d, "d_10_3_last_menstrual_period_date_parent")
-                        elif codeObservationSubjectOf2 == "7":
-                            # D.10.4
-                            set_text_icsr_field_with_null(self.find(observationSubjectOf2, "value"), "value", d, "d_10_4_body_weight_parent")
-                        elif codeObservationSubjectOf2 == "17":
-                            # D.10.5
-                            set_text_icsr_field_with_null(self.find(observationSubjectOf2, "value"), "value", d, "d_10_5_height_parent")
-                    elif organizerSubjectOf2 is not None:
+                    if organizerSubjectOf2 is not None:
                         codeOrganizerSubjectOf2 = self.find(organizerSubjectOf2, "code").get("code")
                         if codeOrganizerSubjectOf2 == "1":
                             componentsSmall = self.find(organizerSubjectOf2, "component", False)
@@ -2464,25 +2600,7 @@ class ImportMultipleXmlView(BaseView):
                 components1 = self.find(adverseEventAssessment, "component1")
                 for component1 in components1:
                     codeTmp = self.find(self.find(component1, "observationEvent"), "code").get("code")
-                    if codeTmp == "10":
-                        codeLocal = self.find(self.find(self.find(self.find(component1, "observationEvent"), "author"), "assignedEntity"), "code").get("code")
-                        if codeLocal == "3":
-                            # H.2
-                            set_icsr_field(
-                                self.find(self.find(component1, "observationEvent"), "value"),
-                                None,
-                                h,
-                                "h_2_reporter_comments"
-                            )
-                        elif codeLocal == "1":
-                            # H.4
-                            set_icsr_field(
-                                self.find(self.find(component1, "observationEvent"), "value"),
-                                None,
-                                h,
-                                "h_4_sender_comments"
-                            )
-                    elif codeTmp == "15":
+                    if codeTmp == "15":
                         diagnosis_meddra_code = H_3_r_sender_diagnosis_meddra_code(h_narrative_case_summary=h)
                         valTmp = self.find(self.find(component1, "observationEvent"), "value")
                         # H.3.r.1a
@@ -2494,12 +2612,6 @@ class ImportMultipleXmlView(BaseView):
 
             elif observationEvent is not None:
                 codeObservationEvent = self.find(observationEvent, "code").get("code")
-                if codeObservationEvent == "1":
-                    # C.1.6.1
-                    set_icsr_field(self.find(observationEvent, "value"), "value", c1, "c_1_6_1_additional_documents_available")
-                if codeObservationEvent == "23":
-                    # C.1.7
-                    set_text_icsr_field_with_null(self.find(observationEvent, "value"), "value", c1, "c_1_7_fulfil_local_criteria_expedited_report")
                 if codeObservationEvent == "36":
                     case_summary = H_5_r_case_summary_reporter_comments_native_language(h_narrative_case_summary=h)
                     observationEvent_new = self.find(component_big, "observationEvent")
@@ -2587,7 +2699,6 @@ class ImportMultipleXmlView(BaseView):
         for subjectOf1 in subjectOf1s:
             controlActEventLocall = self.find(subjectOf1, "controlActEvent")
             idControlActEventLocall = self.find(controlActEventLocall, "id")
-            author = self.find(controlActEventLocall, "author")
             if idControlActEventLocall is not None:
                 documents_held_sender = C_1_9_1_r_source_case_id(c_1_identification_case_safety_report=c1)
                 idControlActEventLocallCopy = self.find(self.find(subjectOf1, "controlActEvent"), "id")
@@ -2596,72 +2707,4 @@ class ImportMultipleXmlView(BaseView):
                 # C.1.9.1.r.2
                 set_icsr_field(idControlActEventLocallCopy, "extension", documents_held_sender, "c_1_9_1_r_2_case_id")
                 c1.c_1_9_1_r_source_case_id.append(documents_held_sender)
-            elif author is not None:
-                assignedEntitySmall = self.find(author, "assignedEntity")
-                # C.3.1
-                set_icsr_field(self.find(assignedEntitySmall, "code"), "code", c3, "c_3_1_sender_type")
-                addr = self.find(assignedEntitySmall, "addr")
-                # C.3.4.1
-                set_icsr_field(self.find(addr, "streetAddressLine"), None, c3, "c_3_4_1_sender_street_address")
-                # C.3.4.2
-                set_icsr_field(self.find(addr, "city"), None, c3, "c_3_4_2_sender_city")
-                # C.3.4.3
-                set_icsr_field(self.find(addr, "state"), None, c3, "c_3_4_3_sender_state_province")
-                # C.3.4.4
-                set_icsr_field(self.find(addr, "postalCode"), None, c3, "c_3_4_4_sender_postcode")
-                telecoms = self.find(assignedEntitySmall, "telecom")
-                for telecom, pair in zip(telecoms, [
-                    ("c_3_4_6_sender_telephone", "tel"),
-                    ("c_3_4_7_sender_fax", "fax"),
-                    ("c_3_4_8_sender_email", "mailto")
-                ]):
-                    field, prefix = pair
-                    # C.3.4.6 / C.3.4.7 / C.3.4.8
-                    set_icsr_field(telecom, "value", c3, field, get_value=lambda x: x[len(prefix) + 1:])
-                assignedPerson = self.find(assignedEntitySmall, "assignedPerson")
-                name = self.find(assignedPerson, "name")
-                # C.3.3.2
-                set_icsr_field(self.find(name, "prefix"), None, c3, "c_3_3_2_sender_title")
-                givens = self.find(name, "given")
-                for given, field in zip(givens, ["c_3_3_3_sender_given_name", "c_3_3_4_sender_middle_name"]):
-                    # C.3.3.3 / C.3.3.4
-                    set_icsr_field(given, None, c3, field)
-                # C.3.3.5
-                set_icsr_field(self.find(name, "family"), None, c3, "c_3_3_5_sender_family_name")
-                # 3.4.5
-                set_icsr_field(
-                    self.find(self.find(self.find(assignedPerson, "asLocatedEntity"), "location"), "code"),
-                    "code",
-                    c3,
-                    "c_3_4_5_sender_country_code"
-                )
-                representedOrganization = self.find(assignedEntitySmall, "representedOrganization")
-                # C.3.3.1
-                set_icsr_field(self.find(representedOrganization, "name"), None, c3, "c_3_3_1_sender_department")
-                # C.3.2
-                set_icsr_field(
-                    self.find(self.find(self.find(representedOrganization, "assignedEntity"), "representedOrganization"), "name"),
-                    None, 
-                    c3,
-                    "c_3_2_sender_organisation"
-                )
-
-        vars = self.find(investigationEvent, 'subjectOf2')
-        for var in vars:
-            var = self.find(var, 'investigationCharacteristic')
-            code = self.find(var, "code").get("code")
-            tmp_var = self.find(var,'value')
-            if code == "1":
-                # C.1.3
-                set_icsr_field(tmp_var, "code", c1, "c_1_3_type_report")
-            elif code == "2":
-                # C.1.9.1
-                set_text_icsr_field_with_null(tmp_var, "value", c1, "c_1_9_1_other_case_ids_previous_transmissions")
-            elif code == "3":
-                # C.1.11.1
-                set_icsr_field(tmp_var, "code", c1, "c_1_11_1_report_nullification_amendment")
-            elif code == "4":
-                # C.1.11.2
-                set_text_icsr_field_with_null(self.find(tmp_var, "originalText"), None, c1, "c_1_11_2_reason_nullification_amendment")
-        
         return icsr                   
\ No newline at end of file
@@ -0,0 +1,128 @@
+import dataclasses as dc
+import enum
+import functools
+import types
+import typing as t
+
+import pydantic as pd
+from lxml import etree
+
+# Parser of untrusted input, entities are not expanded and nothing is loaded from the network
+PARSER = etree.XMLParser(resolve_entities=False, no_network=True, remove_blank_text=True)
+
+
+class FieldKind(enum.Enum):
+    MODEL = enum.auto()
+    MODEL_LIST = enum.auto()
+    SCALAR = enum.auto()
+    BOOL = enum.auto()
+
+
+@dc.dataclass(frozen=True)
+class FieldInfo:
+    kind: FieldKind
+    model_class: type[pd.BaseModel] | None = None
+
+
+@functools.cache
+def get_field_infos(model_class: type[pd.BaseModel]) -> dict[str, FieldInfo]:
+    """Describes how every field of the model is written to xml, is computed once per class."""
+    type_hints = t.get_type_hints(model_class)
+    field_infos = {}
+    for name, field in model_class.model_fields.items():
+        if field.exclude:
+            continue
+        # Annotations of parametrized generic models are substituted only in pydantic fields,
+        # while forward references are resolved only in type hints
+        annotation = type_hints[name] if has_forward_refs(field.annotation) else field.annotation
+        field_infos[name] = get_field_info(annotation)
+    return field_infos
+
+
+def has_forward_refs(annotation: t.Any) -> bool:
+    return any(isinstance(arg, (str, t.ForwardRef)) for arg in [annotation, *t.get_args(annotation)])
+
+
+def get_field_info(annotation: t.Any) -> FieldInfo:
+    origin = t.get_origin(annotation)
+    args = [arg for arg in t.get_args(annotation) if arg is not type(None)]
+
+    if origin is list and args and is_model_class(args[0]):
+        return FieldInfo(FieldKind.MODEL_LIST, args[0])
+    if origin in [t.Union, types.UnionType] and len(args) == 1:
+        return get_field_info(args[0])
+    if is_model_class(annotation):
+        return FieldInfo(FieldKind.MODEL, annotation)
+    if annotation is bool or (origin is t.Literal and all(isinstance(arg, bool) for arg in args)):
+        return FieldInfo(FieldKind.BOOL)
+    if origin in [t.Union, types.UnionType] and any(get_field_info(arg).kind == FieldKind.BOOL for arg in args):
+        # Value or null flavor, boolean value is the only one that may be written as true or false
+        return FieldInfo(FieldKind.BOOL)
+    return FieldInfo(FieldKind.SCALAR)
+
+
+def is_model_class(annotation: t.Any) -> bool:
+    return isinstance(annotation, type) and issubclass(annotation, pd.BaseModel)
+
+
+def encode(model: pd.BaseModel) -> bytes:
+    """Writes the model as xml with element per field, missing values and empty lists are omitted."""
+    root = etree.Element(type(model).__name__)
+    _encode_fields(root, model)
+    return etree.tostring(root, xml_declaration=True, encoding='utf-8')
+
+
+def _encode_fields(element: etree._Element, model: pd.BaseModel) -> None:
+    for name, field_info in get_field_infos(type(model)).items():
+        value = getattr(model, name, None)
+        if value is None:
+            continue
+        if field_info.kind == FieldKind.MODEL_LIST:
+            for item in value:
+                _encode_fields(etree.SubElement(element, name), item)
+        elif field_info.kind == FieldKind.MODEL:
+            _encode_fields(etree.SubElement(element, name), value)
+        else:
+            etree.SubElement(element, name).text = _to_text(value)
+
+
+def _to_text(value: t.Any) -> str:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, enum.Enum):
+        return str(value.value)
+    return str(value)
+
+
+def decode[M: pd.BaseModel](model_class: type[M], xml: str | bytes) -> dict[str, t.Any]:
+    """
+    Reads model data written by encode, unknown elements are skipped.
+    Empty list items are skipped as well, as they carry no data and earlier xml exports padded
+    single item lists with an empty element.
+    """
+    if isinstance(xml, str):
+        xml = xml.encode('utf-8')
+    root = etree.fromstring(xml, PARSER)
+    if root.tag != model_class.__name__:
+        raise ValueError(f'Expected root element {model_class.__name__}, got {root.tag}')
+    return _decode_fields(root, model_class)
+
+
+def _decode_fields(element: etree._Element, model_class: type[pd.BaseModel]) -> dict[str, t.Any]:
+    field_infos = get_field_infos(model_class)
+    data = {}
+    for child in element:
+        field_info = field_infos.get(child.tag)
+        if field_info is None:
+            continue
+        if field_info.kind == FieldKind.MODEL_LIST:
+            items = data.setdefault(child.tag, [])
+            if len(child) or child.text:
+                items.append(_decode_fields(child, field_info.model_class))
+        elif field_info.kind == FieldKind.MODEL:
+            data[child.tag] = _decode_fields(child, field_info.model_class)
+        elif field_info.kind == FieldKind.BOOL and child.text in ['true', 'false']:
+            data[child.tag] = child.text == 'true'
+        else:
+            data[child.tag] = child.text
+    return data
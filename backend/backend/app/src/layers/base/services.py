@@ -6,10 +6,16 @@ from django.core.files.uploadedfile import InMemoryUploadedFile
 class ServiceProtocol[T](t.Protocol):
     def list(self, model_class: type[T]) -> list[dict[str, t.Any]]: ...
 
+    def list_page(self, model_class: type[T], params: t.Mapping[str, str]) -> dict[str, t.Any]: ...
+
     def read(self, model_class: type[T], pk: int) -> T: ...
 
+    def read_many(self, model_class: type[T], pks: t.Iterable[int]) -> t.Iterator[T]: ...
+
     def create(self, model: T) -> tuple[T, bool]: ...
 
+    def create_many(self, models: t.Sequence[T]) -> t.Sequence[tuple[T, bool]]: ...
+
     def update(self, model: T, pk: int) -> tuple[T, bool]: ...
 
     def delete(self, model_class: type[T], pk: int) -> bool: ...
@@ -22,14 +22,25 @@ class DomainService(BusinessServiceProtocol[DomainModel]):
     def list(self, model_class: type[DomainModel]) -> list[dict[str, t.Any]]:
         return self.storage_service.list(model_class)
 
+    def list_page(self, model_class: type[DomainModel], params: t.Mapping[str, str]) -> dict[str, t.Any]:
+        return self.storage_service.list_page(model_class, params)
+
     def read(self, model_class: type[DomainModel], pk: int) -> DomainModel:
         return self.storage_service.read(model_class, pk)
 
+    def read_many(self, model_class: type[DomainModel], pks: t.Iterable[int]) -> t.Iterator[DomainModel]:
+        return self.storage_service.read_many(model_class, pks)
+
     def create(self, model: DomainModel) -> tuple[DomainModel, bool]:
         if not model.is_valid:
             return model, False
         return self.storage_service.create(model)
 
+    def create_many(self, models: t.Sequence[DomainModel]) -> t.Sequence[tuple[DomainModel, bool]]:
+        valid_models = [model for model in models if model.is_valid]
+        created_models = iter(self.storage_service.create_many(valid_models))
+        return [next(created_models) if model.is_valid else (model, False) for model in models]
+
     def update(self, model: DomainModel, pk: int) -> tuple[DomainModel, bool]:
         if not model.is_valid:
             return model, False
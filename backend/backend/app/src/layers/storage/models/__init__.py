@@ -1,3 +1,6 @@
 from app.src.layers.storage.models.icsr import *
 from app.src.layers.storage.models.meddra import *
 from app.src.layers.storage.models.code_set import *
+from app.src.layers.storage.models.export import *
+from app.src.layers.storage.models.document import *
+from app.src.layers.storage.models.summary import *
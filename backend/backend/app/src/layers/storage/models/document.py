@@ -0,0 +1,24 @@
+from django.db import models as m
+
+
+class ICSRDocument(m.Model):
+    """
+    Snapshot of the ICSR as it is returned by the api, so that a case is read with one query.
+    Related tables remain the source of truth: revision is bumped on every ICSR save in the same transaction,
+    content is valid only if it was built for the current revision.
+    """
+
+    # Backward relation is hidden, so that it is not treated as ICSR data
+    icsr = m.OneToOneField(to='ICSR', on_delete=m.CASCADE, primary_key=True, related_name='+')
+    revision = m.PositiveIntegerField(default=0)
+    built_revision = m.PositiveIntegerField(null=True)
+    content = m.JSONField(null=True)
+
+    @classmethod
+    def bump_revisions(cls, icsr_ids: list[int]) -> None:
+        cls.objects.bulk_create([cls(icsr_id=icsr_id) for icsr_id in icsr_ids], ignore_conflicts=True)
+        cls.objects.filter(icsr_id__in=icsr_ids).update(
+            revision=m.F('revision') + 1,
+            built_revision=None,
+            content=None
+        )
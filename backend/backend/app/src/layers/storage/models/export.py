@@ -0,0 +1,29 @@
+from django.db import models as m
+
+
+class ICSRXmlFragment(m.Model):
+    """
+    Rendered message part (PORR_IN049016UV) of the ICSR used by the export.
+    Revision is bumped on every ICSR save, content is valid only if it was rendered for the current revision
+    and with the current renderer and template (see fragment_cache.get_render_key).
+    """
+
+    # Backward relation is hidden, so that it is not treated as ICSR data
+    icsr = m.OneToOneField(to='ICSR', on_delete=m.CASCADE, primary_key=True, related_name='+')
+    revision = m.PositiveIntegerField(default=0)
+    rendered_revision = m.PositiveIntegerField(null=True)
+    render_key = m.CharField(null=True)
+    content = m.BinaryField(null=True)
+
+    @classmethod
+    def bump_revision(cls, icsr_id: int) -> None:
+        cls.bump_revisions([icsr_id])
+
+    @classmethod
+    def bump_revisions(cls, icsr_ids: list[int]) -> None:
+        cls.objects.bulk_create([cls(icsr_id=icsr_id) for icsr_id in icsr_ids], ignore_conflicts=True)
+        cls.objects.filter(icsr_id__in=icsr_ids).update(
+            revision=m.F('revision') + 1,
+            rendered_revision=None,
+            content=None
+        )
@@ -6,6 +6,9 @@ from django.db import models as m
 from app.src import enums as e
 from app.src.enums import NullFlavor as NF
 from app.src.exceptions import UserError
+from app.src.layers.storage.models.document import ICSRDocument
+from app.src.layers.storage.models.export import ICSRXmlFragment
+from app.src.layers.storage.models.summary import CaseSummary
 from extensions.django import constraints as ec
 from extensions.django import fields as ef
 from extensions.django import models as em
@@ -46,10 +49,15 @@ class StorageModel(em.ModelWithTempRelationSupport, metaclass=StorageModelMeta):
     def list(cls) -> list[dict[str, t.Any]]:
         return list(cls.objects.values('id'))
 
+    @classmethod
+    def list_page(cls, params: t.Mapping[str, str]) -> dict[str, t.Any]:
+        raise UserError(f'{cls.__name__} list does not support pagination')
+
     def pre_create(self) -> None:
         pass
 
-    def pre_update(self) -> None:
+    def pre_update(self, old_model: t.Self) -> None:
+        """Old model is the stored one with the relations present in the new model loaded."""
         pass
 
     def post_create(self) -> None:
@@ -58,46 +66,56 @@ class StorageModel(em.ModelWithTempRelationSupport, metaclass=StorageModelMeta):
     def post_update(self) -> None:
         pass
 
+    @classmethod
+    def post_bulk_create(cls, models: t.Sequence[t.Self]) -> None:
+        """Is called for models created by StorageService, every created level is passed at once."""
+        for model in models:
+            model.post_create()
+
 
 
 class ICSR(StorageModel):
     @classmethod
     def list(cls) -> list[dict[str, t.Any]]:
+        # Summaries are maintained on every save, so the list is read with one indexed query
+        return CaseSummary.get_list_values(CaseSummary.objects.order_by('-creation_date', '-icsr'))
+
+    @classmethod
+    def list_page(cls, params: t.Mapping[str, str]) -> dict[str, t.Any]:
+        return CaseSummary.page(params)
+
+    @classmethod
+    def refresh_summaries(cls, icsr_ids: t.Sequence[int]) -> None:
         # Extracted fields and their constraints are better to be described in domain layer,
         # but they are specified here for better performance control.
         # Django ORM is used instead of raw sql for independency from specific database.
 
-        # All data is extracted with only 4 queries
+        # All data is extracted with only 4 queries and written with one more
 
         icsrs = ICSR.objects\
+            .filter(id__in=icsr_ids)\
             .values(
                 'id',
                 case_number=m.F('c_1_identification_case_safety_report__c_1_1_sender_safety_report_unique_id'),
                 creation_date=m.F('c_1_identification_case_safety_report__c_1_2_date_creation'),
                 received_date=m.F('c_1_identification_case_safety_report__c_1_4_date_report_first_received_source'),
-                # Default value that might be changed later
-                serious=m.Value(False)
-            )\
-            .order_by('-creation_date')
-        
+            )
+
         events = E_i_reaction_event.objects\
-            .filter(e_i_3_1_term_highlighted_reporter__in=[
+            .filter(icsr__in=icsr_ids, e_i_3_1_term_highlighted_reporter__in=[
                 e.E_i_3_1_term_highlighted_reporter.YES_NOT_SERIOUS,
                 e.E_i_3_1_term_highlighted_reporter.YES_SERIOUS,
             ])\
-            .values(
-                'icsr',
-                reaction_names=m.F('e_i_2_1b_reaction_meddra_code')
-            )
-        
+            .order_by('id')\
+            .values_list('icsr', 'e_i_2_1b_reaction_meddra_code')
+
         drugs = G_k_drug_information.objects\
-            .filter(g_k_1_characterisation_drug_role=e.G_k_1_characterisation_drug_role.SUSPECT)\
-            .values(
-                'icsr',
-                drug_names=m.F('g_k_2_1_2b_phpid')
-            )
+            .filter(icsr__in=icsr_ids, g_k_1_characterisation_drug_role=e.G_k_1_characterisation_drug_role.SUSPECT)\
+            .order_by('id')\
+            .values_list('icsr', 'g_k_2_1_2b_phpid')
 
-        seriousness_data = E_i_reaction_event.objects\
+        serious_icsr_ids = E_i_reaction_event.objects\
+            .filter(icsr__in=icsr_ids)\
             .filter(
                 m.Q(e_i_3_2a_results_death=True)
                 | m.Q(e_i_3_2b_life_threatening=True)
@@ -106,31 +124,34 @@ class ICSR(StorageModel):
                 | m.Q(e_i_3_2e_congenital_anomaly_birth_defect=True)
                 | m.Q(e_i_3_2f_other_medically_important_condition=True)
             )\
-            .values(
-                'icsr',
-                serious=m.Value(True)
-            )\
+            .values_list('icsr', flat=True)\
             .distinct()
-        
-        # Lightweight data merge
-        
-        result = {}
+
+        summaries = {}
         for icsr in icsrs:
-            result[icsr['id']] = icsr
-            icsr['reaction_names'] = []
-            icsr['drug_names'] = []
+            summaries[icsr['id']] = CaseSummary(
+                icsr_id=icsr['id'],
+                case_number=icsr['case_number'] or '',
+                creation_date=icsr['creation_date'] or '',
+                received_date=icsr['received_date'] or '',
+                reaction_names=[],
+                drug_names=[],
+            )
 
         for prop_name, data in {'reaction_names': events, 'drug_names': drugs}.items():
-            for item in data:
-                icsr_id = item['icsr']
-                result[icsr_id][prop_name].append(item[prop_name])
+            for icsr_id, value in data:
+                getattr(summaries[icsr_id], prop_name).append(value)
 
-        for seriousness in seriousness_data:
-            icsr_id = seriousness['icsr']
-            result[icsr_id]['serious'] = seriousness['serious']
+        for icsr_id in serious_icsr_ids:
+            summaries[icsr_id].serious = True
+
+        CaseSummary.objects.bulk_create(
+            summaries.values(),
+            update_conflicts=True,
+            unique_fields=['icsr'],
+            update_fields=['case_number', 'creation_date', 'received_date', 'serious', 'reaction_names', 'drug_names']
+        )
 
-        return list(result.values())
-    
     def pre_create(self) -> None:
         # C.1 is always created
         temp_c_1_name = ef.temp_relation_field_utils\
@@ -140,7 +161,7 @@ class ICSR(StorageModel):
             c_1 = C_1_identification_case_safety_report(icsr=self)
             setattr(self, temp_c_1_name, c_1)
 
-    def pre_update(self) -> None:
+    def pre_update(self, old_model: t.Self) -> None:
         # C.1 can never be recreated for icsr, only updated
         temp_c_1_name = ef.temp_relation_field_utils\
             .make_special_field_name('c_1_identification_case_safety_report')
@@ -148,33 +169,56 @@ class ICSR(StorageModel):
         if not new_c_1:
             return
         try:
-            old_c_1 = self.c_1_identification_case_safety_report
+            old_c_1 = old_model.c_1_identification_case_safety_report
         except C_1_identification_case_safety_report.DoesNotExist:
             return
         if new_c_1.id != old_c_1.id:
             raise UserError('C.1 cannot be recreated for ICSR, consider updating it with the id instead')
         
-    def post_create(self) -> None:
-        self.post_save()
-
     def post_update(self) -> None:
         self.post_save()
 
+    @classmethod
+    def post_bulk_create(cls, models: t.Sequence[t.Self]) -> None:
+        icsr_ids = [model.id for model in models]
+        ICSRXmlFragment.bump_revisions(icsr_ids)
+        ICSRDocument.bump_revisions(icsr_ids)
+        c_1s = C_1_identification_case_safety_report.calculate_many_c_1_1(
+            [c_1 for model in models if (c_1 := model.get_c_1_missing_c_1_1()) is not None]
+        )
+        C_1_identification_case_safety_report.objects.bulk_update(c_1s, ['c_1_1_sender_safety_report_unique_id'])
+        cls.refresh_summaries(icsr_ids)
+
     def post_save(self) -> None:
+        ICSRXmlFragment.bump_revision(self.id)
+        ICSRDocument.bump_revisions([self.id])
+        c_1 = self.get_c_1_missing_c_1_1()
+        if c_1 is not None and C_1_identification_case_safety_report.calculate_many_c_1_1([c_1]):
+            c_1.save()
+        self.refresh_summaries([self.id])
+
+    def get_c_1_missing_c_1_1(self) -> 'C_1_identification_case_safety_report | None':
+        """Returns C.1 if its C.1.1 is missing."""
         try:
             c_1 = self.c_1_identification_case_safety_report
         except C_1_identification_case_safety_report.DoesNotExist:
-            return
-        if not c_1.c_1_1_sender_safety_report_unique_id:
-            c_1.calculate_c_1_1()
-            c_1.save()
-
+            return None
+        return None if c_1.c_1_1_sender_safety_report_unique_id else c_1
 
 # C_1_identification_case_safety_report
 
 
 class C_1_identification_case_safety_report(StorageModel):
-    class Meta: pass
+    class Meta:
+        constraints = [
+            # Index of the unique constraint covers lookups of stored cases by follow-ups,
+            # so that they don't read the table (see app.src.layers.api.e2b.duplicates)
+            m.UniqueConstraint(
+                fields=['c_1_8_1_worldwide_unique_case_identification_number'],
+                include=['id', 'icsr', 'c_1_1_sender_safety_report_unique_id', 'c_1_5_date_most_recent_information'],
+                name='c_1_8_1_unique_follow_up'
+            ),
+        ]
 
     icsr = m.OneToOneField(
         to=ICSR,
@@ -195,7 +239,7 @@ class C_1_identification_case_safety_report(StorageModel):
     nf_c_1_7_fulfil_local_criteria_expedited_report = m.CharField(null=True, choices=[NF.NI])
 
     # c_1_8_worldwide_unique_case_identification
-    c_1_8_1_worldwide_unique_case_identification_number = m.CharField(null=True, unique=True)
+    c_1_8_1_worldwide_unique_case_identification_number = m.CharField(null=True)
     c_1_8_2_first_sender = m.IntegerField(null=True, choices=e.C_1_8_2_first_sender)
 
     # c_1_9_other_case_ids
@@ -206,13 +250,11 @@ class C_1_identification_case_safety_report(StorageModel):
     c_1_11_1_report_nullification_amendment = m.IntegerField(null=True, choices=e.C_1_11_1_report_nullification_amendment)
     c_1_11_2_reason_nullification_amendment = m.CharField(null=True)
 
-    def pre_create(self) -> None:
-        if not self.c_1_1_sender_safety_report_unique_id:
-            self.calculate_c_1_1()
+    # C.1.1 of a new C.1 is calculated by ICSR after creation (see ICSR.post_save),
+    # as it contains the id and requires primary source, which are not stored yet
 
-    def pre_update(self) -> None:
-        old_self = self.__class__.objects.get(id=self.id)
-        old_c_1_1 = old_self.c_1_1_sender_safety_report_unique_id
+    def pre_update(self, old_model: t.Self) -> None:
+        old_c_1_1 = old_model.c_1_1_sender_safety_report_unique_id
         new_c_1_1 = self.c_1_1_sender_safety_report_unique_id
 
         if not old_c_1_1:
@@ -225,27 +267,41 @@ class C_1_identification_case_safety_report(StorageModel):
                 self.c_1_1_sender_safety_report_unique_id = old_c_1_1
         
     def calculate_c_1_1(self) -> None:
+        self.calculate_many_c_1_1([self])
+
+    @classmethod
+    def calculate_many_c_1_1(cls, c_1s: t.Sequence[t.Self]) -> t.Sequence[t.Self]:
+        """
+        Calculates C.1.1 from the country of the primary source with one query for all models,
+        returns the models whose C.1.1 has been calculated.
+        """
         try:
             company_name = os.environ['COMPANY_NAME']
         except KeyError:
-            return
-        
-        icsr = self.icsr
-        if not icsr:
-            return
-            
-        primary_c_2_r = icsr.c_2_r_primary_source_information.filter(
-            c_2_r_5_primary_source_regulatory_purposes=
-                e.C_2_r_5_primary_source_regulatory_purposes.PRIMARY
+            return []
+
+        c_1s = [c_1 for c_1 in c_1s if c_1.icsr_id is not None]
+        if not c_1s:
+            return []
+
+        # There is at most one primary source per ICSR (see C_2_r_primary_source_information constraints)
+        icsr_id_to_country_code_dict = dict(
+            C_2_r_primary_source_information.objects
+                .filter(
+                    icsr__in=[c_1.icsr_id for c_1 in c_1s],
+                    c_2_r_5_primary_source_regulatory_purposes=e.C_2_r_5_primary_source_regulatory_purposes.PRIMARY
+                )
+                .values_list('icsr', 'c_2_r_3_reporter_country_code')
         )
-        if len(primary_c_2_r) != 1:
-            return
-        
-        country_code = primary_c_2_r[0].c_2_r_3_reporter_country_code
-        if not country_code:
-            return
 
-        self.c_1_1_sender_safety_report_unique_id = '-'.join([country_code, company_name, str(self.id)])
+        calculated_c_1s = []
+        for c_1 in c_1s:
+            country_code = icsr_id_to_country_code_dict.get(c_1.icsr_id)
+            if not country_code:
+                continue
+            c_1.c_1_1_sender_safety_report_unique_id = '-'.join([country_code, company_name, str(c_1.id)])
+            calculated_c_1s.append(c_1)
+        return calculated_c_1s
 
 
 class C_1_6_1_r_documents_held_sender(StorageModel):
@@ -0,0 +1,163 @@
+import base64
+import binascii
+from datetime import datetime, timedelta
+import json
+import typing as t
+
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.db import models as m
+
+from app.src.exceptions import UserError
+
+
+class CaseSummary(m.Model):
+    """
+    Row of the case list, is refreshed on every ICSR save in the same transaction (see ICSR.refresh_summaries),
+    so that the list is read with one query instead of merging related tables.
+
+    Only saves made through StorageService refresh it. ICSRs created or changed in other ways
+    (Django ORM, admin, raw sql) are missing from the list or shown with stale values
+    until rebuild_case_summaries management command is run for them.
+    """
+
+    # Columns the list can be sorted by, every sort is backed by an index together with icsr
+    SORT_FIELDS = ['creation_date', 'received_date', 'case_number']
+    DEFAULT_SORT = '-creation_date'
+    DEFAULT_PAGE_SIZE = 50
+    MAX_PAGE_SIZE = 500
+    DATE_FORMAT = '%Y%m%d'
+
+    class Meta:
+        db_table = 'case_summary'
+        indexes = [
+            # Covers the default order of the list
+            m.Index(fields=['-creation_date', '-icsr'], name='case_summary_creation_idx'),
+            m.Index(fields=['-received_date', '-icsr'], name='case_summary_received_idx'),
+            m.Index(fields=['case_number', 'icsr'], name='case_summary_case_number_idx'),
+            # Serious cases are a small part of all cases, so they are not found by scanning the whole list
+            m.Index(
+                fields=['-creation_date', '-icsr'],
+                condition=m.Q(serious=True),
+                name='case_summary_serious_idx'
+            ),
+            GinIndex(fields=['reaction_names'], name='case_summary_reactions_idx'),
+            GinIndex(fields=['drug_names'], name='case_summary_drugs_idx'),
+        ]
+
+    # Backward relation is hidden, so that it is not treated as ICSR data
+    icsr = m.OneToOneField(to='ICSR', on_delete=m.CASCADE, primary_key=True, related_name='+')
+    # Missing values of the sort fields are stored as empty strings, so that pages are bounded by index ranges
+    case_number = m.CharField(default='')
+    creation_date = m.CharField(default='')
+    received_date = m.CharField(default='')
+    serious = m.BooleanField(default=False)
+    # MedDRA codes of the highlighted reactions
+    reaction_names = ArrayField(m.PositiveIntegerField(null=True), default=list)
+    # PhPIDs of the suspect drugs
+    drug_names = ArrayField(m.CharField(null=True), default=list)
+
+    @classmethod
+    def get_list_values(cls, queryset: m.QuerySet) -> list[dict[str, t.Any]]:
+        rows = list(queryset.values(
+            'case_number', 'creation_date', 'received_date', 'serious', 'reaction_names', 'drug_names',
+            id=m.F('icsr')
+        ))
+        # Missing values are returned as null as in ICSR
+        for row in rows:
+            for field_name in cls.SORT_FIELDS:
+                row[field_name] = row[field_name] or None
+        return rows
+
+    @classmethod
+    def page(cls, params: t.Mapping[str, str]) -> dict[str, t.Any]:
+        """
+        Returns a page of the case list and a cursor of the next page, which is None for the last one.
+        Params are the query parameters of the list request:
+        limit, cursor, sort (field name prefixed with "-" for descending order), serious (true or false),
+        creation_date_from, creation_date_to, received_date_from, received_date_to (YYYYMMDD, inclusive),
+        drug (PhPID of a suspect drug) and reaction (MedDRA code of a highlighted reaction).
+        """
+        sort = params.get('sort', cls.DEFAULT_SORT)
+        field_name = sort.removeprefix('-')
+        if field_name not in cls.SORT_FIELDS:
+            raise UserError(f'Invalid sort {sort}, expected one of {", ".join(cls.SORT_FIELDS)} optionally prefixed with -')
+        is_descending = sort.startswith('-')
+
+        limit = cls._parse_int(params, 'limit', cls.DEFAULT_PAGE_SIZE)
+        if not 1 <= limit <= cls.MAX_PAGE_SIZE:
+            raise UserError(f'Invalid limit {limit}, expected a number from 1 to {cls.MAX_PAGE_SIZE}')
+
+        queryset = cls.objects.filter(cls._get_filter(params))
+        if 'cursor' in params:
+            queryset = queryset.filter(cls._get_cursor_filter(params['cursor'], sort, field_name, is_descending))
+
+        order_by = [sort, '-icsr' if is_descending else 'icsr']
+        # One more row is read to know if there is the next page
+        rows = cls.get_list_values(queryset.order_by(*order_by)[:limit + 1])
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = cls._encode_cursor(sort, rows[-1][field_name] or '', rows[-1]['id'])
+        return {'results': rows, 'next_cursor': next_cursor}
+
+    @classmethod
+    def _get_filter(cls, params: t.Mapping[str, str]) -> m.Q:
+        q = m.Q()
+        if 'serious' in params:
+            if params['serious'] not in ['true', 'false']:
+                raise UserError(f'Invalid serious {params["serious"]}, expected true or false')
+            q &= m.Q(serious=params['serious'] == 'true')
+        for field_name in ['creation_date', 'received_date']:
+            # Dates are stored as E2B strings, so days are compared as string ranges
+            if f'{field_name}_from' in params:
+                date = cls._parse_date(params, f'{field_name}_from')
+                q &= m.Q(**{f'{field_name}__gte': date.strftime(cls.DATE_FORMAT)})
+            if f'{field_name}_to' in params:
+                date = cls._parse_date(params, f'{field_name}_to')
+                q &= m.Q(**{f'{field_name}__lt': (date + timedelta(days=1)).strftime(cls.DATE_FORMAT)})
+        if 'drug' in params:
+            q &= m.Q(drug_names__contains=[params['drug']])
+        if 'reaction' in params:
+            q &= m.Q(reaction_names__contains=[cls._parse_int(params, 'reaction', None)])
+        return q
+
+    @staticmethod
+    def _get_cursor_filter(cursor: str, sort: str, field_name: str, is_descending: bool) -> m.Q:
+        try:
+            cursor_data = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            cursor_sort, value, icsr_id = cursor_data['sort'], cursor_data['value'], int(cursor_data['id'])
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError):
+            raise UserError('Invalid cursor')
+        if not isinstance(value, str):
+            raise UserError('Invalid cursor')
+        if cursor_sort != sort:
+            raise UserError('Cursor was returned for another sort')
+
+        # Rows after (value, id) in the order of the page, the first condition is the range the index scan starts from,
+        # the second one skips the rows with the same value which have already been returned
+        if is_descending:
+            return m.Q(**{f'{field_name}__lte': value}) \
+                & (m.Q(**{f'{field_name}__lt': value}) | m.Q(icsr__lt=icsr_id))
+        return m.Q(**{f'{field_name}__gte': value}) \
+            & (m.Q(**{f'{field_name}__gt': value}) | m.Q(icsr__gt=icsr_id))
+
+    @staticmethod
+    def _encode_cursor(sort: str, value: str, icsr_id: int) -> str:
+        cursor_data = {'sort': sort, 'value': value, 'id': icsr_id}
+        return base64.urlsafe_b64encode(json.dumps(cursor_data).encode()).decode()
+
+    @staticmethod
+    def _parse_int(params: t.Mapping[str, str], name: str, default: int | None) -> int:
+        try:
+            return int(params[name]) if name in params else default
+        except ValueError:
+            raise UserError(f'Invalid {name} {params[name]}, expected a number')
+
+    @classmethod
+    def _parse_date(cls, params: t.Mapping[str, str], name: str) -> datetime:
+        try:
+            return datetime.strptime(params[name], cls.DATE_FORMAT)
+        except ValueError:
+            raise UserError(f'Invalid {name} {params[name]}, expected a date in YYYYMMDD format')
@@ -1,4 +1,5 @@
-import enum
+import dataclasses as dc
+import functools
 import typing as t
 
 from django.core import exceptions as dje
@@ -11,60 +12,89 @@ from app.src.layers.storage.models import StorageModel
 from extensions.django.fields import temp_relation_field_utils
 
 
+@dc.dataclass(frozen=True)
+class LoadPlan:
+    """
+    Related lookups loading a model with all its related models in a constant number of queries.
+    Backward 1-1 relations reachable from the model only through 1-1 relations are joined,
+    the other relations are prefetched with one query per table.
+    """
+    select_related: tuple[str, ...]
+    prefetch_related: tuple[str, ...]
+
+    def apply(self, queryset: djm.QuerySet) -> djm.QuerySet:
+        return queryset.select_related(*self.select_related).prefetch_related(*self.prefetch_related)
+
+
 class StorageService(ServiceProtocol[StorageModel]):
-    class SaveOperation(enum.Enum):
-        INSERT = enum.auto()
-        UPDATE = enum.auto()
+    READ_MANY_CHUNK_SIZE = 500
 
     def list(self, model_class: type[StorageModel]) -> list[dict[str, t.Any]]:
         return model_class.list()
 
+    def list_page(self, model_class: type[StorageModel], params: t.Mapping[str, str]) -> dict[str, t.Any]:
+        return model_class.list_page(params)
+
     def read(self, model_class: type[StorageModel], pk: int) -> StorageModel:
+        """Returns the model with all its related models loaded (see LoadPlan)."""
         try:
-            return model_class.objects.get(pk=pk)
+            return self.get_load_plan(model_class).apply(model_class.objects).get(pk=pk)
         except dje.ObjectDoesNotExist:
             raise UserError(f"{model_class.__name__} object with id {pk} doesn't exist")
 
+    def read_many(self, model_class: type[StorageModel], pks: t.Iterable[int]) -> t.Iterator[StorageModel]:
+        """
+        Yields models with all their related models in the order of pks.
+        Every chunk of pks is loaded with one query per related table, missing pks are skipped.
+        """
+        load_plan = self.get_load_plan(model_class)
+        pks = list(pks)
+
+        for start in range(0, len(pks), self.READ_MANY_CHUNK_SIZE):
+            chunk = pks[start:start + self.READ_MANY_CHUNK_SIZE]
+            models = load_plan.apply(model_class.objects.filter(pk__in=chunk))
+            pk_to_model_dict = {model.pk: model for model in models}
+            for pk in chunk:
+                if pk in pk_to_model_dict:
+                    yield pk_to_model_dict[pk]
+
     @transaction.atomic
     def create(self, new_model: StorageModel) -> tuple[StorageModel, bool]:
         if new_model.id is not None:
             raise UserError('Id can not be specified when creating a new entity')
-        
-        new_model.pre_create()
-        self._save_with_related(new_model, self.SaveOperation.INSERT)
-        new_model.post_create()
+
+        self._bulk_create_with_related([new_model])
         return new_model, True
 
+    @transaction.atomic
+    def create_many(self, new_models: t.Sequence[StorageModel]) -> t.Sequence[tuple[StorageModel, bool]]:
+        """
+        Creates models with all their related models level by level.
+        Models of every level are inserted with one query per model class,
+        so the number of queries depends on the depth of relations, not on the number of models.
+        """
+        if any(new_model.id is not None for new_model in new_models):
+            raise UserError('Id can not be specified when creating a new entity')
+
+        self._bulk_create_with_related(new_models)
+        return [(new_model, True) for new_model in new_models]
+
     @transaction.atomic
     def update(self, new_model: StorageModel, pk: int) -> tuple[StorageModel, bool]:
+        """
+        Compares the new model and its related models with the stored ones in memory and applies the difference
+        with one delete, one update and one insert query per model class, unchanged models aren't written.
+        Related models without ids are created, stored related models missing in the new model are deleted.
+        Updated model is read again with all its related models (see LoadPlan), as the new model may miss some of them.
+        """
         new_model.id = pk
-        try:
-            old_model = self.read(type(new_model), pk)
-        except dje.ObjectDoesNotExist:
+        # Only relations present in the new model are compared, so only they are loaded
+        old_model = type(new_model).objects \
+            .filter(pk=pk) \
+            .prefetch_related(*self._get_update_prefetch_lookups(new_model)) \
+            .first()
+        if old_model is None:
             raise UserError(f'Cannot update not existing entity: {new_model.__class__.__name__}(id={pk})')
-        
-        new_model.pre_update()
-
-        # Delete old related models if they are missing in new model
-        for key, new_value in vars(new_model).items():
-            if not temp_relation_field_utils.is_special_field_name(key):
-                continue
-
-            field_name = temp_relation_field_utils.get_base_field_name(key)
-            field = new_model._meta.get_field(field_name)
-            old_value = getattr(old_model, field_name, None)
-            if not old_value:
-                continue
-
-            if field.many_to_one or field.one_to_one:
-                if not new_value or new_value.id != old_value.id:
-                    self.delete_model(old_value)
-            else:
-                old_id_to_model_dict = {v.id: v for v in old_value.all()}
-                old_ids = old_id_to_model_dict.keys()
-                new_ids = set(v.id for v in new_value) if new_value else set()
-                for old_id in old_ids - new_ids:
-                    self.delete_model(old_id_to_model_dict[old_id])
 
         # Check that model doesn't change fk as it is not allowed
         fk_names = [
@@ -81,41 +111,217 @@ class StorageService(ServiceProtocol[StorageModel]):
                     '"{new_model.__class__.__name__}.{fk_name}"'
                 )
 
-        self._save_with_related(new_model, self.SaveOperation.UPDATE)
-        new_model.post_update()
-        return new_model, True
+        levels = []
+        level = [(new_model, old_model)]
+        models_to_create = []
+        class_to_deleted_ids_dict = {}
+        while level:
+            for new_level_model, old_level_model in level:
+                new_level_model.pre_update(old_level_model)
+            levels.append(level)
+            level = self._diff_related_models(level, models_to_create, class_to_deleted_ids_dict)
+
+        # Stored models are deleted first, so that the new ones don't violate unique constraints
+        for model_class, ids in class_to_deleted_ids_dict.items():
+            model_class.objects.filter(pk__in=ids).delete()
+        changed_models = [
+            new_level_model
+            for level in levels
+            for new_level_model, old_level_model in level
+            if self._is_changed(new_level_model, old_level_model)
+        ]
+        for model_class, models in self._group_by_class(changed_models).items():
+            model_class.objects.bulk_update(models, self._get_updatable_field_names(model_class))
+        self._bulk_create_with_related(models_to_create)
+
+        # Related models are processed before their parents as in create
+        for level in reversed(levels):
+            for new_level_model, _ in level:
+                new_level_model.post_update()
+        return self.read(type(new_model), pk), True
     
     def delete(self, model_class: type[StorageModel], pk: int) -> bool:
-        self.read(model_class, pk).delete()
+        # Related models are not loaded, as they are deleted by the database cascade collector anyway
+        try:
+            model = model_class.objects.get(pk=pk)
+        except dje.ObjectDoesNotExist:
+            raise UserError(f"{model_class.__name__} object with id {pk} doesn't exist")
+        model.delete()
         return True
 
-    def _save_with_related(self, new_model: StorageModel, save_operation: SaveOperation) -> None:
-        if not isinstance(save_operation, self.SaveOperation):
-            raise ValueError('Expected save_operation to be an instance of SaveOperation')
+    def _bulk_create_with_related(self, new_models: t.Sequence[StorageModel]) -> None:
+        """
+        Creates models with all their related models level by level.
+        Models of every level are inserted with one query per model class.
+        """
+        levels = []
+        level = list(new_models)
+        while level:
+            for new_model in level:
+                new_model.pre_create()
+            self._bulk_insert(level)
+            levels.append(level)
+            level = self._get_related_models_to_create(level)
 
-        new_model.save(
-            # To prevent django from inserting an entity with the id that does not exist
-            force_insert=save_operation == self.SaveOperation.INSERT,
-            force_update=save_operation == self.SaveOperation.UPDATE
-        )
+        # Related models are processed before their parents as in create
+        for level in reversed(levels):
+            for model_class, models in self._group_by_class(level).items():
+                model_class.post_bulk_create(models)
+
+        # All related models of the created ones are in memory, so they are converted without queries
+        for level in levels:
+            for new_model in level:
+                self._set_missing_temp_relations(new_model)
+
+    @staticmethod
+    def _set_missing_temp_relations(model: StorageModel) -> None:
+        for field in model._meta.get_fields():
+            if not isinstance(field, djm.ForeignObjectRel) or field.many_to_many:
+                continue
+            temp_field_name = temp_relation_field_utils.make_special_field_name(field.name)
+            if temp_field_name not in vars(model):
+                setattr(model, temp_field_name, [] if field.one_to_many else None)
+
+    @staticmethod
+    def _diff_related_models(
+        model_pairs: t.Sequence[tuple[StorageModel, StorageModel]],
+        models_to_create: t.MutableSequence[StorageModel],
+        class_to_deleted_ids_dict: dict[type[StorageModel], t.MutableSequence[int]]
+    ) -> t.Sequence[tuple[StorageModel, StorageModel]]:
+        """
+        Compares related models of the new and the stored models, which are expected to be prefetched.
+        New related models are added to models_to_create, ids of the missing stored ones are added
+        to class_to_deleted_ids_dict. Returns pairs of the new and the stored related models with the same id.
+        """
+        related_model_pairs = []
+        for new_model, old_model in model_pairs:
+            for key, value in vars(new_model).items():
+                if not temp_relation_field_utils.is_special_field_name(key):
+                    continue
+
+                field_name = temp_relation_field_utils.get_base_field_name(key)
+                field = new_model._meta.get_field(field_name)
+                related_field_name = field.remote_field.name
+                if field.one_to_one:
+                    try:
+                        old_related_models = [getattr(old_model, field_name)]
+                    except dje.ObjectDoesNotExist:
+                        old_related_models = []
+                else:
+                    old_related_models = list(getattr(old_model, field_name).all())
+                old_id_to_model_dict = {old_related_model.id: old_related_model for old_related_model in old_related_models}
+
+                new_related_models = value if isinstance(value, list) else [value]
+                new_ids = set()
+                for new_related_model in new_related_models:
+                    if new_related_model is None:
+                        continue
+                    setattr(new_related_model, related_field_name, new_model)
+                    if new_related_model.id is None:
+                        models_to_create.append(new_related_model)
+                        continue
+                    if new_related_model.id not in old_id_to_model_dict:
+                        raise UserError(
+                            f'Forbidden atempt to change the foreign key '
+                            f'"{new_related_model.__class__.__name__}.{related_field_name}"'
+                        )
+                    new_ids.add(new_related_model.id)
+                    related_model_pairs.append((new_related_model, old_id_to_model_dict[new_related_model.id]))
 
-        # Create or update related models
+                for old_id, old_related_model in old_id_to_model_dict.items():
+                    if old_id not in new_ids:
+                        class_to_deleted_ids_dict.setdefault(type(old_related_model), []).append(old_id)
+        return related_model_pairs
+
+    @classmethod
+    def _get_update_prefetch_lookups(cls, new_model: StorageModel, prefix: str = '') -> t.Sequence[str]:
+        # Relations of the new related models are compared only for the ones which are already stored
+        lookups = []
         for key, value in vars(new_model).items():
             if not temp_relation_field_utils.is_special_field_name(key):
                 continue
+            lookup = prefix + temp_relation_field_utils.get_base_field_name(key)
+            lookups.append(lookup)
+
+            related_lookups = []
+            for related_model in (value if isinstance(value, list) else [value]):
+                if related_model is not None and related_model.id is not None:
+                    related_lookups.extend(cls._get_update_prefetch_lookups(related_model, lookup + '__'))
+            # Lookups are kept in order of their first appearance
+            lookups.extend(dict.fromkeys(related_lookups))
+        return lookups
+
+    @staticmethod
+    def _is_changed(new_model: StorageModel, old_model: StorageModel) -> bool:
+        return any(
+            field.value_from_object(new_model) != field.value_from_object(old_model)
+            for field in new_model._meta.concrete_fields
+        )
+
+    @staticmethod
+    def _get_updatable_field_names(model_class: type[StorageModel]) -> t.Sequence[str]:
+        return [field.name for field in model_class._meta.concrete_fields if not field.primary_key]
 
-            field_name = temp_relation_field_utils.get_base_field_name(key)
-            related_field_name = new_model._meta.get_field(field_name).remote_field.name
-            related_models = value if isinstance(value, list) else [value]
+    @classmethod
+    def _bulk_insert(cls, new_models: t.Sequence[StorageModel]) -> None:
+        # Primary keys are returned by the database and set to the models
+        for model_class, models in cls._group_by_class(new_models).items():
+            model_class.objects.bulk_create(models)
 
-            for related_model in related_models:
-                if related_model is None:
+    @staticmethod
+    def _get_related_models_to_create(new_models: t.Sequence[StorageModel]) -> t.Sequence[StorageModel]:
+        related_models_to_create = []
+        for new_model in new_models:
+            for key, value in vars(new_model).items():
+                if not temp_relation_field_utils.is_special_field_name(key):
                     continue
-                setattr(related_model, related_field_name, new_model)
-                if related_model.id is None:
-                    self.create(related_model)
-                else:
-                    self.update(related_model, related_model.id)
 
-    def delete_model(self, old_model: StorageModel) -> None:
-        self.delete(type(old_model), old_model.pk)
+                field_name = temp_relation_field_utils.get_base_field_name(key)
+                related_field_name = new_model._meta.get_field(field_name).remote_field.name
+                related_models = value if isinstance(value, list) else [value]
+
+                for related_model in related_models:
+                    if related_model is None:
+                        continue
+                    if related_model.id is not None:
+                        raise UserError('Id can not be specified when creating a new entity')
+                    # Parent already has the id, so the foreign key value is set as well
+                    setattr(related_model, related_field_name, new_model)
+                    related_models_to_create.append(related_model)
+        return related_models_to_create
+
+    @staticmethod
+    def _group_by_class(models: t.Sequence[StorageModel]) -> dict[type[StorageModel], t.Sequence[StorageModel]]:
+        class_to_models_dict = {}
+        for model in models:
+            class_to_models_dict.setdefault(type(model), []).append(model)
+        return class_to_models_dict
+
+    @classmethod
+    @functools.cache
+    def get_load_plan(cls, model_class: type[StorageModel]) -> LoadPlan:
+        """Is built once per model class from its metadata."""
+        select_related = []
+        prefetch_related = []
+        cls._collect_lookups(model_class, '', True, select_related, prefetch_related)
+        return LoadPlan(tuple(select_related), tuple(prefetch_related))
+
+    @classmethod
+    def _collect_lookups(
+        cls,
+        model_class: type[StorageModel],
+        prefix: str,
+        is_joined: bool,
+        select_related: t.MutableSequence[str],
+        prefetch_related: t.MutableSequence[str]
+    ) -> None:
+        # Only backward relations are loaded as the related models are stored in them
+        # (see StorageToDomainModelConverter)
+        for field in model_class._meta.get_fields():
+            if not isinstance(field, djm.ForeignObjectRel) or field.many_to_many:
+                continue
+            lookup = prefix + field.name
+            # Rows of 1-1 relations are joined to their parent while there is no 1-m relation in between
+            is_field_joined = is_joined and field.one_to_one
+            (select_related if is_field_joined else prefetch_related).append(lookup)
+            cls._collect_lookups(field.related_model, lookup + '__', is_field_joined, select_related, prefetch_related)
@@ -1,24 +1,62 @@
 import base64
+import concurrent.futures as cf
 import dataclasses as dc
+from datetime import timedelta
 from http import HTTPStatus
+import io
 import json
 import logging
+import os
+import re
+import shutil
 import typing as t
 import tempfile
+import unittest
+from unittest import mock
+from urllib.parse import urlencode
 
 from django import http
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.test import TestCase, Client
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-
+from django.utils import timezone as djtz
+from lxml import etree
+
+from app.src.exceptions import UserError
+from app.src.layers.api.document_cache import document_cache
+from app.src.layers.api.e2b import archive as e2b_archive
+from app.src.layers.api.e2b import corpus as e2b_corpus
+from app.src.layers.api.e2b import duplicates as e2b_duplicates
+from app.src.layers.api.e2b import export_jobs
+from app.src.layers.api.e2b import fragment_cache as e2b_fragment_cache
+from app.src.layers.api.e2b import import_jobs as e2b_import_jobs
+from app.src.layers.api.e2b import inbox as e2b_inbox
+from app.src.layers.api.e2b import mapping as e2b_mapping
+from app.src.layers.api.e2b import parallel as e2b_parallel
+from app.src.layers.api.e2b import schema as e2b_schema
+from app.src.layers.api.e2b import template as e2b_template
+from app.src.layers.api import xml_codec
+from app.src.layers.api.models import icsr as api_models
+from app.src.layers.api.models.jobs import ExportJob, ImportJob
 from app.src.layers.api.models.logging import Log
+from app.src.layers.domain import models as dm
 from app.src.layers.storage import models as sm
+from app.src.layers.api.views import ExportMultipleXmlView, ImportMultipleXmlView
+from app.urls import domain_service_adapter, storage_service_adapter
 from app.src.layers.storage.models import DosageFormCode
 
 PATH_BASE = '/api/icsr'
 USERNAME = 'testuser'
 PASSWORD = 'smth1234.'
 AUTH = (USERNAME, PASSWORD)
+# Minimal E2B.xml, the full template isn't kept in the repository
+TEMPLATE_FIXTURE_PATH = settings.BASE_DIR / 'app' / 'fixtures' / 'e2b_template.xml'
 
 
 @dc.dataclass(frozen=True)
@@ -64,6 +102,20 @@ DELETE_RD = RequestData(method=CLIENT.delete, path=PATH_BASE, id=0)
 VALIDATE_RD = RequestData(method=CLIENT.post, path=PATH_BASE + '/validate')
 TO_XML_RD = RequestData(method=CLIENT.post, path=PATH_BASE + '/to-xml')
 FROM_XML_RD = RequestData(method=CLIENT.post, path=PATH_BASE + '/from-xml')
+EXPORT_JOBS_RD = RequestData(method=CLIENT.post, path=PATH_BASE + '/export-jobs')
+EXPORT_JOB_RD = RequestData(method=CLIENT.get, path=PATH_BASE + '/export-jobs')
+EXPORT_MULTIPLE_RD = RequestData(method=CLIENT.post, path=PATH_BASE + '/export-multiple')
+IMPORT_MULTIPLE_RD = RequestData(method=CLIENT.post, path=PATH_BASE + '/import-multiple')
+IMPORT_JOBS_RD = RequestData(method=CLIENT.post, path=PATH_BASE + '/import-jobs')
+IMPORT_JOB_RD = RequestData(method=CLIENT.get, path=PATH_BASE + '/import-jobs')
+
+
+def import_test_message(root: etree._Element, icsr: api_models.ICSR) -> api_models.ICSR:
+    """Stands in for ImportMultipleXmlView.import_single_xml, only C.1.1 is read from the message."""
+    case_id = root.find('.//{urn:hl7-org:v3}investigationEvent/{urn:hl7-org:v3}id').get('extension')
+    return api_models.ICSR.model_validate({'c_1_identification_case_safety_report': {
+        'c_1_1_sender_safety_report_unique_id': {'value': case_id},
+    }})
 
 
 class MainTestCase(TestCase):
@@ -131,8 +183,8 @@ class MainTestCase(TestCase):
 
     def test_list_cases(self):
         count = 3
-        for _ in range(count):
-            sm.ICSR.objects.create()
+        # Case list is read from the summaries maintained by the storage service
+        storage_service_adapter.create_many([dm.ICSR.model_validate({}) for _ in range(count)])
 
         resp = LIST_RD.call()
         cont = json.loads(resp.content)
@@ -140,6 +192,71 @@ class MainTestCase(TestCase):
         self.assertEqual(resp.status_code, HTTPStatus.OK)
         self.assertEqual(len(cont), count)
 
+    def test_case_summary(self):
+        data = {
+            'c_1_identification_case_safety_report': {'c_1_2_date_creation': '20240101'},
+            # Links of drugs to reactions are checked on raw data (see dm.ICSR._validate_uuids)
+            'e_i_reaction_event': [
+                {'id': None, 'e_i_2_1b_reaction_meddra_code': 10019211, 'e_i_3_1_term_highlighted_reporter': 1},
+                {'id': None, 'e_i_2_1b_reaction_meddra_code': 10028813},
+            ],
+            'g_k_drug_information': [
+                {'g_k_1_characterisation_drug_role': 1, 'g_k_2_1_2b_phpid': 'abc', 'g_k_9_i_drug_reaction_matrix': []}
+            ],
+        }
+        (model, _), = storage_service_adapter.create_many([dm.ICSR.model_validate(data)])
+        summary = sm.CaseSummary.objects.get(icsr_id=model.id)
+        self.assertEqual(summary.creation_date, '20240101')
+        self.assertEqual(summary.reaction_names, [10019211])
+        self.assertEqual(summary.drug_names, ['abc'])
+        self.assertFalse(summary.serious)
+
+        reaction_id = model.e_i_reaction_event[1].id
+        data = {'e_i_reaction_event': [{'id': reaction_id, 'e_i_3_2a_results_death': True}]}
+        storage_service_adapter.update(dm.ICSR.model_validate(data), model.id)
+        summary.refresh_from_db()
+        self.assertEqual(summary.reaction_names, [])
+        self.assertTrue(summary.serious)
+
+        with CaptureQueriesContext(connection) as context:
+            icsrs = sm.ICSR.list()
+        self.assertEqual(len(context.captured_queries), 1)
+        self.assertEqual(icsrs[0]['id'], model.id)
+
+    def test_list_cases_page(self):
+        data = [
+            {
+                'c_1_identification_case_safety_report': {'c_1_2_date_creation': f'2024010{day}'},
+                'g_k_drug_information': [{'g_k_1_characterisation_drug_role': 1, 'g_k_2_1_2b_phpid': f'drug{day % 2}'}],
+            }
+            for day in range(1, 6)
+        ]
+        created = storage_service_adapter.create_many([dm.ICSR.model_validate(item) for item in data])
+        ids = [model.id for model, _ in created]
+
+        def get_page(**params):
+            resp = RequestData(method=CLIENT.get, path=f'{PATH_BASE}?{urlencode(params)}').call()
+            self.assertEqual(resp.status_code, HTTPStatus.OK)
+            page = json.loads(resp.content)
+            return [item['id'] for item in page['results']], page['next_cursor']
+
+        page_ids, cursor = get_page(limit=2)
+        self.assertEqual(page_ids, ids[:2:-1])
+        page_ids, cursor = get_page(limit=2, cursor=cursor)
+        self.assertEqual(page_ids, ids[2:0:-1])
+        page_ids, cursor = get_page(limit=2, cursor=cursor)
+        self.assertEqual((page_ids, cursor), (ids[:1], None))
+
+        self.assertEqual(get_page(sort='creation_date', creation_date_from='20240102', creation_date_to='20240103'), (ids[1:3], None))
+        self.assertEqual(get_page(sort='creation_date', drug='drug0'), ([ids[1], ids[3]], None))
+
+        resp = RequestData(method=CLIENT.get, path=f'{PATH_BASE}?cursor=abc').call()
+        self.assertEqual(resp.status_code, HTTPStatus.BAD_REQUEST)
+
+        # Unknown parameters such as cache busters don't change the whole list response
+        resp = RequestData(method=CLIENT.get, path=f'{PATH_BASE}?_=1').call()
+        self.assertEqual(len(json.loads(resp.content)), len(ids))
+
     def test_create_case(self):
         ini_data = {
             'c_3_information_sender_case_safety_report': {
@@ -288,6 +405,430 @@ class MainTestCase(TestCase):
         self.assertEqual(sm.C_2_r_primary_source_information.objects.count(), 0)
         self.assertEqual(len(sm.ICSR.objects.filter(id=icsr.id)), 0)
 
+    def test_read_many_cases(self):
+        icsrs = [sm.ICSR.objects.create() for _ in range(3)]
+        for icsr in icsrs:
+            sm.C_2_r_primary_source_information.objects.create(icsr=icsr)
+            drug = sm.G_k_drug_information.objects.create(icsr=icsr)
+            sm.G_k_4_r_dosage_information.objects.create(g_k_drug_information=drug)
+
+        def read_many(ids):
+            with CaptureQueriesContext(connection) as context:
+                models = list(storage_service_adapter.read_many(dm.ICSR, ids))
+            return models, len(context.captured_queries)
+
+        ids = [icsrs[2].id, icsrs[0].id, -1]
+        single_models, single_query_count = read_many(ids[:1])
+        models, query_count = read_many(ids)
+
+        self.assertEqual(query_count, single_query_count)
+        self.assertEqual([model.id for model in models], ids[:2])
+        for model in models:
+            self.assertEqual(len(model.c_2_r_primary_source_information), 1)
+            self.assertEqual(len(model.g_k_drug_information[0].g_k_4_r_dosage_information), 1)
+
+    @mock.patch.dict(os.environ, {'COMPANY_NAME': 'company'})
+    def test_create_many_cases(self):
+        data = {
+            'c_2_r_primary_source_information': [
+                {'c_2_r_3_reporter_country_code': 'DE', 'c_2_r_5_primary_source_regulatory_purposes': 1},
+                {}
+            ],
+            'g_k_drug_information': [{'g_k_4_r_dosage_information': [{}]}]
+        }
+
+        def create_many(count):
+            models = [dm.ICSR.model_validate(data) for _ in range(count)]
+            with CaptureQueriesContext(connection) as context:
+                results = storage_service_adapter.create_many(models)
+            return results, len(context.captured_queries)
+
+        _, single_query_count = create_many(1)
+        results, query_count = create_many(3)
+
+        self.assertEqual(query_count, single_query_count)
+        self.assertTrue(all(is_ok for _, is_ok in results))
+        self.assertEqual(sm.ICSR.objects.count(), 4)
+        self.assertEqual(sm.C_1_identification_case_safety_report.objects.count(), 4)
+        self.assertEqual(sm.C_2_r_primary_source_information.objects.count(), 8)
+        self.assertEqual(sm.G_k_4_r_dosage_information.objects.count(), 4)
+        for model, _ in results:
+            self.assertEqual(len(model.g_k_drug_information[0].g_k_4_r_dosage_information), 1)
+            # Created models are converted from memory, the result is the same as of a read
+            self.assertEqual(model, storage_service_adapter.read(dm.ICSR, model.id))
+        # C.1.1 is calculated for all cases with one query
+        self.assertEqual(
+            sm.C_1_identification_case_safety_report.objects.filter(c_1_1_sender_safety_report_unique_id__startswith='DE-company-').count(),
+            4
+        )
+
+    def test_read_case_queries(self):
+        def read(drug_count):
+            data = {
+                'c_2_r_primary_source_information': [{}],
+                'g_k_drug_information': [{'g_k_4_r_dosage_information': [{}, {}]} for _ in range(drug_count)]
+            }
+            (model, _), = storage_service_adapter.create_many([dm.ICSR.model_validate(data)])
+            with CaptureQueriesContext(connection) as context:
+                read_model = storage_service_adapter.read(dm.ICSR, model.id)
+            self.assertEqual(len(read_model.g_k_drug_information), drug_count)
+            self.assertEqual(len(read_model.g_k_drug_information[0].g_k_4_r_dosage_information), 2)
+            return len(context.captured_queries)
+
+        self.assertEqual(read(10), read(1))
+
+    def test_update_case_queries(self):
+        def update(drug_count):
+            data = {'g_k_drug_information': [{'g_k_4_r_dosage_information': [{}, {}]} for _ in range(drug_count)]}
+            (model, _), = storage_service_adapter.create_many([dm.ICSR.model_validate(data)])
+            drugs = model.g_k_drug_information
+            data = {
+                'g_k_drug_information': [
+                    {
+                        'id': drug.id,
+                        'g_k_2_2_medicinal_product_name_primary_source': 'abc',
+                        'g_k_4_r_dosage_information': [{'id': drug.g_k_4_r_dosage_information[0].id}, {}]
+                    }
+                    for drug in drugs[1:]
+                ]
+            }
+            with CaptureQueriesContext(connection) as context:
+                updated_model, is_ok = storage_service_adapter.update(dm.ICSR.model_validate(data), model.id)
+            self.assertTrue(is_ok)
+            # Returned model is read after the update with all its related models
+            self.assertEqual(updated_model, storage_service_adapter.read(dm.ICSR, model.id))
+            return model.id, len(context.captured_queries)
+
+        _, small_query_count = update(2)
+        icsr_id, query_count = update(10)
+
+        self.assertEqual(query_count, small_query_count)
+        drugs = sm.G_k_drug_information.objects.filter(icsr_id=icsr_id)
+        self.assertEqual(drugs.count(), 9)
+        self.assertTrue(all(drug.g_k_2_2_medicinal_product_name_primary_source == 'abc' for drug in drugs))
+        self.assertEqual(sm.G_k_4_r_dosage_information.objects.filter(g_k_drug_information__icsr_id=icsr_id).count(), 18)
+
+    def test_update_c_1_1(self):
+        data = {'c_1_identification_case_safety_report': {'c_1_1_sender_safety_report_unique_id': 'a'}}
+        (model, _), = storage_service_adapter.create_many([dm.ICSR.model_validate(data)])
+        c_1_id = model.c_1_identification_case_safety_report.id
+
+        # C.1.1 is compared with the stored C.1 loaded by the update
+        def update(c_1_1):
+            data = {'c_1_identification_case_safety_report': {'id': c_1_id, 'c_1_1_sender_safety_report_unique_id': c_1_1}}
+            storage_service_adapter.update(dm.ICSR.model_validate(data), model.id)
+
+        update(None)
+        self.assertEqual(sm.C_1_identification_case_safety_report.objects.get().c_1_1_sender_safety_report_unique_id, 'a')
+        with self.assertRaisesRegex(UserError, 'Cannot change once created C.1.1'):
+            update('b')
+
+    def test_export_read_many_errors(self):
+        ids = [sm.ICSR.objects.create().id for _ in range(3)]
+        view = ExportMultipleXmlView(domain_service=domain_service_adapter, model_class=api_models.ICSR)
+        converter = domain_service_adapter.lower_to_upper_model_converter
+        convert = converter.convert
+
+        def fail_second(model):
+            if model.id == ids[1]:
+                raise ValueError('broken')
+            return convert(model)
+
+        # Missing and broken cases are skipped, the following ones are still read
+        with mock.patch.object(converter, 'convert', side_effect=fail_second):
+            icsrs = list(view.read_many([ids[0], max(ids) + 1, ids[1], ids[2]]))
+        self.assertEqual([icsr.id for icsr in icsrs], [ids[0], ids[2]])
+
+    def test_export_fragment_cache(self):
+        icsrs = [sm.ICSR.objects.create() for _ in range(2)]
+        ids = [icsr.id for icsr in icsrs]
+        rendered_ids = []
+
+        def render_many(icsr_ids):
+            for icsr_id in icsr_ids:
+                rendered_ids.append(icsr_id)
+                yield icsr_id, f'<a id="{e2b_fragment_cache.MESSAGE_ID_PLACEHOLDER}">{icsr_id}</a>'.encode()
+
+        render_key = 'a'
+        fragment_cache = e2b_fragment_cache.FragmentCache(lambda: render_key)
+
+        def get_fragments():
+            return list(fragment_cache.get_fragments(ids, render_many))
+
+        fragments = get_fragments()
+        self.assertEqual(rendered_ids, ids)
+        self.assertEqual([icsr_id for icsr_id, _ in fragments], ids)
+        self.assertNotIn(e2b_fragment_cache.MESSAGE_ID_PLACEHOLDER.encode(), fragments[0][1])
+
+        rendered_ids.clear()
+        self.assertEqual(len(get_fragments()), 2)
+        self.assertEqual(rendered_ids, [])
+
+        icsrs[1].post_update()
+        get_fragments()
+        self.assertEqual(rendered_ids, ids[1:])
+
+        # Template or renderer has changed
+        rendered_ids.clear()
+        render_key = 'b'
+        get_fragments()
+        self.assertEqual(rendered_ids, ids)
+
+        # Render key follows changes of the rendering code
+        renderer_digest = e2b_fragment_cache.get_renderer_digest()
+        with mock.patch.object(ExportMultipleXmlView, 'convert_single_to_xml', lambda self, icsr, message_part: None):
+            self.assertNotEqual(e2b_fragment_cache.get_renderer_digest.__wrapped__(), renderer_digest)
+
+    @override_settings(ICSR_DOCUMENT_SNAPSHOTS=True)
+    def test_document_cache(self):
+        resp = CREATE_RD.call(data={'c_3_information_sender_case_safety_report': {'c_3_2_sender_organisation': {'value': 'abc'}}})
+        res_data = json.loads(resp.content)
+        icsr_id = res_data['id']
+        c_3_id = res_data['c_3_information_sender_case_safety_report']['id']
+
+        def read():
+            with CaptureQueriesContext(connection) as context:
+                resp = READ_RD.call(id=icsr_id)
+            res_data = json.loads(resp.content)
+            return res_data['c_3_information_sender_case_safety_report']['c_3_2_sender_organisation']['value'], \
+                len([query for query in context.captured_queries if 'app_icsrdocument' not in query['sql']])
+
+        self.assertEqual(read()[0], 'abc')
+        # Only the user is read besides the snapshot
+        self.assertEqual(read(), ('abc', 1))
+
+        data = {'c_3_information_sender_case_safety_report': {'id': c_3_id, 'c_3_2_sender_organisation': {'value': 'def'}}}
+        UPDATE_RD.call(id=icsr_id, data=data)
+        self.assertEqual(read()[0], 'def')
+
+        sm.ICSRDocument.objects.filter(icsr_id=icsr_id).update(built_revision=None)
+        self.assertEqual(document_cache.rebuild([icsr_id], lambda icsr_ids: iter([(icsr_id, '{"id": 0}')])), 1)
+        self.assertEqual(document_cache.rebuild([icsr_id], lambda icsr_ids: iter([])), 0)
+        self.assertEqual(json.loads(READ_RD.call(id=icsr_id).content), {'id': 0})
+
+    def test_parallel_export_engine(self):
+        engine = e2b_parallel.ParallelExportEngine(workers=1, max_shard_size=1)
+
+        def render_shard(icsr_ids):
+            return [
+                (icsr_id, e2b_parallel.CaseError('broken') if icsr_id == 3 else str(icsr_id).encode())
+                for icsr_id in icsr_ids
+            ]
+
+        # Threads stand in for worker processes, which can't see data of the test transaction
+        with (
+            cf.ThreadPoolExecutor(max_workers=1) as executor,
+            mock.patch.object(e2b_parallel, 'get_executor', return_value=executor),
+            mock.patch.object(e2b_parallel, '_render_shard', side_effect=render_shard),
+            mock.patch.object(executor, 'submit', wraps=executor.submit) as submit,
+        ):
+            shards = engine.render(list(range(6)))
+            first_shard = next(shards)
+            # Shards are submitted as they are consumed, not all at once
+            self.assertEqual(submit.call_count, engine.MAX_PENDING_SHARDS_PER_WORKER)
+            other_shards = list(shards)
+
+        self.assertEqual(first_shard, [(0, b'0')])
+        # Cases which fail to render are skipped, the order of ids is kept
+        self.assertEqual(other_shards, [[(1, b'1')], [(2, b'2')], [], [(4, b'4')], [(5, b'5')]])
+
+    def test_parallel_import_engine(self):
+        engine = e2b_parallel.ParallelImportEngine(workers=1, chunk_size=2)
+        messages = [
+            (
+                '<PORR_IN049016UV xmlns="urn:hl7-org:v3"><controlActProcess><subject><investigationEvent>'
+                f'<id root="2.16.840.1.113883.3.989.2.1.3.1" extension="parallel-{i}"/>'
+                '</investigationEvent></subject></controlActProcess></PORR_IN049016UV>'
+            ).encode()
+            for i in range(5)
+        ]
+        # Message without C.1.1 can't be converted
+        messages[2] = b'<PORR_IN049016UV xmlns="urn:hl7-org:v3"/>'
+
+        with (
+            cf.ThreadPoolExecutor(max_workers=2) as executor,
+            mock.patch.object(e2b_parallel, 'get_executor', return_value=executor),
+            mock.patch.object(ImportMultipleXmlView, 'import_single_xml', side_effect=import_test_message),
+            mock.patch.object(executor, 'submit', wraps=executor.submit) as submit,
+        ):
+            results = engine.parse(iter(messages))
+            first_result = next(results)
+            # Chunks are submitted as the models are consumed, not all at once
+            self.assertEqual(submit.call_count, engine.MAX_PENDING_CHUNKS_PER_WORKER)
+            results = [first_result, *results]
+
+        self.assertIsInstance(results[2], e2b_parallel.CaseError)
+        self.assertIn('AttributeError', results[2].message)
+        # Models are returned in the order of messages, other messages of the failed one's chunk are kept
+        self.assertEqual(
+            [result.c_1_identification_case_safety_report.c_1_1_sender_safety_report_unique_id.value for result in results[:2] + results[3:]],
+            ['parallel-0', 'parallel-1', 'parallel-3', 'parallel-4']
+        )
+
+    def test_export_job(self):
+        icsr = sm.ICSR.objects.create()
+
+        resp = EXPORT_JOBS_RD.call(data={'ids': [icsr.id]})
+        job_data = json.loads(resp.content)
+        self.assertEqual(resp.status_code, HTTPStatus.ACCEPTED)
+        self.assertEqual(job_data['status'], 'pending')
+
+        job = export_jobs.claim_next_job()
+        self.assertEqual(job.id, job_data['id'])
+        self.assertIsNone(export_jobs.claim_next_job())
+
+        resp = EXPORT_JOB_RD.call(id=job.id)
+        self.assertEqual(json.loads(resp.content)['status'], 'running')
+
+        file_rd = RequestData(method=CLIENT.get, path=PATH_BASE + f'/export-jobs/{job.id}/file')
+        self.assertEqual(file_rd.call().status_code, HTTPStatus.CONFLICT)
+
+        file_path = os.path.join(tempfile.mkdtemp(), 'job.xml')
+        with open(file_path, 'wb') as file:
+            file.write(b'<MCCI_IN200100UV01/>')
+        finished_time = djtz.now() - timedelta(days=1)
+        job_queryset = ExportJob.objects.filter(id=job.id)
+        job_queryset.update(status='done', file_path=file_path, finished_time=finished_time)
+        resp = file_rd.call()
+        self.assertEqual(resp.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(resp.streaming_content), b'<MCCI_IN200100UV01/>')
+
+        with self.settings(E2B_EXPORT_JOB_RETENTION_SECONDS=2 * 24 * 60 * 60):
+            self.assertEqual(export_jobs.delete_expired_files(), 0)
+        with self.settings(E2B_EXPORT_JOB_RETENTION_SECONDS=60):
+            self.assertEqual(export_jobs.delete_expired_files(), 1)
+        self.assertFalse(os.path.exists(file_path))
+        self.assertEqual(file_rd.call().status_code, HTTPStatus.GONE)
+
+        # File removed from disk by other means
+        job_queryset.update(file_path=file_path)
+        self.assertEqual(file_rd.call().status_code, HTTPStatus.GONE)
+
+        other_icsr = sm.ICSR.objects.create()
+        resp = EXPORT_JOBS_RD.call(data={'filter': {'id__gte': other_icsr.id}})
+        self.assertEqual(resp.status_code, HTTPStatus.ACCEPTED)
+        self.assertEqual(ExportJob.objects.get(id=json.loads(resp.content)['id']).icsr_ids, [other_icsr.id])
+        resp = EXPORT_JOBS_RD.call(data={'filter': {'unknown_field': 1}})
+        self.assertEqual(resp.status_code, HTTPStatus.BAD_REQUEST)
+        resp = EXPORT_JOBS_RD.call(data={'filter': {'id__gt': other_icsr.id}})
+        self.assertEqual(resp.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_import_job(self):
+        with self.settings(E2B_IMPORT_JOBS_DIR=tempfile.mkdtemp()):
+            resp = IMPORT_JOBS_RD.call(data={'files': ['<MCCI_IN200100UV01 xmlns="urn:hl7-org:v3"/>']})
+            job_data = json.loads(resp.content)
+            self.assertEqual(resp.status_code, HTTPStatus.ACCEPTED)
+            self.assertEqual(job_data['total_files'], 1)
+
+            job = e2b_import_jobs.claim_next_job()
+            self.assertEqual(job.id, job_data['id'])
+            self.assertIsNone(e2b_import_jobs.claim_next_job())
+
+            view = ImportMultipleXmlView(domain_service=domain_service_adapter, model_class=api_models.ICSR)
+            e2b_import_jobs.run_job(job, view)
+
+        resp = IMPORT_JOB_RD.call(id=job.id)
+        job_data = json.loads(resp.content)
+        self.assertEqual(job_data['status'], 'done')
+        self.assertEqual(job_data['processed_files'], 1)
+        self.assertEqual(job_data['results'][0]['error'], 'PORR_IN049016UV element not found')
+
+    def test_import_job_resume(self):
+        class WorkerKilled(BaseException):
+            pass
+
+        messages = ''.join(
+            '<PORR_IN049016UV><controlActProcess><subject><investigationEvent>'
+            f'<id root="2.16.840.1.113883.3.989.2.1.3.1" extension="resume-{i}"/>'
+            '</investigationEvent></subject></controlActProcess></PORR_IN049016UV>'
+            for i in range(3)
+        )
+        with self.settings(E2B_IMPORT_JOBS_DIR=tempfile.mkdtemp()):
+            IMPORT_JOBS_RD.call(data={'files': [f'<MCCI_IN200100UV01 xmlns="urn:hl7-org:v3">{messages}</MCCI_IN200100UV01>']})
+            view = ImportMultipleXmlView(domain_service=domain_service_adapter, model_class=api_models.ICSR, workers=1)
+            view.IMPORT_BATCH_SIZE = 1
+
+            # Worker dies while the second batch is saved, results of the first one are kept
+            create_many = view.create_many
+
+            def create_first_batch(icsrs):
+                if create_many_mock.call_count > 1:
+                    raise WorkerKilled()
+                return create_many(icsrs)
+
+            with (
+                mock.patch.object(view, 'import_single_xml', side_effect=import_test_message),
+                mock.patch.object(view, 'create_many', side_effect=create_first_batch) as create_many_mock
+            ):
+                with self.assertRaises(WorkerKilled):
+                    e2b_import_jobs.run_job(e2b_import_jobs.claim_next_job(), view)
+
+            job = ImportJob.objects.get()
+            self.assertEqual(job.status, 'running')
+            self.assertEqual(job.processed_files, 0)
+            self.assertEqual(job.processed_messages, 1)
+            first_result = job.results[0]['icsr_results'][0]
+
+            # Job of the dead worker is resumed after the saved messages
+            stale_time = djtz.now() - timedelta(seconds=settings.E2B_IMPORT_JOB_STALE_SECONDS + 1)
+            ImportJob.objects.filter(id=job.id).update(updated_time=stale_time)
+            job = e2b_import_jobs.claim_next_job()
+            with mock.patch.object(view, 'import_single_xml', side_effect=import_test_message) as import_single_xml:
+                e2b_import_jobs.run_job(job, view)
+            self.assertEqual(import_single_xml.call_count, 2)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(job.processed_files, 1)
+        self.assertEqual(job.processed_messages, 0)
+        icsr_results = job.results[0]['icsr_results']
+        self.assertEqual(len(icsr_results), 3)
+        self.assertEqual(icsr_results[0], first_result)
+        self.assertEqual(
+            sorted(sm.C_1_identification_case_safety_report.objects.values_list('c_1_1_sender_safety_report_unique_id', flat=True)),
+            [f'resume-{i}' for i in range(3)]
+        )
+
+    def test_import_validation_progress(self):
+        view = ImportMultipleXmlView(domain_service=domain_service_adapter, model_class=api_models.ICSR, workers=1)
+        view.IMPORT_BATCH_SIZE = 1
+        porr_elements = [
+            etree.fromstring(
+                '<PORR_IN049016UV xmlns="urn:hl7-org:v3"><controlActProcess><subject><investigationEvent>'
+                f'<id root="2.16.840.1.113883.3.989.2.1.3.1" extension="{i}"/>'
+                '</investigationEvent></subject></controlActProcess></PORR_IN049016UV>'
+            )
+            for i in range(2)
+        ]
+        on_progress = mock.Mock()
+
+        view.import_file(porr_elements, 'file.xml', is_validation=True, on_progress=on_progress)
+
+        # Progress is never rewound to the start of the file
+        self.assertEqual([len(call.args[0]) for call in on_progress.call_args_list], [1, 2])
+
+    def test_import_conversion_error(self):
+        view = ImportMultipleXmlView(domain_service=domain_service_adapter, model_class=api_models.ICSR, workers=1)
+        porr_elements = [
+            etree.fromstring(f'<PORR_IN049016UV xmlns="urn:hl7-org:v3"><id extension="{i}"/></PORR_IN049016UV>')
+            for i in range(2)
+        ]
+        import_single_xml = view.import_single_xml
+
+        def fail_first(root, icsr):
+            if root.find('{urn:hl7-org:v3}id').get('extension') == '0':
+                raise ValueError('broken')
+            return import_single_xml(root, icsr)
+
+        # Other messages of the file are imported
+        with mock.patch.object(view, 'import_single_xml', side_effect=fail_first):
+            result = view.import_file(porr_elements, 'file.xml', is_validation=False)
+        icsr_results = result['icsr_results']
+        self.assertFalse(icsr_results[0]['success'])
+        self.assertIn('ValueError: broken', icsr_results[0]['info'])
+        self.assertEqual(len(icsr_results), 2)
+        self.assertNotIn('broken', str(icsr_results[1]))
+
     def test_validate_case(self):
         ini_data = {
             'c_3_information_sender_case_safety_report': {
@@ -348,6 +889,405 @@ class MainTestCase(TestCase):
         self.assertEqual(len(res_data['c_4_r_literature_reference']), 1)
         self.assertEqual(len(res_data['f_r_results_tests_procedures_investigation_patient']), 0)
 
+    def test_corpus_generator(self):
+        params = e2b_corpus.CorpusParams(drugs=3, reactions=2, dosages=4, narrative_words=10)
+        icsr = e2b_corpus.CorpusGenerator(params, seed=1).make_icsr(7)
+
+        self.assertEqual(len(icsr.e_i_reaction_event), 2)
+        self.assertEqual(len(icsr.g_k_drug_information), 3)
+        self.assertEqual(len(icsr.g_k_drug_information[0].g_k_4_r_dosage_information), 4)
+        self.assertEqual(len(icsr.h_narrative_case_summary.h_1_case_narrative.value.split()), 10)
+        self.assertEqual(
+            icsr.model_dump(),
+            e2b_corpus.CorpusGenerator(params, seed=1).make_icsr(7).model_dump()
+        )
+
+    def test_xml_codec(self):
+        params = e2b_corpus.CorpusParams(drugs=1, reactions=1, dosages=1, narrative_words=5)
+        icsr = e2b_corpus.CorpusGenerator(params).make_icsr(1)
+
+        xml = xml_codec.encode(icsr)
+        decoded_icsr = api_models.ICSR(**xml_codec.decode(api_models.ICSR, xml))
+
+        self.assertEqual(decoded_icsr.model_dump(), icsr.model_dump())
+        self.assertEqual(len(decoded_icsr.g_k_drug_information[0].g_k_4_r_dosage_information), 1)
+        with self.assertRaises(ValueError):
+            xml_codec.decode(api_models.ICSR, '<C_1_identification_case_safety_report/>')
+
+        # Earlier exports padded single item lists with an empty element
+        legacy_xml = '''<?xml version="1.0" encoding="utf-8"?>
+            <ICSR>
+                <c_2_r_primary_source_information><c_2_r_1_2_reporter_given_name><value>John</value></c_2_r_1_2_reporter_given_name></c_2_r_primary_source_information>
+                <c_2_r_primary_source_information></c_2_r_primary_source_information>
+                <g_k_drug_information>
+                    <g_k_2_2_medicinal_product_name_primary_source><value>abc</value></g_k_2_2_medicinal_product_name_primary_source>
+                    <g_k_4_r_dosage_information><g_k_4_r_8_dosage_text><value>once</value></g_k_4_r_8_dosage_text></g_k_4_r_dosage_information>
+                    <g_k_4_r_dosage_information/>
+                </g_k_drug_information>
+                <g_k_drug_information/>
+            </ICSR>'''
+        decoded_icsr = api_models.ICSR(**xml_codec.decode(api_models.ICSR, legacy_xml))
+        self.assertEqual(len(decoded_icsr.c_2_r_primary_source_information), 1)
+        self.assertEqual(len(decoded_icsr.g_k_drug_information), 1)
+        self.assertEqual(len(decoded_icsr.g_k_drug_information[0].g_k_4_r_dosage_information), 1)
+        self.assertEqual(decoded_icsr.g_k_drug_information[0].g_k_4_r_dosage_information[0].g_k_4_r_8_dosage_text.value, 'once')
+
+    def test_schema_cache(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.xsd', delete=False) as file:
+            file.write(
+                '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" targetNamespace="urn:hl7-org:v3" '
+                'elementFormDefault="qualified"><xs:element name="PORR_IN049016UV" type="xs:int"/></xs:schema>'
+            )
+        schema_cache = e2b_schema.E2BSchemaCache(file.name)
+
+        schema = schema_cache.get()
+        self.assertIs(schema_cache.get(), schema)
+        self.assertTrue(schema.validate(etree.fromstring('<PORR_IN049016UV xmlns="urn:hl7-org:v3">1</PORR_IN049016UV>')))
+        self.assertFalse(schema.validate(etree.fromstring('<PORR_IN049016UV xmlns="urn:hl7-org:v3">a</PORR_IN049016UV>')))
+
+    def test_schema_files_check(self):
+        with self.settings(E2B_SCHEMA_VALIDATION=True, E2B_SCHEMA_PATH='/missing/PORR_IN049016UV.xsd'):
+            with self.assertRaisesRegex(ImproperlyConfigured, 'E2B_SCHEMA_PATH'):
+                e2b_schema.check_files()
+            with self.assertRaisesRegex(ImproperlyConfigured, 'E2B_SCHEMA_PATH'):
+                e2b_schema.E2BSchemaCache('/missing/PORR_IN049016UV.xsd').get()
+        with self.settings(E2B_SCHEMA_VALIDATION=False, E2B_SCHEMA_PATH='/missing/PORR_IN049016UV.xsd'):
+            e2b_schema.check_files()
+
+    def test_import_schema_validation(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.xsd', delete=False) as file:
+            file.write(
+                '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" targetNamespace="urn:hl7-org:v3" '
+                'elementFormDefault="qualified"><xs:element name="PORR_IN049016UV"><xs:complexType>'
+                '<xs:sequence><xs:any processContents="skip" minOccurs="0" maxOccurs="unbounded"/></xs:sequence>'
+                '<xs:attribute name="ITSVersion" use="required"/></xs:complexType></xs:element></xs:schema>'
+            )
+        xml = (
+            '<MCCI_IN200100UV01 xmlns="urn:hl7-org:v3">'
+            '<PORR_IN049016UV ITSVersion="XML_1.0">{}</PORR_IN049016UV>'
+            '<PORR_IN049016UV>{}</PORR_IN049016UV>'
+            '</MCCI_IN200100UV01>'
+        ).format(*(
+            '<controlActProcess><subject><investigationEvent>'
+            f'<id root="2.16.840.1.113883.3.989.2.1.3.1" extension="schema-{i}"/>'
+            '</investigationEvent></subject></controlActProcess>'
+            for i in range(2)
+        ))
+        schema_cache = e2b_schema.E2BSchemaCache(file.name)
+
+        with self.settings(E2B_SCHEMA_VALIDATION=True), mock.patch.object(e2b_schema, 'schema_cache', schema_cache):
+            resp = IMPORT_MULTIPLE_RD.call(data={'files': [xml]})
+            icsr_results = json.loads(resp.content)['results'][0]['icsr_results']
+            resp = IMPORT_MULTIPLE_RD.call(data={'files': [xml], 'validation': True})
+            validation_results = json.loads(resp.content)['results'][0]['file_validation_status']
+
+        self.assertEqual(len(icsr_results), 2)
+        self.assertNotIn('schema_errors', icsr_results[0])
+        self.assertFalse(icsr_results[1]['success'])
+        self.assertEqual(len(icsr_results[1]['schema_errors']), 1)
+        self.assertEqual([len(result['schema_errors']) for result in validation_results], [0, 1])
+
+    def test_export_schema_validation(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.xsd', delete=False) as file:
+            file.write(
+                '<xs:schema xmlns:xs="http://www.w3.org/2001/XMLSchema" targetNamespace="urn:hl7-org:v3" '
+                'elementFormDefault="qualified"><xs:element name="PORR_IN049016UV" type="xs:int"/></xs:schema>'
+            )
+        resp = CREATE_RD.call(data={'c_3_information_sender_case_safety_report': {'c_3_2_sender_organisation': {'value': 'abc'}}})
+        icsr_id = json.loads(resp.content)['id']
+
+        with (
+            self.settings(E2B_SCHEMA_VALIDATION=True),
+            mock.patch.object(e2b_schema, 'schema_cache', e2b_schema.E2BSchemaCache(file.name)),
+            mock.patch.object(e2b_template, 'template_cache', e2b_template.E2BTemplateCache(TEMPLATE_FIXTURE_PATH))
+        ):
+            resp = EXPORT_MULTIPLE_RD.call(data={'ids': [icsr_id], 'validation': True})
+
+        self.assertEqual(resp.status_code, HTTPStatus.OK)
+        validation_status = json.loads(resp.content)['results'][0]['file_validation_status'][0]
+        # Message part with content is not an int
+        self.assertGreater(len(validation_status['schema_errors']), 0)
+
+    @mock.patch.object(e2b_template, 'template_cache', e2b_template.E2BTemplateCache(TEMPLATE_FIXTURE_PATH))
+    def test_export_import_commands_round_trip(self):
+        c_1_1s = [f'round-trip-{i}' for i in range(3)]
+        created = storage_service_adapter.create_many([
+            dm.ICSR.model_validate({
+                'c_1_identification_case_safety_report': {'c_1_1_sender_safety_report_unique_id': c_1_1},
+                'h_narrative_case_summary': {'h_1_case_narrative': f'narrative of {c_1_1}'},
+            })
+            for c_1_1 in c_1_1s
+        ])
+        ids = [model.id for model, _ in created]
+        directory = tempfile.mkdtemp()
+
+        call_command(
+            'export_e2b', directory, '--ids', *map(str, ids), '--batch-size', '2', '--workers', '1', stdout=io.StringIO()
+        )
+        self.assertEqual(sorted(os.listdir(directory)), ['e2b_export_00001.xml', 'e2b_export_00002.xml'])
+
+        # Cases are imported again after the stored ones are removed, so that they aren't duplicates
+        sm.ICSR.objects.filter(id__in=ids).delete()
+        stdout = io.StringIO()
+        call_command('import_e2b', directory, '--workers', '1', stdout=stdout)
+        self.assertIn('3 of 3 messages succeeded', stdout.getvalue())
+
+        c_1s = sm.C_1_identification_case_safety_report.objects \
+            .filter(c_1_1_sender_safety_report_unique_id__in=c_1_1s) \
+            .select_related('icsr__h_narrative_case_summary') \
+            .order_by('c_1_1_sender_safety_report_unique_id')
+        self.assertEqual(
+            [(c_1.c_1_1_sender_safety_report_unique_id, c_1.icsr.h_narrative_case_summary.h_1_case_narrative) for c_1 in c_1s],
+            [(c_1_1, f'narrative of {c_1_1}') for c_1_1 in c_1_1s]
+        )
+
+    @mock.patch.object(e2b_template, 'template_cache', e2b_template.E2BTemplateCache(TEMPLATE_FIXTURE_PATH))
+    def test_export_stream(self):
+        created = storage_service_adapter.create_many([
+            dm.ICSR.model_validate({'c_1_identification_case_safety_report': {'c_1_1_sender_safety_report_unique_id': f'stream-{i}'}})
+            for i in range(3)
+        ])
+        ids = [model.id for model, _ in created]
+
+        resp = EXPORT_MULTIPLE_RD.call(data={'ids': ids})
+        buffered_xml = resp.content
+        resp = EXPORT_MULTIPLE_RD.call(data={'ids': ids, 'stream': True})
+        self.assertTrue(resp.streaming)
+        streamed_xml = b''.join(resp.streaming_content)
+
+        # Only N.1 and N.2.r ids and creation times generated for every batch differ
+        def normalize(xml):
+            xml = re.sub(rb'extension="[0-9a-f-]{36}"', b'extension=""', xml)
+            return re.sub(rb'<creationTime value="\d{14}"/>', b'<creationTime/>', xml)
+
+        self.assertEqual(normalize(streamed_xml), normalize(buffered_xml))
+        self.assertEqual(re.findall(rb'extension="(stream-\d)"', streamed_xml)[::2], [b'stream-0', b'stream-1', b'stream-2'])
+
+    def test_template_cache_reload(self):
+        path = os.path.join(tempfile.mkdtemp(), 'E2B.xml')
+        shutil.copy(TEMPLATE_FIXTURE_PATH, path)
+        template_cache = e2b_template.E2BTemplateCache(path)
+
+        template = template_cache.get()
+        self.assertIs(template_cache.get(), template)
+
+        with open(path, 'ab') as file:
+            file.write(b'<!-- changed -->')
+        # Modification time is set explicitly, as it may not change within the resolution of the file system
+        os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 1))
+        changed_template = template_cache.get()
+        self.assertIsNot(changed_template, template)
+        self.assertNotEqual(changed_template.digest, template.digest)
+        self.assertIs(template_cache.get(), changed_template)
+
+    def test_e2b_field_mapping(self):
+        message_part = etree.fromstring(
+            '<PORR_IN049016UV xmlns="urn:hl7-org:v3"><controlActProcess><subject><investigationEvent>'
+            '<id root="2.16.840.1.113883.3.989.2.1.3.1"/>'
+            '<component><adverseEventAssessment><subject1><primaryRole><player1><name/>'
+            '<role><associatedPerson><name/></associatedPerson>'
+            '<subjectOf2><observation><code code="3"/><value/></observation></subjectOf2></role>'
+            '</player1></primaryRole></subject1></adverseEventAssessment></component>'
+            '<subjectOf1><controlActEvent><author><assignedEntity><telecom/></assignedEntity></author></controlActEvent></subjectOf1>'
+            '</investigationEvent></subject></controlActProcess></PORR_IN049016UV>'
+        )
+        icsr = api_models.ICSR.model_validate({
+            'c_1_identification_case_safety_report': {'c_1_1_sender_safety_report_unique_id': {'value': 'abc'}},
+            'c_3_information_sender_case_safety_report': {'c_3_4_6_sender_telephone': {'value': '123'}},
+            'd_patient_characteristics': {
+                'd_1_patient': {'null_flavor': 'MSK'},
+                'd_10_1_parent_identification': {'value': 'JD'},
+                'd_10_2_2a_age_parent_num': {'value': 30},
+                'd_10_2_2b_age_parent_unit': {'value': 'a'},
+            },
+        })
+
+        e2b_mapping.export_fields(message_part, icsr)
+        imported_icsr = api_models.ICSR.model_validate({section: {} for section in e2b_mapping.SECTIONS})
+        e2b_mapping.import_fields(message_part, imported_icsr)
+
+        self.assertEqual(imported_icsr.c_1_identification_case_safety_report.c_1_1_sender_safety_report_unique_id, 'abc')
+        self.assertEqual(imported_icsr.c_3_information_sender_case_safety_report.c_3_4_6_sender_telephone, '123')
+        self.assertEqual(imported_icsr.d_patient_characteristics.d_1_patient, 'MSK')
+        self.assertEqual(imported_icsr.d_patient_characteristics.d_10_1_parent_identification, 'JD')
+        self.assertEqual(imported_icsr.d_patient_characteristics.d_10_2_2a_age_parent_num, 30)
+        self.assertEqual(imported_icsr.d_patient_characteristics.d_10_2_2b_age_parent_unit, 'a')
+
+    def test_import_duplicate_check(self):
+        icsr = sm.ICSR.objects.create()
+        sm.C_1_identification_case_safety_report.objects.create(
+            icsr=icsr,
+            c_1_1_sender_safety_report_unique_id='a',
+            c_1_8_1_worldwide_unique_case_identification_number='x'
+        )
+        CaseIds = e2b_duplicates.CaseIds
+
+        duplicated_codes = e2b_duplicates.DuplicateChecker().check_batch([
+            CaseIds('a', None), CaseIds('b', 'x'), CaseIds('c', 'y'), CaseIds('c', None), CaseIds(None, 'y')
+        ])
+
+        self.assertEqual(duplicated_codes, ['C.1.1', 'C.1.8.1', None, 'C.1.1', 'C.1.8.1'])
+
+    def test_inbound_message_archive(self):
+        icsr = sm.ICSR.objects.create()
+        messages = [
+            etree.fromstring(xml)[0] for xml in [
+                '<batch xmlns="urn:hl7-org:v3"><PORR_IN049016UV a="1" b="2">\n  <id extension="1"/>\n</PORR_IN049016UV></batch>',
+                '<MCCI_IN200100UV01 xmlns="urn:hl7-org:v3"><PORR_IN049016UV b="2" a="1"><id extension="1"></id></PORR_IN049016UV></MCCI_IN200100UV01>',
+            ]
+        ]
+        canonical_messages = [e2b_archive.canonicalize(message) for message in messages]
+        digest = e2b_archive.get_digest(canonical_messages[0])
+
+        self.assertEqual(canonical_messages[0], canonical_messages[1])
+        self.assertEqual(e2b_archive.find_archived([digest]), {})
+        e2b_archive.store({digest: e2b_archive.serialize(messages[0])})
+        self.assertEqual(e2b_archive.find_archived([digest]), {digest: None})
+        e2b_archive.link({digest: icsr.id})
+        self.assertEqual(e2b_archive.find_archived([digest]), {digest: icsr.id})
+        # Original formatting is kept
+        self.assertIn(b'a="1" b="2">\n  <id extension="1"/>', e2b_archive.read(digest))
+
+    def test_import_resent_message_order(self):
+        porr_xml = (
+            '<PORR_IN049016UV><controlActProcess><subject><investigationEvent>'
+            '<id root="2.16.840.1.113883.3.989.2.1.3.1" extension="resent-{}"/>'
+            '</investigationEvent></subject></controlActProcess></PORR_IN049016UV>'
+        )
+        with mock.patch.object(ImportMultipleXmlView, 'import_single_xml', side_effect=import_test_message):
+            IMPORT_MULTIPLE_RD.call(data={'files': [
+                f'<MCCI_IN200100UV01 xmlns="urn:hl7-org:v3">{porr_xml.format(0)}</MCCI_IN200100UV01>'
+            ]})
+            resp = IMPORT_MULTIPLE_RD.call(data={'files': [
+                f'<MCCI_IN200100UV01 xmlns="urn:hl7-org:v3">{porr_xml.format(1)}{porr_xml.format(0)}</MCCI_IN200100UV01>'
+            ]})
+        icsr_results = json.loads(resp.content)['results'][0]['icsr_results']
+
+        # Statuses follow the order of messages in the file
+        self.assertEqual(len(icsr_results), 2)
+        self.assertIn('successfully created', icsr_results[0]['info'])
+        self.assertIn('already been imported', icsr_results[1]['info'])
+
+    def test_import_raw_upload(self):
+        def make_batch(prefix, count):
+            return ''.join([
+                '<MCCI_IN200100UV01 xmlns="urn:hl7-org:v3"><id extension="batch"/>',
+                *(
+                    '<PORR_IN049016UV><controlActProcess><subject><investigationEvent>'
+                    f'<id root="2.16.840.1.113883.3.989.2.1.3.1" extension="{prefix}-{i}"/>'
+                    '</investigationEvent></subject></controlActProcess></PORR_IN049016UV>'
+                    for i in range(count)
+                ),
+                '</MCCI_IN200100UV01>',
+            ]).encode()
+
+        auth_dict = {'HTTP_AUTHORIZATION': 'Basic ' + base64.b64encode(f'{USERNAME}:{PASSWORD}'.encode()).decode()}
+        path = PATH_BASE + '/import-multiple'
+        with mock.patch.object(ImportMultipleXmlView, 'import_single_xml', side_effect=import_test_message):
+            resp = CLIENT.post(path, data=make_batch('raw', 2), content_type='application/xml', **auth_dict)
+            raw_results = json.loads(resp.content)['results']
+            files = {
+                'file_1': SimpleUploadedFile('a.xml', make_batch('multipart-a', 1)),
+                'file_2': SimpleUploadedFile('b.xml', make_batch('multipart-b', 2)),
+            }
+            resp = CLIENT.post(path, data=files, **auth_dict)
+            multipart_results = json.loads(resp.content)['results']
+
+        self.assertEqual([len(result['icsr_results']) for result in raw_results], [2])
+        self.assertEqual([(result['filename'], len(result['icsr_results'])) for result in multipart_results], [('a.xml', 1), ('b.xml', 2)])
+        self.assertEqual(
+            sorted(sm.C_1_identification_case_safety_report.objects.values_list('c_1_1_sender_safety_report_unique_id', flat=True)),
+            ['multipart-a-0', 'multipart-b-0', 'multipart-b-1', 'raw-0', 'raw-1']
+        )
+
+        # Only the last IMPORT_BATCH_SIZE message parts are kept in the tree, the earlier ones are cleared
+        with mock.patch.object(ImportMultipleXmlView, 'IMPORT_BATCH_SIZE', 1):
+            elements = list(ImportMultipleXmlView.iterparse_messages(io.BytesIO(make_batch('clear', 4))))
+        self.assertEqual([len(element) for element in elements], [0, 0, 0, 1])
+        # Batch header and the message parts before the last cleared one are removed from the tree
+        self.assertEqual(list(elements[-1].getparent()), elements[-2:])
+
+    def test_inbox(self):
+        inbox_path = tempfile.mkdtemp()
+
+        def drop_file(name, content):
+            with open(os.path.join(inbox_path, name), 'w') as file:
+                file.write(content)
+
+        drop_file('a.xml', (
+            '<MCCI_IN200100UV01 xmlns="urn:hl7-org:v3"><PORR_IN049016UV><controlActProcess><subject><investigationEvent>'
+            '<id root="2.16.840.1.113883.3.989.2.1.3.1" extension="inbox-a"/>'
+            '</investigationEvent></subject></controlActProcess></PORR_IN049016UV></MCCI_IN200100UV01>'
+        ))
+        drop_file('b.xml', '<MCCI_IN200100UV01')
+
+        # Daemon stops after claiming the files, they are kept in its processing directory
+        stopped_inbox = e2b_inbox.Inbox(inbox_path)
+        self.assertEqual(len(stopped_inbox.claim_files()), 2)
+        stopped_inbox.close()
+        drop_file('c.xml', '<MCCI_IN200100UV01/>')
+        live_inbox = e2b_inbox.Inbox(inbox_path)
+        live_claimed_paths = live_inbox.claim_files()
+        self.assertEqual([path.name[-5:] for path in live_claimed_paths], ['c.xml'])
+
+        inbox = e2b_inbox.Inbox(inbox_path)
+        # Files of the live daemon stay in its processing directory, recovered ones keep the claimed name
+        self.assertEqual([path.name[-5:] for path in inbox.recover()], ['a.xml', 'b.xml'])
+        self.assertTrue(live_claimed_paths[0].exists())
+        self.assertFalse(stopped_inbox.processing_path.exists())
+
+        claimed_paths = inbox.claim_files(limit=1)
+        claimed_paths += inbox.claim_files()
+        self.assertEqual([path.parent for path in claimed_paths], [inbox.processing_path] * 2)
+        view = ImportMultipleXmlView(domain_service=domain_service_adapter, model_class=api_models.ICSR, workers=1)
+        with mock.patch.object(view, 'import_single_xml', side_effect=import_test_message):
+            is_oks = {path.name[-5:]: inbox.import_file(path, view) for path in claimed_paths}
+        inbox.close()
+        live_inbox.close()
+
+        self.assertEqual(is_oks, {'a.xml': True, 'b.xml': False})
+        done_path = os.path.join(inbox_path, e2b_inbox.DONE_DIR)
+        failed_path = os.path.join(inbox_path, e2b_inbox.FAILED_DIR)
+        self.assertEqual(len(os.listdir(done_path)), 2)
+        self.assertEqual(len(os.listdir(failed_path)), 2)
+        self.assertEqual(os.listdir(inbox.processing_path), [e2b_inbox.LOCK_FILE_NAME])
+        self.assertTrue(sm.C_1_identification_case_safety_report.objects.filter(c_1_1_sender_safety_report_unique_id='inbox-a').exists())
+
+    def test_import_follow_up_check(self):
+        icsr = sm.ICSR.objects.create()
+        sm.C_1_identification_case_safety_report.objects.create(
+            icsr=icsr,
+            c_1_1_sender_safety_report_unique_id='a',
+            c_1_5_date_most_recent_information='20240101',
+            c_1_8_1_worldwide_unique_case_identification_number='x'
+        )
+        CaseIds = e2b_duplicates.CaseIds
+
+        duplicated_codes = e2b_duplicates.DuplicateChecker(is_follow_up=True).check_batch([
+            CaseIds('a', 'x', '20231231'),
+            CaseIds('a', 'x', '20240102120000'),
+            CaseIds('b', 'x', '20240103'),
+            CaseIds('b', 'x', '20240103'),
+        ])
+
+        self.assertEqual(duplicated_codes, ['C.1.1', e2b_duplicates.FOLLOW_UP, e2b_duplicates.FOLLOW_UP, 'C.1.1'])
+        c_1_id = icsr.c_1_identification_case_safety_report.id
+        self.assertEqual(e2b_duplicates.find_stored_cases(['x', 'y']), {'x': (icsr.id, c_1_id, 'a')})
+
+        # Follow-up with new C.1.1 updates the stored case keeping its C.1.1
+        follow_up = api_models.ICSR.model_validate({'c_1_identification_case_safety_report': {
+            'c_1_1_sender_safety_report_unique_id': {'value': 'b'},
+            'c_1_5_date_most_recent_information': {'value': '20240103'},
+            'c_1_8_1_worldwide_unique_case_identification_number': {'value': 'x'},
+        }})
+        view = ImportMultipleXmlView(domain_service=domain_service_adapter, model_class=api_models.ICSR)
+        (status, icsr_id), = view.update_follow_ups([(CaseIds('b', 'x', '20240103'), follow_up)])
+        self.assertTrue(status['success'])
+        self.assertEqual(icsr_id, icsr.id)
+        c_1 = sm.C_1_identification_case_safety_report.objects.get(id=c_1_id)
+        self.assertEqual(c_1.c_1_1_sender_safety_report_unique_id, 'a')
+        self.assertEqual(c_1.c_1_5_date_most_recent_information, '20240103')
+
 
 class CodeSetViewIntegrationTest(TestCase):
     fixtures = ['df.json', 'cc.json']
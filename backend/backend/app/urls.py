@@ -5,6 +5,7 @@ from app.src.connectors.api_domain.service_adapters import DomainServiceAdapter
 from app.src.connectors.domain_storage.service_adapters import StorageServiceAdapter
 from app.src.layers.api import models as api_models
 from app.src.layers.api import views
+from app.src.layers.api.document_cache import document_cache
 from app.src.layers.domain.services import DomainService, CIOMSService, MedDRAService, CodeSetService
 from app.src.layers.storage.services import StorageService
 
@@ -27,7 +28,7 @@ urlpatterns = [
     path('test', lambda *args, **kwargs: http.HttpResponse('This is a test')),
 
     path('icsr', views.ModelClassView.as_view(**view_shared_args)),
-    path('icsr/<int:pk>', views.ModelInstanceView.as_view(**view_shared_args)),
+    path('icsr/<int:pk>', views.ModelInstanceView.as_view(**view_shared_args, document_cache=document_cache)),
     path('icsr/validate', views.ModelBusinessValidationView.as_view(**view_shared_args)),
 
     path('icsr/to-xml', views.ModelToXmlView.as_view(**view_shared_args)),
@@ -40,6 +41,11 @@ urlpatterns = [
 
     path('codeset/<str:codeset>', views.CodeSetView.as_view(code_set_service=code_set_service), name='codeset'),
     path('icsr/export-multiple', views.ExportMultipleXmlView.as_view(**view_shared_args), name='export_multiple_xml'),
+    path('icsr/export-jobs', views.ExportJobListView.as_view(**view_shared_args), name='export_jobs'),
+    path('icsr/export-jobs/<int:pk>', views.ExportJobView.as_view(**view_shared_args), name='export_job'),
+    path('icsr/export-jobs/<int:pk>/file', views.ExportJobFileView.as_view(**view_shared_args), name='export_job_file'),
     path('icsr/import-multiple', views.ImportMultipleXmlView.as_view(**view_shared_args), name='import_multiple_xml'),
+    path('icsr/import-jobs', views.ImportJobListView.as_view(**view_shared_args), name='import_jobs'),
+    path('icsr/import-jobs/<int:pk>', views.ImportJobView.as_view(**view_shared_args), name='import_job'),
     path('auth/check', views.AuthCheckView.as_view(), name='auth_check'),
 ]
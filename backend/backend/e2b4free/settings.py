@@ -136,6 +136,46 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# E2B XML export
+
+# Number of processes rendering large exports, 1 disables parallel rendering
+E2B_EXPORT_WORKERS = int(os.getenv('E2B_EXPORT_WORKERS', os.cpu_count() or 1))
+# Smaller exports are rendered in the request process, as starting workers takes time
+E2B_EXPORT_PARALLEL_MIN_CASES = int(os.getenv('E2B_EXPORT_PARALLEL_MIN_CASES', 200))
+E2B_EXPORT_MAX_SHARD_SIZE = int(os.getenv('E2B_EXPORT_MAX_SHARD_SIZE', 500))
+
+# Number of processes converting messages of large imports, 1 disables parallel conversion
+E2B_IMPORT_WORKERS = int(os.getenv('E2B_IMPORT_WORKERS', os.cpu_count() or 1))
+# Files with fewer messages are converted in the request process
+E2B_IMPORT_PARALLEL_MIN_CASES = int(os.getenv('E2B_IMPORT_PARALLEL_MIN_CASES', 200))
+E2B_IMPORT_CHUNK_SIZE = int(os.getenv('E2B_IMPORT_CHUNK_SIZE', 50))
+
+# Files of asynchronous export jobs (see run_export_jobs command)
+E2B_EXPORT_JOBS_DIR = Path(os.getenv('E2B_EXPORT_JOBS_DIR', BASE_DIR / 'export_jobs'))
+# Running job without progress updates for this time is considered abandoned and is restarted
+E2B_EXPORT_JOB_STALE_SECONDS = int(os.getenv('E2B_EXPORT_JOB_STALE_SECONDS', 600))
+# Files of finished jobs are deleted by the worker after this time
+E2B_EXPORT_JOB_RETENTION_SECONDS = int(os.getenv('E2B_EXPORT_JOB_RETENTION_SECONDS', 7 * 24 * 60 * 60))
+
+# Uploaded files of asynchronous import jobs (see run_import_jobs command)
+E2B_IMPORT_JOBS_DIR = Path(os.getenv('E2B_IMPORT_JOBS_DIR', BASE_DIR / 'import_jobs'))
+E2B_IMPORT_JOB_STALE_SECONDS = int(os.getenv('E2B_IMPORT_JOB_STALE_SECONDS', 600))
+
+# Validation of imported and exported message parts against E2B(R3) schema, the schema files are bundled
+# with the ICH E2B(R3) implementation package and are read from disk only
+E2B_SCHEMA_VALIDATION = os.getenv('E2B_SCHEMA_VALIDATION', 'false').lower() == 'true'
+E2B_SCHEMA_PATH = Path(os.getenv(
+    'E2B_SCHEMA_PATH', BASE_DIR / 'app' / 'schemas' / 'multicacheschemas' / 'PORR_IN049016UV.xsd'
+))
+
+# Directory where the gateway drops inbound batch files (see watch_inbox command)
+E2B_INBOX_DIR = Path(os.getenv('E2B_INBOX_DIR', BASE_DIR / 'inbox'))
+# Files modified more recently are considered being written and are not imported yet
+E2B_INBOX_MIN_FILE_AGE = float(os.getenv('E2B_INBOX_MIN_FILE_AGE', 1))
+
+# Single ICSRs are returned from their json snapshots (see rebuild_icsr_documents command)
+ICSR_DOCUMENT_SNAPSHOTS = os.getenv('ICSR_DOCUMENT_SNAPSHOTS', 'false').lower() == 'true'
+
 LOGGING = {
     "version": 1,
     "disable_existing_loggers": False,